@@ -0,0 +1,204 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Lower values are sent first
+PRIORITY_OVERRIDE = 0  # Manual override of a proxy position
+PRIORITY_PATH = 1  # Path between the hub and a proxy after a state change
+PRIORITY_COORDINATES = 2  # Proxy plugged in or moved
+PRIORITY_BOOT = 3  # Boot animation
+
+# The heap is only compacted beyond this many entries
+COMPACT_THRESHOLD = 64
+
+# Indexes of the fields of a queue entry
+_PRIORITY, _SEQUENCE, _ENQUEUED, _MESSAGE, _KEY, _GROUP, _PROXY_ID, _POSITION, _VALID = range(9)
+
+
+class AnimationQueue:
+    """
+    A thread-safe priority queue for the LED animation messages.
+    Messages with the same priority are sent in arrival order. A message with a supersession key replaces a queued
+    message with the same key instead of being added again. A message can also belong to a supersession group, e.g. the
+    coordinates of one proxy, so it replaces the queued message of its group even if that one has another key.
+    Each message can carry the proxy and position it animates, so the sent message can be attributed without decoding it.
+
+    Attributes:
+        heap (list): The queue entries ordered by priority and arrival.
+        entries (dict): Maps the supersession key to the queued entry.
+        groups (dict): Maps the supersession group to the queued entry.
+        superseded (int): The number of queued messages replaced by a newer one.
+        dequeued (int): The number of messages taken from the queue.
+        total_wait (float): The summed time (in seconds) the dequeued messages spent in the queue.
+        max_wait (float): The longest time (in seconds) a dequeued message spent in the queue.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.entries = {}
+        self.groups = {}
+        self.sequence = itertools.count()
+        self.size = 0
+        self.superseded = 0
+        self.dequeued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+
+    def put(self, message, priority=PRIORITY_COORDINATES, key=None, proxy_ID=None, position=None, group=None):
+        """
+        Adds a message to the queue, or replaces the queued message with the same key.
+        A replaced message keeps its place in the queue unless the new message has a higher priority.
+        A queued message of the same group with another key is dropped.
+
+        Args:
+            message: The message to be sent.
+            priority (int, optional): The priority of the message. Defaults to PRIORITY_COORDINATES.
+            key (hashable, optional): The supersession key of the message.
+            proxy_ID (int, optional): The ID of the proxy the message animates.
+            position (tuple, optional): The position the message animates.
+            group (hashable, optional): The supersession group of the message.
+
+        Returns:
+            bool: True if the message replaced a queued message, False if it was added.
+        """
+        with self.lock:
+            entry = self.entries.get(key) if key is not None else None
+            group_entry = self.groups.get(group) if group is not None else None
+
+            if entry is None:
+                # The message takes over the queued message of its group
+                entry = group_entry
+            elif group_entry is not None and group_entry is not entry:
+                # The older message of the group is stale, it is skipped when it reaches the top of the heap
+                self.superseded += 1
+                self._invalidate(group_entry)
+
+            replaced = entry is not None
+            if replaced:
+                self.superseded += 1
+
+                if priority >= entry[_PRIORITY]:
+                    entry[_MESSAGE] = message
+                    entry[_PROXY_ID] = proxy_ID
+                    entry[_POSITION] = position
+                    if entry[_KEY] != key:
+                        self._set_key(entry, key)
+                    if entry[_GROUP] != group:
+                        self._set_group(entry, group)
+                    return True
+
+                # Move the message up, the old entry is skipped when it reaches the top of the heap
+                self._invalidate(entry)
+                enqueued = entry[_ENQUEUED]
+            else:
+                enqueued = time.monotonic()
+
+            entry = [priority, next(self.sequence), enqueued, message, key, group, proxy_ID, position, True]
+            heapq.heappush(self.heap, entry)
+            if key is not None:
+                self.entries[key] = entry
+            if group is not None:
+                self.groups[group] = entry
+            self.size += 1
+            self.not_empty.notify()
+            return replaced
+
+    def _invalidate(self, entry):
+        entry[_VALID] = False
+        if entry[_KEY] is not None and self.entries.get(entry[_KEY]) is entry:
+            del self.entries[entry[_KEY]]
+        if entry[_GROUP] is not None and self.groups.get(entry[_GROUP]) is entry:
+            del self.groups[entry[_GROUP]]
+        self.size -= 1
+
+        # Drop the skipped entries once they outnumber the queued ones, so the heap does not grow while nothing is taken
+        if len(self.heap) > COMPACT_THRESHOLD and len(self.heap) > 2 * self.size:
+            self.heap = [queued for queued in self.heap if queued[_VALID]]
+            heapq.heapify(self.heap)
+
+    def _set_key(self, entry, key):
+        if entry[_KEY] is not None and self.entries.get(entry[_KEY]) is entry:
+            del self.entries[entry[_KEY]]
+        entry[_KEY] = key
+        if key is not None:
+            self.entries[key] = entry
+
+    def _set_group(self, entry, group):
+        if entry[_GROUP] is not None and self.groups.get(entry[_GROUP]) is entry:
+            del self.groups[entry[_GROUP]]
+        entry[_GROUP] = group
+        if group is not None:
+            self.groups[group] = entry
+
+    def get(self, timeout=None):
+        """
+        Removes the message with the highest priority from the queue, waiting until one is available.
+
+        Args:
+            timeout (float, optional): The maximum time (in seconds) to wait.
+
+        Returns:
+            tuple: The message, the time (in seconds) it spent in the queue, its supersession key, proxy ID and position,
+                or None on timeout.
+        """
+        with self.lock:
+            if not self.not_empty.wait_for(lambda: self.size > 0, timeout):
+                return None
+            return self._pop()
+
+    def get_nowait(self):
+        """
+        Removes the message with the highest priority from the queue without waiting.
+
+        Returns:
+            tuple: The message, the time (in seconds) it spent in the queue, its supersession key, proxy ID and position,
+                or None if the queue is empty.
+        """
+        with self.lock:
+            if self.size == 0:
+                return None
+            return self._pop()
+
+    def _pop(self):
+        while True:
+            entry = heapq.heappop(self.heap)
+            if entry[_VALID]:
+                break
+
+        if entry[_KEY] is not None:
+            del self.entries[entry[_KEY]]
+        if entry[_GROUP] is not None:
+            del self.groups[entry[_GROUP]]
+        self.size -= 1
+
+        wait = time.monotonic() - entry[_ENQUEUED]
+        self.dequeued += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+        return entry[_MESSAGE], wait, entry[_KEY], entry[_PROXY_ID], entry[_POSITION]
+
+    def qsize(self):
+        """
+        Returns the number of messages waiting in the queue.
+
+        """
+        return self.size
+
+    def stats(self):
+        """
+        Returns the counters of the queue.
+
+        Returns:
+            dict: The queue depth, the number of superseded and dequeued messages and the average and longest time in queue.
+        """
+        return {
+            "depth": self.size,
+            "superseded": self.superseded,
+            "dequeued": self.dequeued,
+            "average_wait": self.total_wait / self.dequeued if self.dequeued else 0.0,
+            "max_wait": self.max_wait,
+        }
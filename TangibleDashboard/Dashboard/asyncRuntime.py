@@ -0,0 +1,297 @@
+import asyncio
+import socket
+import time
+
+import paho.mqtt.client as mqtt
+from eventJournal import EVENT_ANIMATION_SENT
+from latencyTracer import STAGE_WRITE
+from lightController import LightController
+from messageHandler import HOT_PATH_LOG_INTERVAL, MessageHandler
+
+
+class AsyncMessageHandler(MessageHandler):
+    """
+    A MessageHandler that runs the MQTT ingestion, routing and proxy state updates as coroutines on one asyncio event loop.
+    A networked mqtt.Client is driven by the event loop through its socket callbacks instead of a paho network thread.
+
+    Args:
+        queue_size (int, optional): The maximum number of received messages waiting to be processed. Defaults to 1000.
+        All other arguments are passed on to the MessageHandler.
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): The event loop the handler runs on.
+        message_queue (asyncio.Queue): The received messages waiting to be processed.
+        queue_size (int): The maximum number of received messages waiting to be processed.
+        dropped (int): The number of messages discarded because the queue was full or the handler was not running yet.
+        reconnect_delay (int): The delay (in seconds) between reconnect attempts.
+    """
+
+    def __init__(self, broker_address, proxy_list, light_controller, animation_topic, override_topic, logger, queue_size=1000, **kwargs):
+        super().__init__(broker_address, proxy_list, light_controller, animation_topic, override_topic, logger, **kwargs)
+        self.loop = None
+        self.message_queue = None
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.reconnect_delay = 5
+        self.misc_task = None
+
+    def on_message(self, client, userdata, msg):
+        """
+        Callback function that is called when a message is received, it only queues the raw message.
+
+        Args:
+            client (mqtt.Client): The MQTT client.
+            userdata: User-defined data.
+            msg (mqtt.MQTTMessage): The received message.
+
+        """
+        topic = msg.topic
+        timestamp = time.time()
+
+        if self.recorder is not None:
+            self.recorder.record(timestamp, topic, msg.payload)
+
+        if self.subscribe_mode == "wildcard" and self.router.resolve(topic) is None:
+            return
+
+        if self.duplicate_filter is not None and self.is_duplicate(topic, msg.payload, timestamp):
+            return
+
+        item = (topic, msg.payload, timestamp)
+
+        if self.loop is None:
+            # Before run() created the queue there is no loop to hand the message to
+            self.dropped += 1
+            if self.duplicate_filter is not None:
+                self.forget_dropped(item)
+            self.logger.warning("(on_message) Message on topic %s received before the handler was started, dropped.", topic, rate_limit=HOT_PATH_LOG_INTERVAL)
+            return
+
+        # Messages published from other threads are handed over to the event loop
+        self._call_on_loop(self._put, item)
+
+    def ingest_stats(self):
+        """
+        Returns the counters of the message queue.
+
+        Returns:
+            dict: The number of messages waiting and the number of messages dropped because the queue was full or the handler was not running yet.
+        """
+        return {
+            "depth": self.message_queue.qsize() if self.message_queue is not None else 0,
+            "dropped": self.dropped,
+        }
+
+    def _put(self, item):
+        try:
+            self.message_queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.duplicate_filter is not None:
+                self.forget_dropped(item)
+
+    async def run(self):
+        """
+        Connects to the broker and processes the received messages until the task is cancelled.
+
+        """
+        self.loop = asyncio.get_running_loop()
+        self.message_queue = asyncio.Queue(self.queue_size)
+
+        if isinstance(self.client, mqtt.Client):
+            self._attach_to_loop()
+
+        # The DNS lookup and the socket connect block, so they run in the default executor
+        await self.loop.run_in_executor(None, self.client.connect, self.broker_address)
+        self.logger.info("Message Handler started.")
+
+        coalesce_task = None
+        if self.coalescer is not None:
+            coalesce_task = self.loop.create_task(self._coalesce_loop())
+
+        try:
+            while True:
+                topic, payload, timestamp = await self.message_queue.get()
+                try:
+                    self.process_message(topic, payload, timestamp)
+                except Exception as e:
+                    # A failing message must not end the handler, see MessageHandler._process_queue
+                    self.logger.error("(run) Failed to process message on topic %s: %s", topic, e, rate_limit=HOT_PATH_LOG_INTERVAL)
+        finally:
+            if self.misc_task is not None:
+                self.misc_task.cancel()
+            if coalesce_task is not None:
+                coalesce_task.cancel()
+                self.coalescer.flush_all()
+            self.client.disconnect()
+            self.logger.info("Message Handler stopped.")
+
+    def _attach_to_loop(self):
+        """
+        A private method that lets the event loop drive the socket of the paho client.
+        The socket callbacks also fire in the executor thread that connects, so they are handed over to the event loop.
+
+        """
+        def on_socket_open(client, userdata, sock):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 2048)
+            self._call_on_loop(self.loop.add_reader, sock, client.loop_read)
+
+        def on_socket_close(client, userdata, sock):
+            self._call_on_loop(self.loop.remove_reader, sock)
+
+        def on_socket_register_write(client, userdata, sock):
+            self._call_on_loop(self.loop.add_writer, sock, client.loop_write)
+
+        def on_socket_unregister_write(client, userdata, sock):
+            self._call_on_loop(self.loop.remove_writer, sock)
+
+        self.client.on_socket_open = on_socket_open
+        self.client.on_socket_close = on_socket_close
+        self.client.on_socket_register_write = on_socket_register_write
+        self.client.on_socket_unregister_write = on_socket_unregister_write
+        self.misc_task = self.loop.create_task(self._misc_loop())
+
+    def _call_on_loop(self, callback, *args):
+        """
+        A private method that calls a function on the event loop, directly if it is called from the event loop.
+
+        Args:
+            callback (callable): The function to call.
+            *args: The arguments of the function.
+
+        """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self.loop:
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    async def _coalesce_loop(self):
+        """
+        A private coroutine that flushes the coalesced proxy updates once their window has passed.
+        Without pending updates it sleeps for one window, so a new update is flushed at most one window late.
+
+        """
+        while True:
+            deadline = self.coalescer.next_deadline()
+            if deadline is None:
+                await asyncio.sleep(self.coalescer.window)
+                continue
+
+            await asyncio.sleep(max(0, deadline - time.monotonic()))
+            self.coalescer.flush_due()
+
+    async def _misc_loop(self):
+        """
+        A private coroutine that handles the keepalives of the paho client and reconnects after a connection loss.
+
+        """
+        while True:
+            if self.client.loop_misc() == mqtt.MQTT_ERR_NO_CONN:
+                await asyncio.sleep(self.reconnect_delay)
+                try:
+                    await self.loop.run_in_executor(None, self.client.reconnect)
+                except OSError as e:
+                    self.logger.warning("(misc_loop) Reconnect failed: %s", e)
+                continue
+
+            await asyncio.sleep(1)
+
+    def start(self):
+        raise RuntimeError("AsyncMessageHandler runs on the event loop, await run() instead.")
+
+    def stop(self):
+        raise RuntimeError("AsyncMessageHandler runs on the event loop, cancel the run() task instead.")
+
+
+class AsyncLightController(LightController):
+    """
+    A LightController that sends the queued messages from a coroutine, pacing them with cooperative timers.
+
+    Args:
+        See LightController.
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): The event loop the controller runs on.
+        queued (asyncio.Event): Set when a message was added to the message queue.
+    """
+
+    def __init__(self, port, baudrate, logger, serial_port=None, flow_control="fixed", ack_timeout=10, protocol="ascii", target_baudrate=None, journal=None, tracer=None, metrics=None):
+        super().__init__(port, baudrate, logger, serial_port, flow_control, ack_timeout, protocol, target_baudrate, journal, tracer, metrics)
+        self.loop = None
+        self.queued = asyncio.Event()
+
+    def start(self):
+        # The messages are sent by the run() coroutine instead of a worker thread
+        pass
+
+    def enqueue(self, message, priority, key=None, proxy_ID=None, position=None, group=None):
+        """
+        Adds a message to the message queue, also from threads other than the one of the event loop.
+
+        Args:
+            message: The message encoded by the protocol.
+            priority (int): The priority of the message.
+            key (hashable, optional): The supersession key of the message.
+            proxy_ID (int, optional): The ID of the proxy the message animates.
+            position (tuple, optional): The position the message animates.
+            group (hashable, optional): The supersession group of the message.
+
+        """
+        super().enqueue(message, priority, key, proxy_ID, position, group)
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if self.loop is None or running_loop is self.loop:
+            self.queued.set()
+        else:
+            self.loop.call_soon_threadsafe(self.queued.set)
+
+    async def run(self):
+        """
+        Sends the queued messages until the task is cancelled.
+
+        """
+        self.loop = asyncio.get_running_loop()
+
+        while True:
+            item = self.message_queue.get_nowait()
+            if item is None:
+                self.queued.clear()
+                await self.queued.wait()
+                continue
+
+            message, wait, key, proxy_ID, position = item
+            trace = self.dequeue_trace(key) if self.tracer is not None else None
+            self.logger.info("(send_messages) Message waited %.3f s in queue, %s messages left.", wait, self.message_queue.qsize())
+            self.write(message)
+            if trace is not None:
+                self.tracer.finish(trace, STAGE_WRITE)
+            if self.journal is not None:
+                self.journal.record(EVENT_ANIMATION_SENT, proxy_ID, position, latency=wait)
+
+            if self.flow_control == "ack":
+                # The serial port is read by the reader thread, only the wait for its signal is handed off
+                await self.loop.run_in_executor(None, self.wait_ready)
+            else:
+                await asyncio.sleep(self.delay)
+
+
+async def run_dashboard(message_handler, light_controller):
+    """
+    Runs an AsyncMessageHandler and its AsyncLightController on the current event loop.
+    Several dashboards can be run from one process by gathering multiple run_dashboard coroutines.
+
+    Args:
+        message_handler (AsyncMessageHandler): The message handler of the dashboard.
+        light_controller (AsyncLightController): The light controller of the dashboard.
+
+    """
+    await asyncio.gather(message_handler.run(), light_controller.run())
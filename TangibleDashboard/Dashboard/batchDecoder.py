@@ -0,0 +1,245 @@
+import time
+
+import numpy as np
+from config import get_config
+from proxy import ADC_RESOLUTION, MATCH_TOLERANCES, VOLTAGE_FACTORS
+
+# Bits of the fallback flags, set if the value of the type matched no voltage level and the closest level was used
+FALLBACK_TILE = 1
+FALLBACK_ROW = 2
+FALLBACK_COL = 4
+
+TYPES = ("tile", "row", "col")
+FALLBACK_BITS = {"tile": FALLBACK_TILE, "row": FALLBACK_ROW, "col": FALLBACK_COL}
+
+
+class VoltageMatcher:
+    """
+    A class that matches arrays of voltages against the voltage levels of one type with the same result as Proxy.match_voltage.
+
+    The tolerance windows of the levels may overlap, where the level listed first wins. The window bounds split the voltage
+    axis into regions that each match one level or none, so the match is the region number looked up with searchsorted.
+
+    Args:
+        data_list (list): The (voltage level, number) tuples of the type.
+        type (str): The type of voltage divider ("tile", "row", or "col").
+
+    Attributes:
+        levels (numpy.ndarray): The voltage levels in list order.
+        numbers (numpy.ndarray): The number of each level in list order.
+        bounds (numpy.ndarray): The sorted window bounds.
+        region_numbers (numpy.ndarray): The matched number of each region, 0 if no level matches.
+        sorted_levels (numpy.ndarray): The voltage levels in ascending order.
+        sorted_order (numpy.ndarray): The list index of each sorted level.
+    """
+
+    def __init__(self, data_list, type):
+        below, above = MATCH_TOLERANCES[type]
+
+        # Same expressions as Proxy.match_voltage, so the bounds are the same floats
+        windows = [(level - below, level + above, number) for level, number in data_list]
+
+        self.levels = np.array([level for level, _ in data_list], dtype=np.float64)
+        self.numbers = np.array([number for _, number in data_list], dtype=np.int64)
+        self.bounds = np.array(sorted({bound for low, high, _ in windows for bound in (low, high)}), dtype=np.float64)
+
+        # Region 2 * i + 1 is the bound i itself, region 2 * i lies between the bounds i - 1 and i
+        representatives = []
+        for i, bound in enumerate(self.bounds):
+            previous = self.bounds[i - 1] if i > 0 else bound - 1.0
+            representatives.append((previous + bound) / 2)
+            representatives.append(bound)
+        representatives.append(self.bounds[-1] + 1.0)
+
+        region_numbers = []
+        for voltage in representatives:
+            number = next((number for low, high, number in windows if low <= voltage <= high), 0)
+            region_numbers.append(number)
+        self.region_numbers = np.array(region_numbers, dtype=np.int64)
+
+        self.sorted_order = np.argsort(self.levels, kind="stable")
+        self.sorted_levels = self.levels[self.sorted_order]
+
+    def match(self, voltages):
+        """
+        Matches an array of voltages.
+
+        Args:
+            voltages (numpy.ndarray): The voltages.
+
+        Returns:
+            tuple: The array of matched numbers and the boolean array flagging the closest level fallbacks.
+        """
+        left = np.searchsorted(self.bounds, voltages, side="left")
+
+        # A voltage equal to a bound is the region of the bound itself
+        on_bound = self.bounds[np.minimum(left, len(self.bounds) - 1)] == voltages
+        numbers = self.region_numbers[2 * left + on_bound]
+
+        fallbacks = numbers == 0
+        if fallbacks.any():
+            numbers = np.where(fallbacks, self.closest_numbers(voltages), numbers)
+
+        return numbers, fallbacks
+
+    def closest_numbers(self, voltages):
+        """
+        Finds the number of the closest voltage level for an array of voltages.
+        Only the sorted neighbours of a voltage can be closest. Of two equally close levels the one listed first wins,
+        like min() in Proxy.match_voltage.
+
+        Args:
+            voltages (numpy.ndarray): The voltages.
+
+        Returns:
+            numpy.ndarray: The number of the closest level of each voltage.
+        """
+        above = np.searchsorted(self.sorted_levels, voltages)
+        upper = np.minimum(above, len(self.sorted_levels) - 1)
+        lower = np.maximum(above - 1, 0)
+
+        upper_distance = np.abs(self.sorted_levels[upper] - voltages)
+        lower_distance = np.abs(self.sorted_levels[lower] - voltages)
+        upper_order = self.sorted_order[upper]
+        lower_order = self.sorted_order[lower]
+
+        use_upper = (upper_distance < lower_distance) | ((upper_distance == lower_distance) & (upper_order < lower_order))
+        return self.numbers[np.where(use_upper, upper_order, lower_order)]
+
+
+class BatchDecoder:
+    """
+    A class that decodes the raw ADC values of many proxies at once, e.g. when all proxies report after a hub reboot.
+    It gives the same positions as decoding each proxy with Proxy.set_position.
+    It is not used by the MessageHandler, which receives one proxy per message and decodes it faster through the lookup tables
+    of the proxy than through an array round trip. The decoder is meant for offline and bulk decoding of many proxies.
+
+    The matchers decode every raw value of the ADC range once into lookup arrays, so arrays of raw values within the range
+    are decoded with a single gather per type. Other values are converted to voltages and matched.
+
+    Args:
+        config (Config, optional): The configuration with the voltage levels and the tile adjustments. Defaults to get_config().
+
+    Attributes:
+        matchers (dict): The VoltageMatcher of each type.
+        lookup_tables (dict): The matched numbers and fallback flags of every raw value within the ADC range, per type.
+        row_adjustments (numpy.ndarray): The row adjustment of each tile number, index 0 for no tile.
+        col_adjustments (numpy.ndarray): The column adjustment of each tile number, index 0 for no tile.
+    """
+
+    def __init__(self, config=None):
+        if config is None:
+            config = get_config()
+
+        self.matchers = {type: VoltageMatcher(config.voltage_lists[type], type) for type in TYPES}
+
+        raw_values = np.arange(ADC_RESOLUTION)
+        self.lookup_tables = {type: self.match(raw_values, type) for type in TYPES}
+
+        self.row_adjustments = np.array([0] + [row for row, _ in config.adjustmentTable], dtype=np.int64)
+        self.col_adjustments = np.array([0] + [col for _, col in config.adjustmentTable], dtype=np.int64)
+
+    def calculate_voltages(self, raw_values, type):
+        """
+        Calculates the voltages of an array of raw ADC values.
+
+        Args:
+            raw_values (numpy.ndarray): The raw values read from the ADC.
+            type (str): The type of voltage divider ("tile", "row", or "col").
+
+        Returns:
+            numpy.ndarray: The calculated voltages.
+        """
+        return (np.asarray(raw_values, dtype=np.float64) / 4095.0) * 3.3 * VOLTAGE_FACTORS[type]
+
+    def match(self, raw_values, type):
+        """
+        Converts an array of raw ADC values to voltages and matches them.
+
+        Args:
+            raw_values (numpy.ndarray): The raw values read from the ADC.
+            type (str): The type of voltage divider ("tile", "row", or "col").
+
+        Returns:
+            tuple: The array of matched numbers and the boolean array flagging the closest level fallbacks.
+        """
+        return self.matchers[type].match(self.calculate_voltages(raw_values, type))
+
+    def decode_values(self, raw_values, type):
+        """
+        Decodes an array of raw ADC values, through the lookup table if all of them are integers within the ADC range.
+
+        Args:
+            raw_values (array-like): The raw values read from the ADC.
+            type (str): The type of voltage divider ("tile", "row", or "col").
+
+        Returns:
+            tuple: The array of matched numbers and the boolean array flagging the closest level fallbacks.
+        """
+        raw_values = np.asarray(raw_values)
+
+        if raw_values.dtype.kind in "iu" and raw_values.size and raw_values.min() >= 0 and raw_values.max() < ADC_RESOLUTION:
+            numbers, fallbacks = self.lookup_tables[type]
+            return numbers[raw_values], fallbacks[raw_values]
+
+        return self.match(raw_values, type)
+
+    def decode(self, tile_values, row_values, col_values):
+        """
+        Decodes the raw ADC values of many proxies to their positions.
+
+        Args:
+            tile_values (array-like): The raw tile values.
+            row_values (array-like): The raw row values.
+            col_values (array-like): The raw column values.
+
+        Returns:
+            tuple: The positions as an array of (row, column) pairs and an array with the fallback flags of each proxy.
+        """
+        decoded = {}
+        flags = np.zeros(len(tile_values), dtype=np.uint8)
+
+        for type, raw_values in zip(TYPES, (tile_values, row_values, col_values)):
+            numbers, fallbacks = self.decode_values(raw_values, type)
+            decoded[type] = numbers
+            flags |= fallbacks.astype(np.uint8) * FALLBACK_BITS[type]
+
+        # Tile numbers start at 1, so index 0 of the adjustments leaves the position unchanged
+        tiles = np.where(decoded["tile"] > 0, decoded["tile"], 0)
+        positions = np.empty((len(flags), 2), dtype=np.int64)
+        positions[:, 0] = decoded["row"] + self.row_adjustments[tiles]
+        positions[:, 1] = decoded["col"] + self.col_adjustments[tiles]
+        return positions, flags
+
+    def update_proxies(self, proxies, tile_values, row_values, col_values, logger=None):
+        """
+        Decodes the raw values of plugged in proxies and updates their values, positions and update time like Proxy.update.
+
+        Args:
+            proxies (list): The proxy objects, in the order of the raw values.
+            tile_values (array-like): The raw tile values.
+            row_values (array-like): The raw row values.
+            col_values (array-like): The raw column values.
+            logger (Logger, optional): Logs one warning for all fallback values.
+
+        Returns:
+            numpy.ndarray: The fallback flags of each proxy.
+        """
+        positions, flags = self.decode(tile_values, row_values, col_values)
+
+        # All proxies of the batch were updated at the same time
+        now = time.time()
+        for i, proxy in enumerate(proxies):
+            proxy.tile_value = int(tile_values[i])
+            proxy.row_value = int(row_values[i])
+            proxy.col_value = int(col_values[i])
+            proxy.is_plugged_in = True
+            proxy.position = int(positions[i, 0]), int(positions[i, 1])
+            proxy.table.last_update[proxy.index] = now
+
+        if logger is not None:
+            fallback_count = int(np.count_nonzero(flags))
+            if fallback_count:
+                logger.warning("(update_proxies) Returning fallback values for %s of %s proxies", fallback_count, len(flags))
+
+        return flags
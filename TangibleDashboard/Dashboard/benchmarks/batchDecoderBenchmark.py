@@ -0,0 +1,66 @@
+# This script measures the decode cost of the BatchDecoder compared to decoding each proxy
+# with Proxy.update, for the raw ADC values all proxies report at the same moment
+# Usage: python benchmarks/batchDecoderBenchmark.py [--repeat N]
+
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from batchDecoder import BatchDecoder
+from logger import NullLogger
+from proxy import ADC_RESOLUTION, Proxy
+
+PROXY_COUNTS = [16, 1000, 100000]
+
+
+def per_proxy_decode(proxy_list, tile_values, row_values, col_values):
+    def run():
+        for proxy, tile, row, col in zip(proxy_list, tile_values, row_values, col_values):
+            proxy.update(tile, row, col, True)
+
+    return run
+
+
+def batch_decode(decoder, tile_values, row_values, col_values):
+    tile_array = np.array(tile_values)
+    row_array = np.array(row_values)
+    col_array = np.array(col_values)
+
+    def run():
+        decoder.decode(tile_array, row_array, col_array)
+
+    return run
+
+
+def measure(run, proxy_count, repeat):
+    number = max(1, 100000 // proxy_count)
+    best = min(timeit.repeat(run, number=number, repeat=repeat))
+    return best / (number * proxy_count) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the decode cost of the batch decoder.")
+    parser.add_argument("--repeat", type=int, default=5, help="Measurements per proxy count, the best one is reported.")
+    args = parser.parse_args()
+
+    logger = NullLogger()
+    decoder = BatchDecoder()
+    rng = np.random.default_rng(0)
+
+    print(f"{'proxies':>8} {'per proxy ns':>13} {'batch ns':>9} {'speedup':>8}")
+    for proxy_count in PROXY_COUNTS:
+        proxy_list = [Proxy(ID, logger) for ID in range(proxy_count)]
+        tile_values, row_values, col_values = (rng.integers(0, ADC_RESOLUTION, proxy_count).tolist() for _ in range(3))
+
+        per_proxy = measure(per_proxy_decode(proxy_list, tile_values, row_values, col_values), proxy_count, args.repeat)
+        batch = measure(batch_decode(decoder, tile_values, row_values, col_values), proxy_count, args.repeat)
+        print(f"{proxy_count:>8} {per_proxy:>13.0f} {batch:>9.0f} {per_proxy / batch:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# Fixtures and baseline handling for the hot path benchmarks (requires pytest-benchmark)
+# Usage: python -m pytest benchmarks [--update-baselines] [--baseline-tolerance 1.0]
+
+import json
+import os
+import platform
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lightController import LightController
+from localBroker import LocalBroker
+from logger import NullLogger
+from messageHandler import MessageHandler
+from proxy import Proxy
+from proxyTable import ProxyTable
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# A benchmark fails if its median round is slower than the baseline by more than this fraction
+DEFAULT_TOLERANCE = 1.0
+
+# Slowdowns up to this many seconds per call never fail, so sub-microsecond benchmarks are not failed by timer noise
+ABSOLUTE_TOLERANCE = 1e-6
+
+
+class FakeSerial:
+    def __init__(self):
+        self.writes = 0
+        self.baudrate = 9600
+
+    def write(self, data):
+        self.writes += 1
+        return len(data)
+
+    def readline(self):
+        return b""
+
+
+def machine_id():
+    """
+    Returns an identifier of the CPU and Python version, baselines are only compared on the machine they were recorded on.
+
+    """
+    cpu = platform.processor()
+    if os.path.exists("/proc/cpuinfo"):
+        with open("/proc/cpuinfo", "r") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+    return f"{platform.system()} {platform.machine()} {cpu} Python {platform.python_version()}"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("dashboard baselines")
+    group.addoption("--update-baselines", action="store_true", help="Store the results as the new baselines instead of comparing them.")
+    group.addoption("--baseline-tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown against the baselines, as a fraction.")
+    group.addoption("--baseline-file", default=BASELINE_FILE, help="The JSON file of the baselines.")
+
+
+@pytest.fixture(scope="session")
+def baselines(request):
+    path = request.config.getoption("--baseline-file")
+    machines = {}
+    if os.path.exists(path):
+        with open(path, "r") as baseline_file:
+            machines = json.load(baseline_file)
+
+    machine = machine_id()
+    stored = machines.get(machine, {})
+    results = {}
+    yield stored, results
+
+    if request.config.getoption("--update-baselines") and results:
+        stored.update(results)
+        machines[machine] = stored
+        with open(path, "w") as baseline_file:
+            json.dump(machines, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+
+
+@pytest.fixture
+def hot_path(benchmark, baselines, request):
+    """
+    Benchmarks a function and compares the median cost of one call with the stored baseline.
+
+    """
+    stored, results = baselines
+    name = f"{request.module.__name__}::{request.node.name}"
+
+    def run(function, *args):
+        benchmark(function, *args)
+        if benchmark.disabled:
+            return
+
+        seconds = benchmark.stats.stats.median
+        if request.config.getoption("--update-baselines"):
+            results[name] = {"min": benchmark.stats.stats.min, "median": seconds}
+            return
+
+        baseline = stored.get(name)
+        if baseline is None:
+            return
+
+        # The median is less affected by single fast or slow rounds than the minimum
+        tolerance = request.config.getoption("--baseline-tolerance")
+        limit = max(baseline["median"] * (1 + tolerance), baseline["median"] + ABSOLUTE_TOLERANCE)
+        if seconds > limit:
+            pytest.fail(f"{name} regressed: median {seconds * 1e6:.2f} us per call, baseline {baseline['median'] * 1e6:.2f} us "
+                        f"(limit {limit * 1e6:.2f} us)", pytrace=False)
+
+    return run
+
+
+@pytest.fixture
+def logger():
+    return NullLogger()
+
+
+@pytest.fixture
+def serial_port():
+    return FakeSerial()
+
+
+@pytest.fixture
+def light_controller(logger, serial_port):
+    controller = LightController(None, 9600, logger, serial_port=serial_port)
+    # The worker thread sends the first message and then waits, so the benchmarks only measure the enqueue cost
+    controller.delay = 3600
+    return controller
+
+
+@pytest.fixture
+def make_handler(logger, light_controller):
+    """
+    Creates a MessageHandler with a number of proxies, connected to a LocalBroker.
+
+    """
+    def make(proxy_count, **kwargs):
+        table = ProxyTable()
+        proxy_list = [Proxy(ID, logger, table=table) for ID in range(proxy_count)]
+        handler = MessageHandler("localhost", proxy_list, light_controller, "dashboardAnimations", "dashboardOverride", logger,
+                                 client=LocalBroker().client(), **kwargs)
+        handler.start()
+        return handler
+
+    return make
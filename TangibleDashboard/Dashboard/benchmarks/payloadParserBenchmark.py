@@ -0,0 +1,91 @@
+# This script measures the per-payload cost of the payload parser compared to the
+# previous parsing (payload.split and a safe_int_cast with try/except and an error log per field)
+# Usage: python benchmarks/payloadParserBenchmark.py [--payloads N]
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from payloadParser import PARSERS
+
+# Valid and malformed payloads of each shape, a flood of bad input is mostly the latter
+PAYLOADS = {
+    "proxy_state": (["3823,3733,3226,1", "2781,2568,1993,x", "499,1418,842,0"], ["3823,37a3,3226,1", "zz,zz,zz,q", "3823,3733,3226,q"]),
+    "state": (["0", "1", "2"], ["a", "", "1.5"]),
+    "path": (["1,2", "0,3", "3,1"], ["1,b", "a,b", "x,2"]),
+    "override": (["1,5,7", "2,9,3", "3,12,14"], ["x,5,7", "1,5,y", "a,b,c"]),
+}
+
+class CountingLogger:
+    def __init__(self):
+        self.count = 0
+
+    def error(self, message, *args, **kwargs):
+        self.count += 1
+
+
+def legacy_parsers():
+    logger = CountingLogger()
+
+    def safe_int_cast(value):
+        try:
+            return int(value)
+        except (ValueError, TypeError) as e:
+            logger.error("(safe_int_cast) Failed to cast '%s' to int: %s", value, e)
+            return None
+
+    def proxy_state(payload):
+        data = payload.split(",")
+        if len(data) != 4:
+            return None
+        if data[3] == "x":
+            return safe_int_cast(data[0]), safe_int_cast(data[1]), safe_int_cast(data[2]), None
+        return safe_int_cast(data[0]), safe_int_cast(data[1]), safe_int_cast(data[2]), safe_int_cast(data[3])
+
+    def state(payload):
+        return safe_int_cast(payload)
+
+    def path(payload):
+        data = payload.split(",")
+        if len(data) != 2:
+            return None
+        return safe_int_cast(data[0]), safe_int_cast(data[1])
+
+    def override(payload):
+        parts = payload.split(",")
+        if len(parts) != 3:
+            return None
+        return safe_int_cast(parts[0]), safe_int_cast(parts[1]), safe_int_cast(parts[2])
+
+    return {"proxy_state": proxy_state, "state": state, "path": path, "override": override}
+
+
+def measure(parser, payloads, count):
+    def run():
+        for payload in payloads:
+            parser(payload)
+
+    repetitions = max(1, count // len(payloads))
+    best = min(timeit.repeat(run, number=repetitions, repeat=5))
+    return best / (repetitions * len(payloads)) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the payload parser with the previous split and safe_int_cast parsing.")
+    parser.add_argument("--payloads", type=int, default=30000, help="Number of payloads parsed per measurement.")
+    args = parser.parse_args()
+
+    legacy = legacy_parsers()
+    print(f"{'shape':<12} {'payloads':<10} {'legacy (ns)':>12} {'parser (ns)':>12} {'speedup':>8}")
+    for shape, (valid, malformed) in PAYLOADS.items():
+        for name, payloads in (("valid", valid), ("malformed", malformed)):
+            legacy_ns = measure(legacy[shape], payloads, args.payloads)
+            parser_ns = measure(PARSERS[shape], payloads, args.payloads)
+            print(f"{shape:<12} {name:<10} {legacy_ns:>12.0f} {parser_ns:>12.0f} {legacy_ns / parser_ns:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# This script measures how the (re)connect cost of MessageHandler.on_connect grows with the proxy count
+# for each subscribe mode, counting the SUBSCRIBE packets that would be sent to the broker
+# Usage: python benchmarks/subscribeBenchmark.py
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from logger import NullLogger
+from messageHandler import SUBSCRIBE_MODES, MessageHandler
+from proxy import Proxy
+from proxyTable import ProxyTable
+
+PROXY_COUNTS = [4, 100, 500, 1000]
+
+
+class CountingClient:
+    def __init__(self):
+        self.packets = 0
+
+    def subscribe(self, topic, qos=0):
+        self.packets += 1
+
+
+def main():
+    print(f"{'mode':>9} {'proxies':>8} {'packets':>8} {'on_connect ms':>14}")
+    for mode in SUBSCRIBE_MODES:
+        for proxy_count in PROXY_COUNTS:
+            logger = NullLogger()
+            table = ProxyTable()
+            proxy_list = [Proxy(ID, logger, table=table) for ID in range(proxy_count)]
+            wildcard_filter = "+" if mode == "wildcard" else None
+            handler = MessageHandler("localhost", proxy_list, None, "dashboardAnimations", "dashboardOverride", logger,
+                                     subscribe_mode=mode, wildcard_filter=wildcard_filter)
+            client = CountingClient()
+
+            start = time.perf_counter()
+            handler.on_connect(client, None, None, 0)
+            elapsed = time.perf_counter() - start
+
+            print(f"{mode:>9} {proxy_count:>8} {client.packets:>8} {elapsed * 1000:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Tests of the priority order, supersession and counters of the animation queue
+# Usage: python -m pytest benchmarks/test_animationQueue.py
+
+import time
+
+from animationQueue import COMPACT_THRESHOLD, PRIORITY_BOOT, PRIORITY_COORDINATES, PRIORITY_OVERRIDE, PRIORITY_PATH, AnimationQueue
+
+
+def drain(queue):
+    messages = []
+    while True:
+        item = queue.get_nowait()
+        if item is None:
+            return messages
+        messages.append(item[0])
+
+
+def test_priority_order():
+    queue = AnimationQueue()
+    queue.put("boot", PRIORITY_BOOT)
+    queue.put("coordinates", PRIORITY_COORDINATES)
+    queue.put("path", PRIORITY_PATH)
+    queue.put("override", PRIORITY_OVERRIDE)
+
+    assert drain(queue) == ["override", "path", "coordinates", "boot"]
+
+
+def test_fifo_within_priority():
+    queue = AnimationQueue()
+    for i in range(5):
+        queue.put(i, PRIORITY_COORDINATES)
+    queue.put("path", PRIORITY_PATH)
+
+    assert drain(queue) == ["path", 0, 1, 2, 3, 4]
+
+
+def test_same_key_supersedes():
+    queue = AnimationQueue()
+    queue.put("first", PRIORITY_COORDINATES, ("coordinates", 1, 2))
+    queue.put("other", PRIORITY_COORDINATES, ("coordinates", 3, 4))
+
+    # The newer message keeps the place of the replaced one
+    assert queue.put("second", PRIORITY_COORDINATES, ("coordinates", 1, 2))
+    assert queue.qsize() == 2
+    assert drain(queue) == ["second", "other"]
+    assert queue.superseded == 1
+
+
+def test_same_position_supersedes_across_proxies():
+    queue = AnimationQueue()
+    queue.put("proxy 1", PRIORITY_COORDINATES, ("coordinates", 1, 2), proxy_ID=1, position=(1, 2))
+
+    # Two proxies shown at the same position light the same LEDs, the newer message is attributed to its proxy
+    assert queue.put("proxy 2", PRIORITY_COORDINATES, ("coordinates", 1, 2), proxy_ID=2, position=(1, 2))
+    message, _, key, proxy_ID, position = queue.get_nowait()
+    assert (message, key, proxy_ID, position) == ("proxy 2", ("coordinates", 1, 2), 2, (1, 2))
+    assert queue.get_nowait() is None
+
+
+def test_group_supersedes_other_key():
+    queue = AnimationQueue()
+    queue.put("proxy 1 at 1,2", PRIORITY_COORDINATES, ("coordinates", 1, 2), 1, (1, 2), ("coordinates", 1))
+    queue.put("proxy 2 at 5,6", PRIORITY_COORDINATES, ("coordinates", 5, 6), 2, (5, 6), ("coordinates", 2))
+    queue.put("proxy 1 at 3,4", PRIORITY_COORDINATES, ("coordinates", 3, 4), 1, (3, 4), ("coordinates", 1))
+
+    assert queue.qsize() == 2
+    assert drain(queue) == ["proxy 1 at 3,4", "proxy 2 at 5,6"]
+
+
+def test_higher_priority_moves_up():
+    queue = AnimationQueue()
+    queue.put("path", PRIORITY_PATH)
+    queue.put("coordinates", PRIORITY_COORDINATES, ("coordinates", 1, 2))
+
+    # The replaced entry stays in the heap, it is skipped when it reaches the top
+    queue.put("override", PRIORITY_OVERRIDE, ("coordinates", 1, 2))
+    assert queue.qsize() == 2
+    assert len(queue.heap) == 3
+    assert drain(queue) == ["override", "path"]
+    assert queue.qsize() == 0
+
+
+def test_lower_priority_keeps_place():
+    queue = AnimationQueue()
+    queue.put("override", PRIORITY_OVERRIDE, ("coordinates", 1, 2))
+    queue.put("path", PRIORITY_PATH)
+
+    queue.put("coordinates", PRIORITY_COORDINATES, ("coordinates", 1, 2))
+    assert drain(queue) == ["coordinates", "path"]
+
+
+def test_stale_entries_are_compacted():
+    queue = AnimationQueue()
+    for i in range(COMPACT_THRESHOLD * 4):
+        queue.put(i, PRIORITY_COORDINATES, "a", group=1)
+        queue.put(i, PRIORITY_COORDINATES, "b", group=2)
+        # Takes over the message of key "a" and drops the other message of group 2, which stays in the heap
+        queue.put(i, PRIORITY_COORDINATES, "a", group=2)
+
+    assert queue.qsize() == 1
+    assert len(queue.heap) <= COMPACT_THRESHOLD + 1
+    assert drain(queue) == [COMPACT_THRESHOLD * 4 - 1]
+
+
+def test_depth_and_wait_stats():
+    queue = AnimationQueue()
+    queue.put("first", PRIORITY_COORDINATES)
+    queue.put("second", PRIORITY_COORDINATES)
+    assert queue.stats()["depth"] == 2
+
+    time.sleep(0.01)
+    _, wait, _, _, _ = queue.get_nowait()
+    assert wait >= 0.01
+    queue.get(timeout=1)
+
+    stats = queue.stats()
+    assert stats["depth"] == 0
+    assert stats["dequeued"] == 2
+    assert stats["max_wait"] >= wait
+    assert 0 < stats["average_wait"] <= stats["max_wait"]
+    assert queue.get(timeout=0.01) is None
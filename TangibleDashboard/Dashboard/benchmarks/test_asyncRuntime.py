@@ -0,0 +1,99 @@
+# Runs the asyncio runtime against the LocalBroker
+# Usage: python -m pytest benchmarks/test_asyncRuntime.py
+
+import asyncio
+import time
+
+from asyncRuntime import AsyncLightController, AsyncMessageHandler, run_dashboard
+from localBroker import LocalBroker, LocalClient, LocalMessage
+from proxy import Proxy
+from proxyTable import ProxyTable
+
+# Time (in seconds) a test waits for the event loop to process the published messages
+WAIT_TIMEOUT = 5.0
+
+# Time (in seconds) the connect of a SlowClient blocks, like a DNS lookup of an unreachable name server
+CONNECT_DELAY = 0.2
+
+
+class SlowClient(LocalClient):
+    def connect(self, host=None, port=1883, keepalive=60):
+        time.sleep(CONNECT_DELAY)
+        return super().connect(host, port, keepalive)
+
+
+def make_dashboard(logger, serial_port, broker, client=None):
+    light_controller = AsyncLightController(None, 9600, logger, serial_port=serial_port)
+    table = ProxyTable()
+    proxy_list = [Proxy(ID, logger, table=table) for ID in range(4)]
+    message_handler = AsyncMessageHandler("localhost", proxy_list, light_controller, "dashboardAnimations", "dashboardOverride",
+                                          logger, client=client if client is not None else broker.client())
+    return message_handler, light_controller
+
+
+async def wait_for(condition):
+    deadline = asyncio.get_running_loop().time() + WAIT_TIMEOUT
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.001)
+    return True
+
+
+def test_message_before_run_is_dropped(logger, serial_port):
+    message_handler, _ = make_dashboard(logger, serial_port, LocalBroker())
+    message_handler.on_message(message_handler.client, None, LocalMessage("proxy_state_update_proxy_1", b"3823,3733,3226,1"))
+    assert message_handler.dropped == 1
+
+
+def test_run_dashboard(logger, serial_port):
+    broker = LocalBroker()
+    message_handler, light_controller = make_dashboard(logger, serial_port, broker)
+    publisher = broker.client()
+    publisher.connect()
+
+    # Retained messages are delivered while run() connects
+    publisher.publish("proxy_state_update_proxy_1", "3823,3733,3226,1", retain=True)
+
+    async def scenario():
+        task = asyncio.ensure_future(run_dashboard(message_handler, light_controller))
+        proxy_1, proxy_2 = message_handler.proxies.get(1), message_handler.proxies.get(2)
+        assert await wait_for(lambda: proxy_1.state == 1)
+
+        # Messages published from another thread are handed over to the event loop
+        await asyncio.to_thread(publisher.publish, "proxy_state_update_proxy_2", "3823,3733,3226,2")
+        assert await wait_for(lambda: proxy_2.state == 2)
+        assert await wait_for(lambda: serial_port.writes > 0)
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    assert message_handler.dropped == 0
+    assert not message_handler.client.is_connected()
+
+
+def test_connect_does_not_block_loop(logger, serial_port):
+    broker = LocalBroker()
+    message_handler, light_controller = make_dashboard(logger, serial_port, broker, SlowClient(broker))
+
+    async def scenario():
+        task = asyncio.ensure_future(message_handler.run())
+        ticks = 0
+        start = time.monotonic()
+        while not message_handler.client.is_connected() and time.monotonic() - start < WAIT_TIMEOUT:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return ticks
+
+    # The loop kept running while the client connected
+    assert asyncio.run(scenario()) > 1
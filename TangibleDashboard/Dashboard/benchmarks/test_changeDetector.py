@@ -0,0 +1,123 @@
+# Equivalence tests of the rule table of the change detector against the if/else chain it replaced
+# Usage: python -m pytest benchmarks/test_changeDetector.py
+
+import itertools
+
+import pytest
+from localBroker import LocalBroker
+from messageHandler import MessageHandler
+from proxy import Proxy
+from proxyTable import ProxyTable
+
+HUB_POSITION = (5, 5)
+PREVIOUS_POSITION = (1, 2)
+MOVED_POSITION = (3, 4)
+
+
+class RecordingLightController:
+    def __init__(self):
+        self.calls = []
+
+    def send_path(self, *args, **kwargs):
+        self.calls.append(("send_path", args, kwargs))
+
+    def send_coordinates(self, *args, **kwargs):
+        self.calls.append(("send_coordinates", args, kwargs))
+
+
+def baseline_compare_proxy_data(handler, proxy, change_type):
+    # The compare_proxy_data of the MessageHandler before the change detector
+    table = proxy.table
+    index = proxy.index
+
+    if change_type == "proxy":
+        if(table.row[index] != table.announced_row[index] or table.col[index] != table.announced_col[index]):
+            if(proxy.override):
+                handler.handle_animation(f"{proxy.ID},0", "path")
+            else:
+                handler.handle_animation(proxy.ID, "coordinates")
+                handler.update_proxy_data(proxy)
+
+        elif(table.state[index] != table.announced_state[index]):
+            handler.handle_animation(f"{proxy.ID},0", "path")
+            handler.update_proxy_data(proxy)
+        else:
+            return
+    elif change_type == "hub":
+        if(table.state[index] != table.announced_state[index]):
+            handler.handle_animation(f"0, {proxy.ID}", "path")
+            handler.update_proxy_data(proxy)
+        else:
+            return
+    else:
+        handler.logger.warning("(compare_proxy_data) Invalid change type '%s'.", change_type)
+
+
+def make_handler(logger, previous_plugged_in, plugged_in, moved, state_changed, override):
+    """
+    Creates a MessageHandler with the hub and one proxy, which was last announced plugged in or not and then updated.
+
+    """
+    table = ProxyTable()
+    hub, proxy = Proxy(0, logger, table=table), Proxy(1, logger, table=table)
+    handler = MessageHandler("localhost", [hub, proxy], RecordingLightController(), "dashboardAnimations", "dashboardOverride",
+                             logger, client=LocalBroker().client())
+
+    hub.position = HUB_POSITION
+    hub.is_plugged_in = True
+    hub.state = 1
+
+    if previous_plugged_in:
+        proxy.position = PREVIOUS_POSITION
+        proxy.is_plugged_in = True
+        proxy.state = 1
+        handler.update_proxy_data(proxy)
+
+    proxy.position = MOVED_POSITION if moved else (PREVIOUS_POSITION if previous_plugged_in else None)
+    proxy.is_plugged_in = plugged_in
+    proxy.state = (2 if state_changed else 1) if previous_plugged_in else (1 if state_changed else None)
+    proxy.override = override
+    return handler, proxy
+
+
+def announced(proxy):
+    table, index = proxy.table, proxy.index
+    return table.announced_row[index], table.announced_col[index], table.announced_state[index]
+
+
+@pytest.mark.parametrize("change_type", ["proxy", "hub"])
+@pytest.mark.parametrize("previous_plugged_in, plugged_in", list(itertools.product([False, True], repeat=2)))
+@pytest.mark.parametrize("moved", [False, True])
+@pytest.mark.parametrize("state_changed", [False, True])
+@pytest.mark.parametrize("override", [False, True])
+def test_matches_baseline(logger, change_type, previous_plugged_in, plugged_in, moved, state_changed, override):
+    expected_handler, expected_proxy = make_handler(logger, previous_plugged_in, plugged_in, moved, state_changed, override)
+    baseline_compare_proxy_data(expected_handler, expected_proxy, change_type)
+
+    handler, proxy = make_handler(logger, previous_plugged_in, plugged_in, moved, state_changed, override)
+    handler.compare_proxy_data(proxy, change_type)
+
+    assert handler.light_controller.calls == expected_handler.light_controller.calls
+    assert announced(proxy) == announced(expected_proxy)
+
+    # The batch of the coalesced updates decides the same calls
+    handler, proxy = make_handler(logger, previous_plugged_in, plugged_in, moved, state_changed, override)
+    handler.change_detector.detect_batch([(proxy, change_type)], handler.perform_action)
+
+    assert handler.light_controller.calls == expected_handler.light_controller.calls
+    assert announced(proxy) == announced(expected_proxy)
+
+
+def test_baseline_emits_animations(logger):
+    # The equivalence above is only meaningful if the setups reach every branch of the baseline
+    handler, proxy = make_handler(logger, True, True, True, False, False)
+    baseline_compare_proxy_data(handler, proxy, "proxy")
+    assert handler.light_controller.calls == [("send_coordinates", (3, 4, 2), {"proxy_ID": 1})]
+
+    handler, proxy = make_handler(logger, True, True, True, False, True)
+    baseline_compare_proxy_data(handler, proxy, "proxy")
+    assert handler.light_controller.calls == [("send_path", (3, 4, 5, 5, 1, ("path", 1, 0)), {"proxy_ID": 1})]
+
+    handler, proxy = make_handler(logger, True, True, False, True, False)
+    baseline_compare_proxy_data(handler, proxy, "hub")
+    assert handler.light_controller.calls == [("send_path", (5, 5, 1, 2, 1, ("path", 0, 1)), {"proxy_ID": 0})]
@@ -0,0 +1,61 @@
+# Tests of the event journal with values outside of its record fields, the attribution of sent animations and the segment retention
+# Usage: python -m pytest benchmarks/test_eventJournal.py
+
+import os
+import time
+
+from eventJournal import EVENT_ANIMATION_SENT, EVENT_OVERRIDE, EVENT_PROXY_STATE, UNSET, EventJournal
+from journalQuery import query
+from lightController import LightController
+from localBroker import LocalMessage
+
+# Time (in seconds) a test waits for the worker thread of the light controller to send a message
+WAIT_TIMEOUT = 5.0
+
+
+def test_out_of_range_fields(tmp_path, make_handler):
+    journal = EventJournal(str(tmp_path))
+    handler = make_handler(4, journal=journal)
+
+    # A state beyond int8 and a position beyond int16 are handled and stored as UNSET
+    handler.on_message(handler.client, None, LocalMessage(handler.proxy_topics(1)[0], b"3823,3733,3226,200"))
+    handler.on_message(handler.client, None, LocalMessage(handler.override_topic, b"2,40000,3"))
+    journal.close()
+
+    events = list(query(str(tmp_path)))
+    proxy_state = [event for event in events if event.event_type == EVENT_PROXY_STATE]
+    override = [event for event in events if event.event_type == EVENT_OVERRIDE]
+    assert handler.proxies.get(1).state == 200
+    assert proxy_state[0].state == UNSET
+    assert (override[0].proxy_ID, override[0].row, override[0].col) == (2, UNSET, 3)
+    assert journal.failed == 0
+
+
+def test_sent_animation_attribution(tmp_path, logger, serial_port):
+    journal = EventJournal(str(tmp_path))
+    light_controller = LightController(None, 9600, logger, serial_port=serial_port, journal=journal)
+    light_controller.delay = 3600
+
+    # The proxy ID is passed along with the message, the supersession key stays the position
+    light_controller.send_coordinates(2, 3, proxy_ID=1)
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while journal.written == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    journal.close()
+
+    sent = [event for event in query(str(tmp_path)) if event.event_type == EVENT_ANIMATION_SENT]
+    assert len(sent) == 1
+    assert (sent[0].proxy_ID, sent[0].row, sent[0].col) == (1, 2, 3)
+
+
+def test_retention(tmp_path):
+    journal = EventJournal(str(tmp_path), segment_size=64, max_bytes=4096)
+    for _ in range(64 * 20):
+        journal.record(EVENT_PROXY_STATE, 1, (2, 3), 1)
+    journal.close()
+
+    segments = journal.segments()
+    closed_size = sum(os.path.getsize(path) for path in segments[:-1])
+    assert journal.deleted > 0
+    assert closed_size <= 4096
+    assert len(os.listdir(tmp_path)) == 2 * len(segments)
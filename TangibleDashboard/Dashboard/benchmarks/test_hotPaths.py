@@ -0,0 +1,167 @@
+# Benchmarks of the per-message hot paths, compared with the baselines in benchmarks/baselines.json
+# Usage: python -m pytest benchmarks [--update-baselines]
+
+import itertools
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from latencyTracer import LatencyTracer
+from localBroker import LocalMessage
+from metrics import DashboardMetrics
+from payloadParser import PARSERS
+from proxy import Proxy
+from proxyTable import ProxyTable
+
+# Scenarios run for each number of registered proxies
+PROXY_COUNTS = [4, 100, 1000]
+
+# Raw ADC values that match a position within the tolerance, and ones that need the closest match fallback
+MATCHING_VALUES = [3823, 2568, 1993]
+FALLBACK_VALUES = [4095, 3000, 0]
+
+# Payloads of each topic type, cycled through so the state keeps changing
+TOPIC_PAYLOADS = {
+    "proxy_state": ["3823,3733,3226,1", "2781,2568,1993,2", "499,1418,842,0"],
+    "hub_state": ["0", "1", "2"],
+    "animation": ["1,2", "2,3", "3,1"],
+    "override": ["1,5,7", "2,9,3", "3,12,14"],
+    "unknown": ["1"],
+}
+
+
+# Valid and malformed payloads of each shape of the payload parser
+PARSER_PAYLOADS = {
+    "proxy_state": (["3823,3733,3226,1", "2781,2568,1993,x", "499,1418,842,0"], ["3823,37a3,3226,1", "1,2", "3823,3733,3226,q"]),
+    "state": (["0", "1", "2"], ["a", "", "1.5"]),
+    "path": (["1,2", "0,3", "3,1"], ["1", "1,b", "1,2,3"]),
+    "override": (["1,5,7", "2,9,3", "3,12,14"], ["1,5", "x,5,7", "1,5,y"]),
+}
+
+
+def topic(handler, topic_type, proxy_ID):
+    proxy_state_update_topic, hub_state_update_topic = handler.proxy_topics(proxy_ID)
+    return {
+        "proxy_state": proxy_state_update_topic,
+        "hub_state": hub_state_update_topic,
+        "animation": handler.animation_topic,
+        "override": handler.override_topic,
+        "unknown": f"proxy_state_update_proxy_{proxy_ID + 100000}",
+    }[topic_type]
+
+
+@pytest.mark.parametrize("type", ["tile", "row", "col"])
+@pytest.mark.parametrize("values", ["matching", "fallback"])
+def test_convert_value(hot_path, logger, type, values):
+    proxy = Proxy(0, logger, table=ProxyTable())
+    raw_values = itertools.cycle(MATCHING_VALUES if values == "matching" else FALLBACK_VALUES)
+    hot_path(lambda: proxy.convert_value(next(raw_values), type))
+
+
+@pytest.mark.parametrize("proxy_count", PROXY_COUNTS)
+def test_set_position(hot_path, logger, proxy_count):
+    table = ProxyTable()
+    proxy_list = [Proxy(ID, logger, table=table) for ID in range(proxy_count)]
+    for proxy, values in zip(proxy_list, itertools.cycle(TOPIC_PAYLOADS["proxy_state"])):
+        proxy.update(*[int(value) for value in values.split(",")[:3]], True, 0)
+
+    proxies = itertools.cycle(proxy_list)
+    hot_path(lambda: next(proxies).set_position())
+
+
+@pytest.mark.parametrize("proxy_count", PROXY_COUNTS)
+@pytest.mark.parametrize("topic_type", list(TOPIC_PAYLOADS))
+def test_on_message(hot_path, make_handler, proxy_count, topic_type):
+    handler = make_handler(proxy_count)
+    messages = itertools.cycle([
+        LocalMessage(topic(handler, topic_type, ID), payload.encode())
+        for ID in range(proxy_count)
+        for payload in TOPIC_PAYLOADS[topic_type]
+    ])
+    hot_path(lambda: handler.on_message(handler.client, None, next(messages)))
+
+
+@pytest.mark.parametrize("proxy_count", PROXY_COUNTS)
+def test_on_message_traced(hot_path, make_handler, proxy_count):
+    handler = make_handler(proxy_count, tracer=LatencyTracer())
+    messages = itertools.cycle([
+        LocalMessage(topic(handler, "proxy_state", ID), payload.encode())
+        for ID in range(proxy_count)
+        for payload in TOPIC_PAYLOADS["proxy_state"]
+    ])
+    hot_path(lambda: handler.on_message(handler.client, None, next(messages)))
+
+
+@pytest.mark.parametrize("proxy_count", PROXY_COUNTS)
+def test_on_message_metrics(hot_path, make_handler, proxy_count):
+    handler = make_handler(proxy_count, metrics=DashboardMetrics())
+    messages = itertools.cycle([
+        LocalMessage(topic(handler, "proxy_state", ID), payload.encode())
+        for ID in range(proxy_count)
+        for payload in TOPIC_PAYLOADS["proxy_state"]
+    ])
+    hot_path(lambda: handler.on_message(handler.client, None, next(messages)))
+
+
+@pytest.mark.parametrize("proxy_count", PROXY_COUNTS)
+def test_on_message_duplicate(hot_path, make_handler, proxy_count):
+    handler = make_handler(proxy_count, duplicate_ttl=3600)
+    messages = [LocalMessage(topic(handler, "proxy_state", ID), TOPIC_PAYLOADS["proxy_state"][0].encode()) for ID in range(proxy_count)]
+    # Every message was already seen, so all of them are suppressed
+    for message in messages:
+        handler.on_message(handler.client, None, message)
+    messages = itertools.cycle(messages)
+    hot_path(lambda: handler.on_message(handler.client, None, next(messages)))
+
+
+@pytest.mark.parametrize("proxy_count", PROXY_COUNTS)
+@pytest.mark.parametrize("change_type", ["proxy", "hub"])
+def test_compare_proxy_data(hot_path, make_handler, proxy_count, change_type):
+    handler = make_handler(proxy_count)
+    proxy_list = list(handler.proxies)
+    for proxy in proxy_list:
+        proxy.update(3823, 3733, 3226, True, 0)
+        handler.update_proxy_data(proxy)
+
+    # Every call changes the state of the next proxy, so each comparison queues an animation
+    changes = itertools.cycle([(proxy, state) for state in (1, 2, 0) for proxy in proxy_list])
+
+    def compare():
+        proxy, state = next(changes)
+        proxy.state = state
+        handler.compare_proxy_data(proxy, change_type)
+
+    hot_path(compare)
+
+
+@pytest.mark.parametrize("animation_type", ["path", "coordinates"])
+def test_handle_animation(hot_path, make_handler, animation_type):
+    handler = make_handler(4)
+    payloads = itertools.cycle(["1,2", "2,3", "3,1"] if animation_type == "path" else [1, 2, 3])
+    hot_path(lambda: handler.handle_animation(next(payloads), animation_type))
+
+
+@pytest.mark.parametrize("value", ["42", "-7", "x", None])
+def test_safe_int_cast(hot_path, make_handler, value):
+    handler = make_handler(4)
+    hot_path(handler.safe_int_cast, value)
+
+
+@pytest.mark.parametrize("shape", list(PARSERS))
+@pytest.mark.parametrize("payloads", ["valid", "malformed"])
+def test_parse_payload(hot_path, shape, payloads):
+    valid, malformed = PARSER_PAYLOADS[shape]
+    parser = PARSERS[shape]
+    values = itertools.cycle(valid if payloads == "valid" else malformed)
+    hot_path(lambda: parser(next(values)))
+
+
+@pytest.mark.parametrize("animation_type", ["coordinates", "path"])
+def test_light_controller_enqueue(hot_path, light_controller, animation_type):
+    positions = itertools.cycle(range(16))
+
+    if animation_type == "coordinates":
+        hot_path(lambda: light_controller.send_coordinates(next(positions), 4))
+    else:
+        hot_path(lambda: light_controller.send_path(next(positions), 4, 8, 12))
@@ -0,0 +1,59 @@
+# Tests of the baud rate negotiation of the light controller with a scripted ESP32
+# Usage: python -m pytest benchmarks/test_lightController.py
+
+import time
+
+from lightController import LightController
+
+
+class ScriptedSerial:
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.baudrate = 9600
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+        return len(data)
+
+    def readline(self):
+        if self.lines:
+            return self.lines.pop(0)
+        time.sleep(0.001)
+        return b""
+
+    def reset_input_buffer(self):
+        pass
+
+
+def make_controller(logger, lines):
+    serial_port = ScriptedSerial(lines)
+    light_controller = LightController(None, 9600, logger, serial_port=serial_port)
+    light_controller.delay = 3600
+    return light_controller, serial_port
+
+
+def test_negotiation_reads_ready(logger):
+    light_controller, serial_port = make_controller(logger, [b"BAUD,115200\n", b"READY\n"])
+
+    assert light_controller.negotiate_baudrate(115200) == 115200
+    assert serial_port.baudrate == 115200
+    # The ready message of the switch is consumed, the reader thread only sees the ones of the animations
+    assert serial_port.lines == []
+
+
+def test_negotiation_without_support(logger):
+    # Firmware without baud rate support answers the unknown request with a ready message only
+    light_controller, serial_port = make_controller(logger, [b"READY\n"])
+
+    start = time.monotonic()
+    assert light_controller.negotiate_baudrate(115200) == 9600
+    assert time.monotonic() - start < 1
+    assert serial_port.lines == []
+
+
+def test_negotiation_rejected(logger):
+    light_controller, serial_port = make_controller(logger, [b"BAUD,ERR\n", b"READY\n"])
+
+    assert light_controller.negotiate_baudrate(115200) == 9600
+    assert serial_port.lines == []
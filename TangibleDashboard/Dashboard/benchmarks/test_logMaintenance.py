@@ -0,0 +1,33 @@
+# Tests of the background compression of rotated logs
+# Usage: python -m pytest benchmarks/test_logMaintenance.py
+
+import os
+
+from logMaintenance import PARTIAL_SUFFIX, LogMaintainer, iter_log_lines
+
+
+def test_startup_error_keeps_maintaining(tmp_path, monkeypatch, capsys):
+    log_file_path = str(tmp_path / "dashboard.log")
+    rotated_path = log_file_path + ".2024-05-14"
+    partial_path = log_file_path + ".2024-05-13.gz" + PARTIAL_SUFFIX
+    with open(rotated_path, "w") as rotated_file:
+        rotated_file.write("line\n")
+    open(partial_path, "w").close()
+
+    remove = os.remove
+
+    def failing_remove(path):
+        if path == partial_path:
+            raise PermissionError("read-only")
+        remove(path)
+
+    monkeypatch.setattr(os, "remove", failing_remove)
+
+    # The leftover partial file cannot be removed, the rotated file is still compressed
+    maintainer = LogMaintainer(log_file_path)
+    maintainer.start()
+    maintainer.stop()
+
+    assert maintainer.compressed == 1
+    assert list(iter_log_lines([rotated_path + ".gz"])) == ["line"]
+    assert "read-only" in capsys.readouterr().err
@@ -0,0 +1,179 @@
+# Behaviour tests of the MessageHandler and its duplicate filter on the LocalBroker
+# Usage: python -m pytest benchmarks/test_messageHandler.py
+
+import time
+
+import pytest
+from asyncRuntime import AsyncLightController
+from duplicateFilter import DuplicateFilter
+from messageHandler import MessageHandler
+
+# Time (in seconds) a test waits for the workers to process the published messages
+WAIT_TIMEOUT = 5.0
+
+
+class RaisingLightController:
+    def send_path(self, *args, **kwargs):
+        raise RuntimeError("serial port closed")
+
+    def send_coordinates(self, *args, **kwargs):
+        raise RuntimeError("serial port closed")
+
+
+class RecordingLightController:
+    def __init__(self):
+        self.coordinates = []
+
+    def send_path(self, *args, **kwargs):
+        pass
+
+    def send_coordinates(self, x, y, priority=None, key=None, proxy_ID=None):
+        self.coordinates.append((proxy_ID, (x, y)))
+
+
+class RecordingClient:
+    def __init__(self):
+        self.topic_filters = []
+
+    def subscribe(self, topic, qos=0):
+        self.topic_filters.extend(topic if isinstance(topic, list) else [(topic, qos)])
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def test_worker_survives_failing_message(make_handler):
+    handler = make_handler(4, worker_count=1)
+    handler.light_controller = RaisingLightController()
+    client = handler.client
+
+    # The coordinates animation of the override raises inside the worker
+    client.publish(handler.override_topic, "1,5,7")
+    client.publish(handler.proxy_topics(2)[0], "3823,3733,3226,1")
+
+    proxy = handler.proxies.get(2)
+    assert wait_for(lambda: proxy.state == 1)
+    assert all(worker.is_alive() for worker in handler.workers)
+    handler.stop()
+
+
+def test_duplicate_filter_ttl():
+    duplicate_filter = DuplicateFilter(10)
+    assert not duplicate_filter.check(1, "proxy_state_update_proxy_1", b"3823,3733,3226,1", 100.0)
+    assert duplicate_filter.check(1, "proxy_state_update_proxy_1", b"3823,3733,3226,1", 105.0)
+
+    # Once the ttl has passed, the repeat is let through again
+    assert not duplicate_filter.check(1, "proxy_state_update_proxy_1", b"3823,3733,3226,1", 110.0)
+    assert duplicate_filter.suppressed == 1
+
+
+def test_duplicate_filter(make_handler):
+    handler = make_handler(4, duplicate_ttl=60)
+    client = handler.client
+    topic = handler.proxy_topics(1)[0]
+    proxy = handler.proxies.get(1)
+
+    client.publish(topic, "3823,3733,3226,1")
+    assert proxy.state == 1
+
+    # A repeat is dropped before it is decoded
+    proxy.state = 0
+    client.publish(topic, "3823,3733,3226,1")
+    assert proxy.state == 0
+    assert handler.duplicate_filter.suppressed == 1
+
+    # A different payload of the same proxy is processed
+    client.publish(topic, "3823,3733,3226,2")
+    assert proxy.state == 2
+    assert handler.duplicate_filter.suppressed == 1
+
+
+@pytest.mark.parametrize("overflow_policy, dropped_ID", [("drop_newest", 3), ("drop_oldest", 2)])
+def test_retransmit_of_dropped_message(make_handler, overflow_policy, dropped_ID):
+    handler = make_handler(4, worker_count=1, queue_size=1, overflow_policy=overflow_policy, duplicate_ttl=60)
+    client = handler.client
+    queue = handler.ingest_queues[0]
+
+    # The worker waits for the state lock with the first message, so the second one fills the queue and one is dropped
+    with handler.state_lock:
+        client.publish(handler.proxy_topics(1)[0], "3823,3733,3226,1")
+        assert wait_for(lambda: queue.stats()["depth"] == 0)
+        client.publish(handler.proxy_topics(2)[0], "3823,3733,3226,1")
+        client.publish(handler.proxy_topics(3)[0], "3823,3733,3226,1")
+        assert queue.dropped == 1
+
+    proxy = handler.proxies.get(dropped_ID)
+    assert wait_for(lambda: queue.stats()["depth"] == 0)
+    assert proxy.state != 1
+
+    # The retransmit of the dropped message is not a repeat of a processed one
+    client.publish(handler.proxy_topics(dropped_ID)[0], "3823,3733,3226,1")
+    assert wait_for(lambda: proxy.state == 1)
+    assert handler.duplicate_filter.suppressed == 0
+    handler.stop()
+
+
+def test_default_subscriptions_are_exact(make_handler):
+    handler = make_handler(4)
+    client = RecordingClient()
+    handler.on_connect(client, None, None, 0)
+
+    topic_filters = [topic_filter for topic_filter, _ in client.topic_filters]
+    assert len(topic_filters) == 2 + 2 * 4
+    assert not any("+" in topic_filter or "#" in topic_filter for topic_filter in topic_filters)
+
+
+def test_wildcard_mode_needs_filter(logger):
+    with pytest.raises(ValueError):
+        MessageHandler("localhost", [], None, "dashboardAnimations", "dashboardOverride", logger, subscribe_mode="wildcard")
+
+
+def test_coalesced_updates_compare_once(make_handler):
+    # A long window, so the updates are only flushed by the test
+    handler = make_handler(4, coalesce_window=60)
+    handler.light_controller = RecordingLightController()
+    topic = handler.proxy_topics(1)[0]
+
+    compared = []
+    detect_batch = handler.change_detector.detect_batch
+
+    def counting_detect_batch(updates, perform=None):
+        updates = list(updates)
+        compared.extend(updates)
+        return detect_batch(updates, perform)
+
+    handler.change_detector.detect_batch = counting_detect_batch
+
+    for col_value in (3226, 2400, 1500):
+        handler.client.publish(topic, f"3823,3733,{col_value},0")
+    handler.coalescer.flush_all()
+
+    assert len(compared) == 1
+    assert handler.light_controller.coordinates == [(1, (1, 15))]
+    handler.stop()
+
+
+def test_moved_proxy_supersedes_queued_coordinates(make_handler, logger, serial_port):
+    handler = make_handler(4)
+    # The controller is not run, so the animations stay queued
+    light_controller = AsyncLightController(None, 9600, logger, serial_port=serial_port)
+    handler.light_controller = light_controller
+
+    handler.client.publish(handler.proxy_topics(1)[0], "3823,3733,3226,0")
+    handler.client.publish(handler.proxy_topics(2)[0], "3823,3733,2400,0")
+    handler.client.publish(handler.proxy_topics(1)[0], "3823,3733,1500,0")
+
+    queued = []
+    while light_controller.message_queue.qsize():
+        _, _, _, proxy_ID, position = light_controller.message_queue.get_nowait()
+        queued.append((proxy_ID, position))
+
+    # The coordinates of proxy 1 at its first position are stale, the new ones take their place, those of proxy 2 are kept
+    assert queued == [(1, (1, 15)), (2, (1, 14))]
+    assert light_controller.message_queue.superseded == 1
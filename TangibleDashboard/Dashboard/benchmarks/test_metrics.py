@@ -0,0 +1,45 @@
+# Tests of the per-thread counters of the dashboard metrics
+# Usage: python -m pytest benchmarks/test_metrics.py
+
+import threading
+
+from metrics import TOPIC_PROXY_STATE, DashboardMetrics
+
+COUNTS_PER_THREAD = 10000
+
+
+def test_threads_count_while_scraped():
+    metrics = DashboardMetrics(cache_interval=0)
+    start = threading.Barrier(5)
+
+    def count():
+        start.wait()
+        for _ in range(COUNTS_PER_THREAD):
+            metrics.count_message(TOPIC_PROXY_STATE)
+            metrics.count_parse_failure()
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    while any(thread.is_alive() for thread in threads):
+        metrics.render()
+    for thread in threads:
+        thread.join()
+
+    totals = metrics.totals()
+    assert len(metrics.thread_counters) == 4
+    assert totals.messages_received[TOPIC_PROXY_STATE] == 4 * COUNTS_PER_THREAD
+    assert totals.parse_failures == 4 * COUNTS_PER_THREAD
+    assert f'dashboard_messages_received_total{{topic_type="proxy_state"}} {4 * COUNTS_PER_THREAD}' in metrics.format()
+
+
+def test_scrape_takes_no_counting_lock():
+    metrics = DashboardMetrics()
+    metrics.count_reconnect()
+
+    # A thread registering its counters holds the only lock of the counting path, the scrape does not wait for it
+    with metrics.register_lock:
+        assert metrics.totals().mqtt_reconnects == 1
+        metrics.count_reconnect()
+    assert metrics.totals().mqtt_reconnects == 2
@@ -0,0 +1,114 @@
+# Fuzzes the payload parsers with benchmarks/payloadCorpus.json and random mutations of it, comparing every result
+# with a reference built on int() and exceptions
+# Usage: python -m pytest benchmarks/test_payloadFuzz.py
+
+import json
+import os
+import random
+
+import pytest
+
+from payloadParser import (ERROR_FIELD_COUNT, ERROR_INVALID_NUMBER, ERROR_INVALID_STATE, MAX_DIGITS, OK, PARSERS,
+                           Override, PathAnimation, ProxyState)
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "payloadCorpus.json")
+
+# Characters the mutations insert, including the ones int() treats specially
+ALPHABET = "0123456789,,,x+-_ .e\t\n\x00\u00a0\u2003\u200b\u0663\u00b2"
+
+FUZZ_SEED = 2024
+FUZZ_ITERATIONS = 2000
+
+
+def reference_int(field):
+    if "_" in field or len(field.strip().lstrip("+-")) > MAX_DIGITS:
+        return None
+    try:
+        return int(field)
+    except ValueError:
+        return None
+
+
+def reference_fields(payload, count):
+    fields = payload.split(",")
+    if len(fields) != count:
+        return None
+    return fields
+
+
+def reference_proxy_state(payload):
+    fields = reference_fields(payload, 4)
+    if fields is None:
+        return ERROR_FIELD_COUNT, None
+    values = [reference_int(field) for field in fields[:3]]
+    if None in values:
+        return ERROR_INVALID_NUMBER, None
+    if fields[3] == "x":
+        return OK, ProxyState(*values, None)
+    state = reference_int(fields[3])
+    if state is None:
+        return ERROR_INVALID_STATE, None
+    return OK, ProxyState(*values, state)
+
+
+def reference_state(payload):
+    state = reference_int(payload)
+    return (ERROR_INVALID_NUMBER, None) if state is None else (OK, state)
+
+
+def reference_values(payload, count, record):
+    fields = reference_fields(payload, count)
+    if fields is None:
+        return ERROR_FIELD_COUNT, None
+    values = [reference_int(field) for field in fields]
+    if None in values:
+        return ERROR_INVALID_NUMBER, None
+    return OK, record(*values)
+
+
+REFERENCES = {
+    "proxy_state": reference_proxy_state,
+    "state": reference_state,
+    "path": lambda payload: reference_values(payload, 2, PathAnimation),
+    "override": lambda payload: reference_values(payload, 3, Override),
+}
+
+
+def mutate(rng, payload):
+    """
+    Applies up to three random character insertions, deletions or replacements to a payload.
+
+    """
+    characters = list(payload)
+    for _ in range(rng.randint(1, 3)):
+        operation = rng.randrange(3)
+        position = rng.randint(0, len(characters))
+        if operation == 0 or not characters:
+            characters.insert(position, rng.choice(ALPHABET))
+        elif operation == 1:
+            del characters[min(position, len(characters) - 1)]
+        else:
+            characters[min(position, len(characters) - 1)] = rng.choice(ALPHABET)
+    return "".join(characters)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    with open(CORPUS_FILE, "r") as corpus_file:
+        return json.load(corpus_file)
+
+
+@pytest.mark.parametrize("shape", list(PARSERS))
+def test_corpus(corpus, shape):
+    parser, reference = PARSERS[shape], REFERENCES[shape]
+    for payload in corpus:
+        assert parser(payload) == reference(payload), payload
+
+
+@pytest.mark.parametrize("shape", list(PARSERS))
+def test_mutations(corpus, shape):
+    parser, reference = PARSERS[shape], REFERENCES[shape]
+    rng = random.Random(FUZZ_SEED)
+    for _ in range(FUZZ_ITERATIONS):
+        payload = mutate(rng, rng.choice(corpus))
+        assert parser(payload) == reference(payload), payload
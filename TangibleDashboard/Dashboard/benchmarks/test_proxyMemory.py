@@ -0,0 +1,38 @@
+# Measures the memory used per proxy with tracemalloc, including its row in the proxy table,
+# and fails if it exceeds the budget for large installations
+# Usage: python -m pytest benchmarks/test_proxyMemory.py
+
+import tracemalloc
+
+from proxy import Proxy
+from proxyTable import ProxyTable
+
+# Bytes per proxy the compact representation has to stay below
+BYTES_PER_PROXY_BUDGET = 256
+
+# Enough proxies that the growth steps of the table arrays average out
+PROXY_COUNT = 20000
+
+
+def measure(logger, proxy_count):
+    # The first proxy compiles the shared lookup tables, which must not be counted
+    Proxy(-1, logger, table=ProxyTable())
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+
+        table = ProxyTable()
+        proxy_list = [Proxy(ID, logger, table=table) for ID in range(proxy_count)]
+        for proxy in proxy_list:
+            proxy.update(1000, 2000, 3000, True, 1)
+
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (after - before) / proxy_count
+
+
+def test_bytes_per_proxy(logger):
+    bytes_per_proxy = measure(logger, PROXY_COUNT)
+    assert bytes_per_proxy <= BYTES_PER_PROXY_BUDGET, f"{bytes_per_proxy:.0f} bytes per proxy exceed the budget of {BYTES_PER_PROXY_BUDGET}"
@@ -0,0 +1,19 @@
+# Tests of the CRC-8 and the framing of the binary serial protocol
+# Usage: python -m pytest benchmarks/test_serialProtocol.py
+
+from serialProtocol import BinaryProtocol, crc8
+
+
+def test_crc8_check_value():
+    # The check value of CRC-8/SMBUS
+    assert crc8(b"123456789") == 0xF4
+
+
+def test_crc8_continues():
+    assert crc8(b"56789", crc8(b"1234")) == crc8(b"123456789")
+
+
+def test_binary_frame():
+    protocol = BinaryProtocol()
+    # Sync byte, opcode 1, x = 3, y = 4, sequence number 7 and the CRC-8 of 01 03 04 07
+    assert protocol.frame(protocol.encode_coordinates(3, 4), 7) == bytes([0xA5, 0x01, 0x03, 0x04, 0x07, 0xEA])
@@ -0,0 +1,99 @@
+# This script measures the per-message dispatch cost of the TopicRouter compared to the
+# previous dispatch (topic compares, topic.split, int cast and a linear proxy scan)
+# Usage: python benchmarks/topicRouterBenchmark.py [--messages N]
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from topicRouter import TopicRouter
+
+PROXY_COUNTS = [4, 10, 100, 1000]
+ANIMATION_TOPIC = "dashboardAnimations"
+OVERRIDE_TOPIC = "dashboardOverride"
+
+
+class FakeProxy:
+    def __init__(self, ID):
+        self.ID = ID
+
+
+def handle(payload):
+    pass
+
+
+def build_topics(proxy_count):
+    topics = [ANIMATION_TOPIC, OVERRIDE_TOPIC]
+    for ID in range(proxy_count):
+        topics.append(f"proxy_state_update_proxy_{ID}")
+        topics.append(f"hub_state_update_proxy_{ID}")
+    return topics
+
+
+def legacy_dispatch(proxy_list):
+    def dispatch(topic, payload):
+        if topic == ANIMATION_TOPIC:
+            handle(payload)
+        elif topic == OVERRIDE_TOPIC:
+            handle(payload)
+        else:
+            parts = topic.split("_")
+            try:
+                proxy_ID = int(parts[-1])
+            except (ValueError, TypeError):
+                proxy_ID = None
+            proxy = next((p for p in proxy_list if p.ID == proxy_ID), None)
+            if proxy is not None:
+                handle(payload)
+
+    return dispatch
+
+
+def router_dispatch(proxy_list):
+    router = TopicRouter()
+    router.add_route(ANIMATION_TOPIC, handle)
+    router.add_route(OVERRIDE_TOPIC, handle)
+    for proxy in proxy_list:
+        router.add_route(f"proxy_state_update_proxy_{proxy.ID}", handle, proxy)
+        router.add_route(f"hub_state_update_proxy_{proxy.ID}", handle, proxy)
+
+    def dispatch(topic, payload):
+        route = router.resolve(topic)
+        if route is not None:
+            route.handler(payload)
+
+    return dispatch
+
+
+def measure(dispatch, topics, messages):
+    def run():
+        for topic in topics:
+            dispatch(topic, "1")
+
+    repetitions = max(1, messages // len(topics))
+    best = min(timeit.repeat(run, number=repetitions, repeat=5))
+    return best / (repetitions * len(topics)) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-message dispatch cost of the topic router.")
+    parser.add_argument("--messages", type=int, default=200000, help="Messages dispatched per measurement.")
+    args = parser.parse_args()
+
+    print(f"{'proxies':>8} {'legacy ns/msg':>14} {'router ns/msg':>14} {'speedup':>8}")
+    for proxy_count in PROXY_COUNTS:
+        proxy_list = [FakeProxy(ID) for ID in range(proxy_count)]
+        topics = build_topics(proxy_count)
+        random.Random(proxy_count).shuffle(topics)
+
+        legacy = measure(legacy_dispatch(proxy_list), topics, args.messages)
+        routed = measure(router_dispatch(proxy_list), topics, args.messages)
+        print(f"{proxy_count:>8} {legacy:>14.0f} {routed:>14.0f} {legacy / routed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+from collections import namedtuple
+
+from proxyTable import FLAG_OVERRIDE
+
+# Bits of the change mask
+CHANGED_POSITION = 1
+CHANGED_STATE = 2
+
+# The fields that are compared, as the change bit and the columns of the proxy table holding the current value.
+# The announced value is held in the column with the "announced_" prefix.
+FIELDS = (
+    (CHANGED_POSITION, "row"),
+    (CHANGED_POSITION, "col"),
+    (CHANGED_STATE, "state"),
+)
+
+CHANGE_TYPES = ("proxy", "hub")
+
+# Animations an action can emit
+ANIMATION_COORDINATES = "coordinates"  # Coordinates of the proxy
+ANIMATION_PROXY_PATH = "proxy_path"  # Path from the proxy to the hub
+ANIMATION_HUB_PATH = "hub_path"  # Path from the hub to the proxy
+
+Action = namedtuple("Action", ["animation", "announce"])
+
+# A rule applies to updates of its change type that changed all of its fields and match its override flag (None for both).
+# The first applying rule decides the action.
+Rule = namedtuple("Rule", ["change_type", "changed", "override", "action"])
+
+RULES = (
+    # A proxy in override mode keeps its manual position, so a moved proxy only shows its path and is not announced
+    Rule("proxy", CHANGED_POSITION, True, Action(ANIMATION_PROXY_PATH, False)),
+    Rule("proxy", CHANGED_POSITION, False, Action(ANIMATION_COORDINATES, True)),
+    Rule("proxy", CHANGED_STATE, None, Action(ANIMATION_PROXY_PATH, True)),
+    Rule("hub", CHANGED_STATE, None, Action(ANIMATION_HUB_PATH, True)),
+)
+
+
+class ChangeDetector:
+    """
+    A class that detects which fields of a proxy changed since they were last announced and decides the animation to emit.
+    The rules are compiled into a table with the action of every change type, change mask and override flag,
+    so an update is decided by one lookup.
+
+    Args:
+        rules (tuple, optional): The rules in priority order. Defaults to RULES.
+        fields (tuple, optional): The compared fields as (change bit, column name) tuples. Defaults to FIELDS.
+
+    Attributes:
+        fields (tuple): The compared fields as (change bit, column name) tuples.
+        actions (dict): Maps (change type, change mask, override) to the action, or None if nothing is emitted.
+        columns (dict): The bound (change bit, current column, announced column) tuples of each proxy table.
+    """
+
+    def __init__(self, rules=RULES, fields=FIELDS):
+        self.fields = fields
+        self.columns = {}
+
+        all_bits = 0
+        for bit, _ in fields:
+            all_bits |= bit
+
+        self.actions = {}
+        for change_type in CHANGE_TYPES:
+            for mask in range(all_bits + 1):
+                for override in (False, True):
+                    self.actions[(change_type, mask, override)] = self.match_rule(rules, change_type, mask, override)
+
+    def match_rule(self, rules, change_type, mask, override):
+        """
+        Finds the action of the first rule that applies to an update.
+
+        Args:
+            rules (tuple): The rules in priority order.
+            change_type (str): The type of change (either "proxy" or "hub").
+            mask (int): The change mask of the update.
+            override (bool): The override flag of the proxy.
+
+        Returns:
+            Action: The action of the rule, or None if no rule applies.
+        """
+        for rule in rules:
+            if rule.change_type != change_type or mask & rule.changed != rule.changed:
+                continue
+            if rule.override is not None and rule.override != override:
+                continue
+            return rule.action
+        return None
+
+    def bind(self, table):
+        """
+        Returns the columns of a proxy table for the compared fields.
+
+        Args:
+            table (ProxyTable): The proxy table.
+
+        Returns:
+            tuple: The (change bit, current column, announced column) tuples.
+        """
+        columns = self.columns.get(table)
+        if columns is None:
+            columns = tuple((bit, getattr(table, name), getattr(table, "announced_" + name)) for bit, name in self.fields)
+            self.columns[table] = columns
+        return columns
+
+    def change_mask(self, table, index):
+        """
+        Computes the mask of the fields of a proxy that differ from their announced values.
+
+        Args:
+            table (ProxyTable): The proxy table.
+            index (int): The row of the proxy.
+
+        Returns:
+            int: The change mask.
+        """
+        mask = 0
+        for bit, current, announced in self.bind(table):
+            if current[index] != announced[index]:
+                mask |= bit
+        return mask
+
+    def detect(self, proxy, change_type):
+        """
+        Decides the action for an update of a proxy.
+
+        Args:
+            proxy (Proxy): The updated proxy object.
+            change_type (str): The type of change (either "proxy" or "hub").
+
+        Returns:
+            Action: The action to perform, or None if nothing has to be emitted.
+
+        Raises:
+            KeyError: If the change type is invalid.
+        """
+        table = proxy.table
+        index = proxy.index
+        override = bool(table.flags[index] & FLAG_OVERRIDE)
+        return self.actions[(change_type, self.change_mask(table, index), override)]
+
+    def detect_batch(self, updates, perform=None):
+        """
+        Decides the actions for a batch of updates, e.g. the coalesced updates of one window.
+        The columns of each table are bound once for the whole batch.
+
+        Args:
+            updates (iterable): The (proxy, change type) tuples.
+            perform (callable, optional): Called with (proxy, action) as soon as an action is decided, so a later update
+                of the same proxy is compared with the values announced by the earlier one.
+
+        Returns:
+            list: The (proxy, action) tuples of the updates that emit an animation, in order.
+
+        Raises:
+            KeyError: If a change type is invalid.
+        """
+        actions = self.actions
+        results = []
+        table = None
+
+        for proxy, change_type in updates:
+            if proxy.table is not table:
+                table = proxy.table
+                columns = self.bind(table)
+                flags = table.flags
+
+            index = proxy.index
+            mask = 0
+            for bit, current, announced in columns:
+                if current[index] != announced[index]:
+                    mask |= bit
+
+            action = actions[(change_type, mask, bool(flags[index] & FLAG_OVERRIDE))]
+            if action is not None:
+                results.append((proxy, action))
+                if perform is not None:
+                    perform(proxy, action)
+
+        return results
@@ -1,72 +1,162 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+
+# Adjustments for each tile in the format (row, column)
+ADJUSTMENT_TABLE = (
+    # Row 1
+    (0, 0),  # Tile 1
+    (0, 4),  # Tile 2
+    (0, 8),  # Tile 3
+    (0, 12),  # Tile 4
+    # Row 2
+    (4, 0),  # Tile 5
+    (4, 4),  # Tile 6
+    (4, 8),  # Tile 7
+    (4, 12),  # Tile 8
+    # Row 3
+    (8, 0),  # Tile 9
+    (8, 4),  # Tile 10
+    (8, 8),  # Tile 11
+    (8, 12),  # Tile 12
+    # Row 4
+    (12, 0),  # Tile 13
+    (12, 4),  # Tile 14
+    (12, 8),  # Tile 15
+    (12, 12),  # Tile 16
+)
+
+# Voltage values for each tile
+TILE_LIST = (
+    # Row 1
+    (5.26, 4),
+    (4.57, 3),
+    (4.25, 2),
+    (3.85, 1),
+    # Row 2
+    (3.51, 5),
+    (3.19, 6),
+    (2.86, 7),
+    (2.54, 8),
+    # Row 3
+    (2.30, 12),
+    (1.98, 11),
+    (1.67, 10),
+    (1.36, 9),
+    # Row 4
+    (1.07, 13),
+    (0.76, 14),
+    (0.45, 15),
+    (0.06, 16),
+)
+
+# Voltage values for each row
+ROW_LIST = (
+    (5.1, 1),
+    (3.6, 2),
+    (2.2, 3),
+    (0.7, 4),
+)
+
+# Voltage values for each column
+COL_LIST = (
+    (4.4, 1),
+    (2.9, 2),
+    (1.5, 3),
+    (0.2, 4),
+)
+
+
 class Config:
     """
     A class that stores the configuration settings for the Smart Home Dashboard.
+    A Config is immutable, so one instance is shared by all proxies.
+
+    Args:
+        adjustmentTable (iterable, optional): The adjustments for each tile. Defaults to ADJUSTMENT_TABLE.
+        tileList (iterable, optional): The voltage values for each tile. Defaults to TILE_LIST.
+        rowList (iterable, optional): The voltage values for each row. Defaults to ROW_LIST.
+        colList (iterable, optional): The voltage values for each column. Defaults to COL_LIST.
 
     Attributes:
-        adjustmentTable (list): Stores adjustments for each tile in the format (row, column).
-        tileList (list): Stores the voltage values for each tile.
-        rowList (list): Stores the voltage values for each row.
-        colList (list): Stores the voltage values for each column.
-        proxyList (list): Stores the proxy information in the format (x, y, State).
+        adjustmentTable (tuple): Stores adjustments for each tile in the format (row, column).
+        tileList (tuple): Stores the voltage values for each tile.
+        rowList (tuple): Stores the voltage values for each row.
+        colList (tuple): Stores the voltage values for each column.
+        voltage_lists (mappingproxy): Maps the type of voltage divider ("tile", "row", or "col") to its voltage values.
+    """
+
+    # __weakref__ lets caches keyed by a Config drop their entry once the config is replaced
+    __slots__ = ("adjustmentTable", "tileList", "rowList", "colList", "voltage_lists", "__weakref__")
+
+    def __init__(self, adjustmentTable=ADJUSTMENT_TABLE, tileList=TILE_LIST, rowList=ROW_LIST, colList=COL_LIST):
+        values = {
+            "adjustmentTable": tuple((int(row), int(col)) for row, col in adjustmentTable),
+            "tileList": tuple((float(voltage), int(number)) for voltage, number in tileList),
+            "rowList": tuple((float(voltage), int(number)) for voltage, number in rowList),
+            "colList": tuple((float(voltage), int(number)) for voltage, number in colList),
+        }
+        values["voltage_lists"] = MappingProxyType({"tile": values["tileList"], "row": values["rowList"], "col": values["colList"]})
+
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Config is immutable, cannot set '{name}'.")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Config is immutable, cannot delete '{name}'.")
+
+
+def load_config(path):
     """
+    Loads a configuration from a JSON calibration file. Missing entries keep their default values.
+
+    Args:
+        path (str): The path of the calibration file, e.g. {"rowList": [[5.1, 1], [3.6, 2], [2.2, 3], [0.7, 4]]}.
+
+    Returns:
+        Config: The loaded configuration.
+    """
+    with open(path, "r") as calibration_file:
+        calibration = json.load(calibration_file)
+
+    return Config(
+        calibration.get("adjustmentTable", ADJUSTMENT_TABLE),
+        calibration.get("tileList", TILE_LIST),
+        calibration.get("rowList", ROW_LIST),
+        calibration.get("colList", COL_LIST),
+    )
+
+
+DEFAULT_CONFIG = Config()
+
+_loaded_configs = {}
+_loaded_configs_lock = threading.Lock()
+
+
+def get_config(path=None):
+    """
+    Returns the shared configuration, loaded from a calibration file if a path is given.
+    A file is only loaded again once its modification time changed, until then the same Config is returned.
+
+    Args:
+        path (str, optional): The path of the calibration file. Defaults to None (the built-in calibration).
+
+    Returns:
+        Config: The shared configuration.
+    """
+    if path is None:
+        return DEFAULT_CONFIG
+
+    mtime = os.stat(path).st_mtime_ns
+
+    with _loaded_configs_lock:
+        cached = _loaded_configs.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
 
-    def __init__(self):
-        self.adjustmentTable = [
-            # Row 1
-            (0, 0),  # Tile 1
-            (0, 4),  # Tile 2
-            (0, 8),  # Tile 3
-            (0, 12),  # Tile 4
-            # Row 2
-            (4, 0),  # Tile 5
-            (4, 4),  # Tile 6
-            (4, 8),  # Tile 7
-            (4, 12),  # Tile 8
-            # Row 3
-            (8, 0),  # Tile 9
-            (8, 4),  # Tile 10
-            (8, 8),  # Tile 11
-            (8, 12),  # Tile 12
-            # Row 4
-            (12, 0),  # Tile 13
-            (12, 4),  # Tile 14
-            (12, 8),  # Tile 15
-            (12, 12),  # Tile 16
-        ]
-
-        self.tileList = [
-            # Row 1
-            (5.26, 4),
-            (4.57, 3),
-            (4.25, 2),
-            (3.85, 1),
-            # Row 2
-            (3.51, 5),
-            (3.19, 6),
-            (2.86, 7),
-            (2.54, 8),
-            # Row 3
-            (2.30, 12),
-            (1.98, 11),
-            (1.67, 10),
-            (1.36, 9),
-            # Row 4
-            (1.07, 13),
-            (0.76, 14),
-            (0.45, 15),
-            (0.06, 16),
-        ]
-
-        self.rowList = [
-            (5.1, 1),
-            (3.6, 2),
-            (2.2, 3),
-            (0.7, 4),
-        ]
-
-        self.colList = [
-            (4.4, 1),
-            (2.9, 2),
-            (1.5, 3),
-            (0.2, 4),
-        ]
+        config = load_config(path)
+        _loaded_configs[path] = (mtime, config)
+        return config
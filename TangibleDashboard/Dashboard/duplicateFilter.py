@@ -0,0 +1,79 @@
+import threading
+
+
+class DuplicateFilter:
+    """
+    A class that detects byte-identical repeats of the last message of a proxy, e.g. retained messages redelivered
+    on reconnect or state echoes of the hub, so they can be dropped before they are decoded.
+    The last message is kept per proxy instead of per topic: a repeat is only dropped if no other message changed the
+    proxy in between, e.g. a proxy republishing its state after the hub set another one still goes through.
+    A repeat is let through again once the ttl has passed since the last message that was let through,
+    so genuine re-announcements after a timeout are still processed.
+
+    Args:
+        ttl (float): The time (in seconds) a repeat of the last message is dropped.
+
+    Attributes:
+        ttl (float): The time (in seconds) a repeat of the last message is dropped.
+        last (dict): Maps the key (e.g. the proxy ID) to the topic, payload and expiry time of its last message that was let through.
+        suppressed (int): The number of dropped repeats.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.last = {}
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def check(self, key, topic, payload, timestamp):
+        """
+        Checks if a message repeats the last message of its key and remembers it otherwise.
+
+        Args:
+            key (hashable): The key the last message is kept for, e.g. the ID of the proxy.
+            topic (str): The topic of the message.
+            payload (bytes): The raw payload of the message.
+            timestamp (float): The time the message was received.
+
+        Returns:
+            bool: True if the message is a repeat that should be dropped.
+        """
+        with self.lock:
+            last = self.last.get(key)
+            if last is not None and timestamp < last[2] and last[1] == payload and last[0] == topic:
+                self.suppressed += 1
+                return True
+
+            self.last[key] = (topic, payload, timestamp + self.ttl)
+            return False
+
+    def forget(self, key):
+        """
+        Forgets the last message of a key, so its next message is let through.
+
+        """
+        with self.lock:
+            self.last.pop(key, None)
+
+    def discard(self, key, topic, payload):
+        """
+        Forgets the last message of a key if it is the given message, e.g. because it was dropped before it was processed,
+        so its retransmit is let through.
+
+        Args:
+            key (hashable): The key the last message is kept for, e.g. the ID of the proxy.
+            topic (str): The topic of the message.
+            payload (bytes): The raw payload of the message.
+        """
+        with self.lock:
+            last = self.last.get(key)
+            if last is not None and last[1] == payload and last[0] == topic:
+                del self.last[key]
+
+    def clear(self):
+        """
+        Forgets the last messages of all keys.
+
+        """
+        with self.lock:
+            self.last.clear()
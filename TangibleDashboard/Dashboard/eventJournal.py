@@ -0,0 +1,263 @@
+import math
+import os
+import struct
+import threading
+import time
+
+# Event types
+EVENT_PROXY_STATE = 1  # State update published by a proxy
+EVENT_HUB_STATE = 2  # State update for a proxy published by the hub
+EVENT_OVERRIDE = 3  # Manual override of a proxy position
+EVENT_ANIMATION_QUEUED = 4  # Animation added to the queue of the light controller
+EVENT_ANIMATION_SENT = 5  # Animation written to the serial port
+EVENT_ACK_TIMEOUT = 6  # No ready message from the ESP32 in time
+
+EVENT_NAMES = {
+    EVENT_PROXY_STATE: "proxy_state",
+    EVENT_HUB_STATE: "hub_state",
+    EVENT_OVERRIDE: "override",
+    EVENT_ANIMATION_QUEUED: "animation_queued",
+    EVENT_ANIMATION_SENT: "animation_sent",
+    EVENT_ACK_TIMEOUT: "ack_timeout",
+}
+
+# Stored for fields without a value
+UNSET = -1
+
+# Timestamp, event type, proxy ID, row, column, state and queue latency (in seconds, NaN if unset)
+RECORD = struct.Struct("<dBhhhbf")
+
+# Value ranges of the int16 proxy ID, row and column and of the int8 state, values outside are stored as UNSET
+SHORT_RANGE = range(-2 ** 15, 2 ** 15)
+BYTE_RANGE = range(-2 ** 7, 2 ** 7)
+
+# Magic, version and record size at the start of every segment
+HEADER = struct.Struct("<4sBBH")
+MAGIC = b"DJRN"
+VERSION = 1
+
+# One index entry per block of records: timestamp of the first record, number of records up to the end of the block
+# and a mask of the proxy IDs in the block
+INDEX_ENTRY = struct.Struct("<dQQ")
+
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".bin"
+INDEX_SUFFIX = ".idx"
+
+# Minimum time (in seconds) between two log messages about failed records
+FAILURE_LOG_INTERVAL = 60.0
+
+
+def proxy_mask(proxy_ID):
+    """
+    Returns the bit of a proxy ID in the proxy mask of an index entry.
+
+    """
+    return 1 << (proxy_ID & 63)
+
+
+def fit(value, value_range):
+    """
+    Returns the value if it fits into the range of its record field, UNSET otherwise.
+
+    """
+    return value if value in value_range else UNSET
+
+
+class EventJournal:
+    """
+    An append-only journal of dashboard events as fixed-size binary records.
+    The records are written to segment files that are rotated by size. Each segment has a sparse index with one entry per block
+    of records, so queries can seek to a time range and skip blocks without records of a proxy.
+    When a segment is rotated, the oldest segments beyond max_bytes or max_age are deleted.
+    Recording never raises: values that do not fit into their field are stored as UNSET and failed writes are counted and logged.
+
+    Args:
+        directory (str, optional): The directory of the segment files. Defaults to "journal".
+        segment_size (int, optional): The maximum number of records per segment. Defaults to 1000000.
+        index_interval (int, optional): The number of records per index entry. Defaults to 64.
+        max_bytes (int, optional): The maximum total size (in bytes) of the closed segments, the oldest are deleted first. Defaults to None (no limit).
+        max_age (float, optional): The maximum age (in seconds) of the closed segments. Defaults to None (no limit).
+        logger (Logger, optional): The logger object for logging failed records. Defaults to None.
+
+    Attributes:
+        directory (str): The directory of the segment files.
+        segment_size (int): The maximum number of records per segment.
+        index_interval (int): The number of records per index entry.
+        max_bytes (int): The maximum total size (in bytes) of the closed segments, or None.
+        max_age (float): The maximum age (in seconds) of the closed segments, or None.
+        logger (Logger): The logger object for logging failed records, or None.
+        records (int): The number of records in the current segment.
+        written (int): The number of records written since the journal was opened.
+        failed (int): The number of events that could not be written.
+        deleted (int): The number of segments deleted by the retention.
+    """
+
+    def __init__(self, directory="journal", segment_size=1000000, index_interval=64, max_bytes=None, max_age=None, logger=None):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.segment_size = segment_size
+        self.index_interval = index_interval
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.segment_file = None
+        self.index_file = None
+        self.records = 0
+        self.written = 0
+        self.failed = 0
+        self.deleted = 0
+        self.block_start = None
+        self.block_mask = 0
+
+    def record(self, event_type, proxy_ID=UNSET, position=None, state=None, latency=None):
+        """
+        Appends an event to the journal.
+
+        Args:
+            event_type (int): The type of the event, one of the EVENT_* constants.
+            proxy_ID (int, optional): The ID of the proxy the event belongs to.
+            position (tuple, optional): The row and column of the event.
+            state (int, optional): The state of the proxy.
+            latency (float, optional): The time (in seconds) the event waited in a queue.
+
+        """
+        row, col = (UNSET, UNSET) if position is None else position
+        if row is None or col is None:
+            row, col = UNSET, UNSET
+        proxy_ID = UNSET if proxy_ID is None else proxy_ID
+
+        with self.lock:
+            # The journal is written from the message handling, a failed record must never interrupt it
+            try:
+                if self.segment_file is None or self.records >= self.segment_size:
+                    self._open_segment()
+
+                # The time is taken under the lock, so the records of a segment are ordered by time
+                timestamp = time.time()
+                self.segment_file.write(RECORD.pack(
+                    timestamp,
+                    event_type,
+                    fit(proxy_ID, SHORT_RANGE),
+                    fit(row, SHORT_RANGE),
+                    fit(col, SHORT_RANGE),
+                    UNSET if state is None else fit(int(state), BYTE_RANGE),
+                    math.nan if latency is None else latency,
+                ))
+            except (OSError, struct.error, TypeError, ValueError) as e:
+                self.failed += 1
+                if self.logger is not None:
+                    self.logger.error("(record) Failed to record event %s: %s", EVENT_NAMES.get(event_type, event_type), e, rate_limit=FAILURE_LOG_INTERVAL)
+                return
+
+            if self.block_start is None:
+                self.block_start = timestamp
+            if proxy_ID != UNSET:
+                self.block_mask |= proxy_mask(proxy_ID)
+
+            self.records += 1
+            self.written += 1
+            if self.records % self.index_interval == 0:
+                self._write_index_entry()
+
+    def _open_segment(self):
+        """
+        A private method that closes the current segment and starts a new one, named after its first timestamp.
+
+        """
+        self._close_segment()
+
+        name = os.path.join(self.directory, f"{SEGMENT_PREFIX}{time.time_ns() // 1000:017d}")
+        self.segment_file = open(name + SEGMENT_SUFFIX, "ab")
+        self.index_file = open(name + INDEX_SUFFIX, "ab")
+        self.segment_file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+        self.records = 0
+        self.block_start = None
+        self.block_mask = 0
+        self.apply_retention(name + SEGMENT_SUFFIX)
+
+    def segments(self):
+        """
+        Lists the segment files of the journal, oldest first.
+
+        Returns:
+            list: The paths of the segment files.
+        """
+        names = [name for name in os.listdir(self.directory) if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)]
+        # The names hold the zero-padded time of the first record, so they sort by age
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    def apply_retention(self, current=None):
+        """
+        Deletes the closed segments older than max_age and the oldest segments beyond max_bytes, together with their index.
+
+        Args:
+            current (str, optional): The path of the segment being written, which is never deleted.
+
+        """
+        if self.max_bytes is None and self.max_age is None:
+            return
+
+        files = []
+        for path in self.segments():
+            if path == current:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        now = time.time()
+
+        for modified, size, path in files:
+            too_old = self.max_age is not None and now - modified > self.max_age
+            too_large = self.max_bytes is not None and total > self.max_bytes
+            if not too_old and not too_large:
+                break
+
+            os.remove(path)
+            index_path = path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            total -= size
+            self.deleted += 1
+
+    def _write_index_entry(self):
+        """
+        A private method that indexes the completed block and makes its records visible to readers.
+
+        """
+        self.index_file.write(INDEX_ENTRY.pack(self.block_start, self.records, self.block_mask))
+        self.segment_file.flush()
+        self.index_file.flush()
+        self.block_start = None
+        self.block_mask = 0
+
+    def _close_segment(self):
+        if self.segment_file is not None:
+            self.segment_file.close()
+            self.index_file.close()
+            self.segment_file = None
+            self.index_file = None
+
+    def flush(self):
+        """
+        Writes the buffered records to the segment file.
+
+        """
+        with self.lock:
+            if self.segment_file is not None:
+                self.segment_file.flush()
+
+    def close(self):
+        """
+        Writes the buffered records and closes the current segment.
+
+        """
+        with self.lock:
+            self._close_segment()
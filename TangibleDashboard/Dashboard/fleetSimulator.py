@@ -0,0 +1,375 @@
+import argparse
+import heapq
+import random
+import threading
+import time
+
+from config import get_config
+from lightController import LightController
+from localBroker import LocalBroker
+from logger import NullLogger
+from messageHandler import MessageHandler
+from proxy import ADC_RESOLUTION, Proxy
+from proxyTable import ProxyTable
+from trafficReplay import ReplaySerial
+
+# Kinds of scheduled events
+EVENT_PROXY = 0  # A proxy publishes its state
+EVENT_HUB = 1  # The hub publishes a state for a proxy
+EVENT_POWER_ON = 2  # A part of the fleet is powered on at once
+
+# The positions a proxy can be plugged in at
+TILES = range(1, 17)
+ROWS = range(1, 5)
+COLS = range(1, 5)
+
+
+def adc_values(config=None):
+    """
+    Inverts the ADC lookup tables of the proxies, so a simulated proxy can report the raw values of a position.
+
+    Args:
+        config (Config, optional): The calibration of the dashboard. Defaults to get_config().
+
+    Returns:
+        dict: Maps each type ("tile", "row" or "col") to a dict of each position number and the raw ADC values that match it
+            within the tolerance. The median raw value is the one least likely to be misread under noise.
+    """
+    # A proxy on a private table compiles the lookup tables, or reuses the ones of the dashboard proxies
+    lookup_tables = Proxy(-1, NullLogger(), config, table=ProxyTable()).lookup_tables
+
+    values = {}
+    for type, (numbers, fallbacks) in lookup_tables.items():
+        raw_values = {}
+        for raw_value in range(ADC_RESOLUTION):
+            if not fallbacks[raw_value]:
+                raw_values.setdefault(numbers[raw_value], []).append(raw_value)
+        values[type] = raw_values
+    return values
+
+
+class SimulatedProxy:
+    """
+    A simulated ESP32 proxy that reports its position as raw ADC values like HubProxyCode.ino.
+
+    Args:
+        ID (int): The unique identifier of the proxy.
+        tile (int): The tile the proxy is plugged in on.
+        row (int): The row on the tile.
+        col (int): The column on the tile.
+
+    Attributes:
+        ID (int): The unique identifier of the proxy.
+        tile (int): The tile the proxy is plugged in on.
+        row (int): The row on the tile.
+        col (int): The column on the tile.
+        state (int): The state the proxy last reported.
+        topic (str): The topic the proxy publishes its state on.
+        hub_topic (str): The topic the hub publishes the state of the proxy on.
+    """
+
+    __slots__ = ("ID", "tile", "row", "col", "state", "topic", "hub_topic")
+
+    def __init__(self, ID, tile, row, col):
+        self.ID = ID
+        self.tile = tile
+        self.row = row
+        self.col = col
+        self.state = 0
+        self.topic = f"proxy_state_update_proxy_{ID}"
+        self.hub_topic = f"hub_state_update_proxy_{ID}"
+
+
+class FleetSimulator:
+    """
+    A class that simulates a fleet of proxies and the hub publishing to an MQTT client, for soak and throughput runs without hardware.
+    Every proxy publishes its state at the configured rate, the hub publishes states for random proxies, and power-on bursts
+    make a part of the fleet report at once, as after a power cut.
+
+    Args:
+        client (LocalClient or mqtt.Client): The connected client the messages are published with.
+        proxy_count (int, optional): The number of simulated proxies. Defaults to 100.
+        rate (float, optional): The messages per second each proxy publishes. Defaults to 1.0.
+        jitter (float, optional): The random deviation of the publish interval, as a fraction of it. Defaults to 0.1.
+        noise (float, optional): The standard deviation of the ADC noise, in raw ADC counts. Defaults to 0.
+        hub_rate (float, optional): The hub state messages per second for each proxy. Defaults to 0.
+        move_probability (float, optional): The probability a proxy is moved to a new position before it publishes. Defaults to 0.1.
+        power_on_interval (float, optional): The time (in seconds) between power-on bursts, None for no bursts. Defaults to None.
+        power_on_fraction (float, optional): The fraction of the proxies that report in a power-on burst. Defaults to 1.0.
+        first_ID (int, optional): The ID of the first proxy. Defaults to 0.
+        seed (int, optional): The seed of the random generator, for repeatable runs. Defaults to None.
+        config (Config, optional): The calibration the raw values are derived from. Defaults to get_config().
+
+    Attributes:
+        client (LocalClient or mqtt.Client): The client the messages are published with.
+        proxies (list): The SimulatedProxy objects.
+        rate (float): The messages per second each proxy publishes.
+        jitter (float): The random deviation of the publish interval, as a fraction of it.
+        noise (float): The standard deviation of the ADC noise, in raw ADC counts.
+        hub_rate (float): The hub state messages per second for each proxy.
+        move_probability (float): The probability a proxy is moved to a new position before it publishes.
+        power_on_interval (float): The time (in seconds) between power-on bursts, or None.
+        power_on_fraction (float): The fraction of the proxies that report in a power-on burst.
+        adc_values (dict): The raw ADC values of each position number per type.
+        published (int): The number of published messages.
+        bursts (int): The number of power-on bursts.
+        stop_event (threading.Event): Set to stop a run.
+        worker_thread (threading.Thread): The thread publishing the messages once started.
+    """
+
+    def __init__(self, client, proxy_count=100, rate=1.0, jitter=0.1, noise=0, hub_rate=0, move_probability=0.1,
+                 power_on_interval=None, power_on_fraction=1.0, first_ID=0, seed=None, config=None):
+        self.client = client
+        self.rate = rate
+        self.jitter = jitter
+        self.noise = noise
+        self.hub_rate = hub_rate
+        self.move_probability = move_probability
+        self.power_on_interval = power_on_interval
+        self.power_on_fraction = power_on_fraction
+        self.random = random.Random(seed)
+        self.adc_values = adc_values(config if config is not None else get_config())
+        self.proxies = [SimulatedProxy(ID, *self.random_position()) for ID in range(first_ID, first_ID + proxy_count)]
+        self.published = 0
+        self.bursts = 0
+        self.stop_event = threading.Event()
+        self.worker_thread = None
+
+    def create_proxies(self, logger, config=None, table=None):
+        """
+        Creates the Proxy objects for the simulated proxies, to be passed to the MessageHandler.
+
+        Args:
+            logger (Logger): The logger object for the proxies.
+            config (Config, optional): The calibration of the proxies. Defaults to get_config().
+            table (ProxyTable, optional): The table storing the state of the proxies. Defaults to a new table.
+
+        Returns:
+            list: The Proxy objects.
+        """
+        if table is None:
+            table = ProxyTable()
+        return [Proxy(proxy.ID, logger, config, table) for proxy in self.proxies]
+
+    def random_position(self):
+        """
+        Picks a random tile, row and column.
+
+        """
+        return self.random.choice(TILES), self.random.choice(ROWS), self.random.choice(COLS)
+
+    def raw_value(self, type, number):
+        """
+        Returns the raw ADC value a proxy reads for a position number, with noise.
+
+        Args:
+            type (str): The type of voltage divider ("tile", "row", or "col").
+            number (int): The position number.
+
+        Returns:
+            int: The raw ADC value.
+        """
+        raw_values = self.adc_values[type][number]
+        raw_value = raw_values[len(raw_values) // 2]
+
+        if self.noise > 0:
+            raw_value = int(round(self.random.gauss(raw_value, self.noise)))
+            raw_value = min(max(raw_value, 0), ADC_RESOLUTION - 1)
+        return raw_value
+
+    def payload(self, proxy, state):
+        """
+        Builds the payload a proxy publishes, the raw tile, row and column values and its state.
+
+        Args:
+            proxy (SimulatedProxy): The simulated proxy.
+            state (int or str): The state, "x" if the proxy was just plugged in.
+
+        Returns:
+            str: The payload in format 'tile,row,col,state'.
+        """
+        return f"{self.raw_value('tile', proxy.tile)},{self.raw_value('row', proxy.row)},{self.raw_value('col', proxy.col)},{state}"
+
+    def publish_proxy(self, proxy):
+        """
+        Publishes a state update of a proxy, moving it to a new position first with the move probability.
+
+        Args:
+            proxy (SimulatedProxy): The simulated proxy.
+
+        """
+        if self.random.random() < self.move_probability:
+            proxy.tile, proxy.row, proxy.col = self.random_position()
+        proxy.state = self.random.randrange(3)
+        self.client.publish(proxy.topic, self.payload(proxy, proxy.state))
+        self.published += 1
+
+    def publish_hub(self, proxy):
+        """
+        Publishes a state for a proxy from the hub.
+
+        Args:
+            proxy (SimulatedProxy): The simulated proxy.
+
+        """
+        proxy.state = self.random.randrange(3)
+        self.client.publish(proxy.hub_topic, str(proxy.state))
+        self.published += 1
+
+    def power_on(self, fraction=None):
+        """
+        Makes a part of the fleet report at once, each proxy publishes its position with the state "x" like after booting.
+
+        Args:
+            fraction (float, optional): The fraction of the proxies that report. Defaults to power_on_fraction.
+
+        """
+        if fraction is None:
+            fraction = self.power_on_fraction
+
+        count = int(round(len(self.proxies) * fraction))
+        for proxy in self.random.sample(self.proxies, count):
+            self.client.publish(proxy.topic, self.payload(proxy, "x"))
+            self.published += 1
+        self.bursts += 1
+
+    def next_interval(self, rate):
+        """
+        Returns the time until the next message of a source publishing at a rate, with the jitter applied.
+
+        """
+        interval = 1.0 / rate
+        if self.jitter > 0:
+            interval *= 1 + self.random.uniform(-self.jitter, self.jitter)
+        return interval
+
+    def schedule(self, start):
+        """
+        Builds the initial event heap, the first messages of the proxies are spread over one interval.
+
+        Args:
+            start (float): The time.monotonic() value the run starts at.
+
+        Returns:
+            list: The heap of (due time, sequence number, event kind, proxy) tuples.
+        """
+        events = []
+        for proxy in self.proxies:
+            if self.rate > 0:
+                events.append((start + self.random.uniform(0, 1.0 / self.rate), len(events), EVENT_PROXY, proxy))
+            if self.hub_rate > 0:
+                events.append((start + self.random.uniform(0, 1.0 / self.hub_rate), len(events), EVENT_HUB, proxy))
+        if self.power_on_interval:
+            events.append((start + self.power_on_interval, len(events), EVENT_POWER_ON, None))
+        heapq.heapify(events)
+        return events
+
+    def run(self, duration=None, max_messages=None):
+        """
+        Publishes the scheduled messages until the duration has passed, the number of messages is reached or the simulator is stopped.
+        A run that falls behind its schedule publishes the due messages back to back.
+
+        Args:
+            duration (float, optional): The run time in seconds. Defaults to None (no limit).
+            max_messages (int, optional): The number of messages to publish. Defaults to None (no limit).
+
+        """
+        start = time.monotonic()
+        end = start + duration if duration is not None else None
+        last = self.published + max_messages if max_messages is not None else None
+        events = self.schedule(start)
+        sequence = len(events)
+
+        while not self.stop_event.is_set() and events:
+            due, _, kind, proxy = events[0]
+            if end is not None and due > end:
+                break
+            if last is not None and self.published >= last:
+                break
+
+            delay = due - time.monotonic()
+            if delay > 0:
+                self.stop_event.wait(min(delay, 0.1))
+                continue
+
+            if kind == EVENT_PROXY:
+                self.publish_proxy(proxy)
+                next_due = due + self.next_interval(self.rate)
+            elif kind == EVENT_HUB:
+                self.publish_hub(proxy)
+                next_due = due + self.next_interval(self.hub_rate)
+            else:
+                self.power_on()
+                next_due = due + self.power_on_interval
+
+            heapq.heapreplace(events, (next_due, sequence, kind, proxy))
+            sequence += 1
+
+    def start(self, duration=None):
+        """
+        Starts publishing on a background thread.
+
+        Args:
+            duration (float, optional): The run time in seconds. Defaults to None (until stopped).
+
+        """
+        self.worker_thread = threading.Thread(target=self.run, args=(duration,))
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
+
+    def stop(self):
+        """
+        Stops publishing and waits for the background thread.
+
+        """
+        self.stop_event.set()
+        if self.worker_thread is not None:
+            self.worker_thread.join()
+            self.worker_thread = None
+        self.stop_event.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the message handler against a simulated fleet of proxies.")
+    parser.add_argument("--proxies", type=int, default=1000, help="Number of simulated proxies.")
+    parser.add_argument("--rate", type=float, default=1.0, help="Messages per second of each proxy.")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random deviation of the publish interval, as a fraction of it.")
+    parser.add_argument("--noise", type=float, default=0, help="Standard deviation of the ADC noise in raw counts.")
+    parser.add_argument("--hub-rate", type=float, default=0, help="Hub state messages per second for each proxy.")
+    parser.add_argument("--power-on-interval", type=float, help="Seconds between power-on bursts of the fleet.")
+    parser.add_argument("--power-on-fraction", type=float, default=1.0, help="Fraction of the proxies reporting in a burst.")
+    parser.add_argument("--duration", type=float, default=10, help="Run time in seconds.")
+    parser.add_argument("--workers", type=int, default=0, help="Number of ingest workers of the message handler.")
+    parser.add_argument("--coalesce-window", type=float, default=0, help="Coalesce window (in seconds) of the message handler.")
+    parser.add_argument("--seed", type=int, help="Seed for a repeatable run.")
+    args = parser.parse_args()
+
+    logger = NullLogger()
+    broker = LocalBroker()
+    serial_port = ReplaySerial()
+    light_controller = LightController(None, 9600, logger, serial_port=serial_port)
+    light_controller.delay = 0  # The fake serial port has no animation to wait for
+
+    simulator_client = broker.client()
+    simulator_client.connect()
+    simulator = FleetSimulator(simulator_client, args.proxies, args.rate, args.jitter, args.noise, args.hub_rate,
+                               power_on_interval=args.power_on_interval, power_on_fraction=args.power_on_fraction, seed=args.seed)
+
+    handler = MessageHandler("localhost", simulator.create_proxies(logger), light_controller, "dashboardAnimations", "dashboardOverride", logger,
+                             worker_count=args.workers, coalesce_window=args.coalesce_window, client=broker.client())
+    handler.start()
+
+    start = time.perf_counter()
+    simulator.run(args.duration)
+    handler.stop()
+    elapsed = time.perf_counter() - start
+
+    print(f"{simulator.published} messages from {args.proxies} proxies in {elapsed:.2f} s ({simulator.published / elapsed:.0f} messages/s), "
+          f"{simulator.bursts} power-on bursts")
+    print(f"light controller: {light_controller.stats()}")
+    if handler.ingest_queues is not None:
+        print(f"ingest queues: {handler.ingest_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import threading
+from collections import deque
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest")
+
+
+class IngestQueue:
+    """
+    A bounded queue that decouples the MQTT network thread from the message processing.
+
+    Args:
+        maxsize (int): The maximum number of messages waiting in the queue.
+        overflow_policy (str, optional): What happens if the queue is full, either "block" (wait for free space),
+            "drop_oldest" (discard the oldest waiting message) or "drop_newest" (discard the new message). Defaults to "block".
+        on_drop (callable, optional): Called with each discarded message, after the queue lock was released. Defaults to None.
+
+    Attributes:
+        maxsize (int): The maximum number of messages waiting in the queue.
+        overflow_policy (str): What happens if the queue is full.
+        on_drop (callable): Called with each discarded message, or None.
+        items (deque): The waiting messages.
+        enqueued (int): The number of messages put into the queue.
+        dropped (int): The number of messages discarded because the queue was full.
+        max_depth (int): The highest number of messages that were waiting at the same time.
+        max_wait (float): The longest time (in seconds) a message waited before it was processed.
+        closed (bool): Indicates if the queue was closed.
+    """
+
+    def __init__(self, maxsize, overflow_policy="block", on_drop=None):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow policy '{overflow_policy}', expected one of {OVERFLOW_POLICIES}.")
+        if maxsize < 1:
+            raise ValueError("The queue size must be at least 1.")
+
+        self.maxsize = maxsize
+        self.overflow_policy = overflow_policy
+        self.on_drop = on_drop
+        self.items = deque()
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.max_wait = 0.0
+        self.closed = False
+
+    def put(self, item):
+        """
+        Adds a message to the queue, applying the overflow policy if the queue is full.
+
+        Args:
+            item (tuple): The message as (topic, payload, timestamp).
+
+        Returns:
+            bool: True if the message was queued, False if it was dropped.
+        """
+        dropped = None
+        with self.lock:
+            if self.closed:
+                queued = False
+            elif len(self.items) >= self.maxsize and self.overflow_policy == "drop_newest":
+                self.dropped += 1
+                dropped = item
+                queued = False
+            else:
+                if len(self.items) >= self.maxsize:
+                    if self.overflow_policy == "drop_oldest":
+                        dropped = self.items.popleft()
+                        self.dropped += 1
+                    else:
+                        while len(self.items) >= self.maxsize and not self.closed:
+                            self.not_full.wait()
+
+                queued = not self.closed
+                if queued:
+                    self.items.append(item)
+                    self.enqueued += 1
+                    if len(self.items) > self.max_depth:
+                        self.max_depth = len(self.items)
+                    self.not_empty.notify()
+
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return queued
+
+    def get(self):
+        """
+        Removes the oldest message from the queue, waiting until one is available.
+
+        Returns:
+            tuple: The message as (topic, payload, timestamp), or None if the queue was closed.
+        """
+        with self.lock:
+            while not self.items and not self.closed:
+                self.not_empty.wait()
+            if not self.items:
+                return None
+
+            item = self.items.popleft()
+            self.not_full.notify()
+            return item
+
+    def record_wait(self, wait):
+        """
+        Records how long a message waited in the queue.
+
+        Args:
+            wait (float): The time (in seconds) between receiving and processing the message.
+
+        """
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    def close(self):
+        """
+        Closes the queue and wakes up all waiting threads, waiting messages are discarded.
+
+        """
+        with self.lock:
+            self.closed = True
+            self.items.clear()
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
+
+    def depth(self):
+        """
+        Returns the number of messages waiting in the queue.
+
+        """
+        return len(self.items)
+
+    def stats(self):
+        """
+        Returns the counters of the queue.
+
+        Returns:
+            dict: The current depth, maximum depth, number of enqueued and dropped messages and the longest wait.
+        """
+        return {
+            "depth": len(self.items),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "max_wait": self.max_wait,
+        }
@@ -0,0 +1,209 @@
+import argparse
+import bisect
+import datetime
+import math
+import mmap
+import os
+from collections import namedtuple
+
+from eventJournal import EVENT_NAMES, HEADER, INDEX_ENTRY, INDEX_SUFFIX, MAGIC, RECORD, SEGMENT_PREFIX, SEGMENT_SUFFIX, UNSET, VERSION, proxy_mask
+
+Event = namedtuple("Event", ["timestamp", "event_type", "proxy_ID", "row", "col", "state", "latency"])
+
+
+def list_segments(directory):
+    """
+    Lists the segment files of a journal, ordered by their first timestamp.
+
+    Args:
+        directory (str): The directory of the journal.
+
+    Returns:
+        list: The (first timestamp, path) tuples of the segments.
+    """
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            first = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) / 1e6
+            segments.append((first, os.path.join(directory, name)))
+    segments.sort()
+    return segments
+
+
+def read_index(segment_path):
+    """
+    Reads the sparse index of a segment.
+
+    Args:
+        segment_path (str): The path of the segment file.
+
+    Returns:
+        list: The (first timestamp, end record, proxy mask) tuples of the indexed blocks.
+    """
+    index_path = segment_path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+    if not os.path.exists(index_path):
+        return []
+
+    with open(index_path, "rb") as index_file:
+        data = index_file.read()
+
+    # Ignore a partially written last entry
+    data = data[:len(data) - len(data) % INDEX_ENTRY.size]
+    return list(INDEX_ENTRY.iter_unpack(data))
+
+
+def query_segment(segment_path, start=None, end=None, proxy_ID=None, event_type=None):
+    """
+    Yields the events of a segment within a time range, seeking to the range with the sparse index.
+
+    Args:
+        segment_path (str): The path of the segment file.
+        start (float, optional): The earliest timestamp.
+        end (float, optional): The latest timestamp.
+        proxy_ID (int, optional): Only yield events of this proxy.
+        event_type (int, optional): Only yield events of this type.
+
+    Yields:
+        Event: The matching events in order.
+    """
+    if os.path.getsize(segment_path) <= HEADER.size:
+        return
+
+    index = read_index(segment_path)
+    block_starts = [entry[0] for entry in index]
+
+    with open(segment_path, "rb") as segment_file, mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, version, record_size, _ = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"Unsupported journal segment '{segment_path}'.")
+
+        record_count = (len(data) - HEADER.size) // RECORD.size
+
+        # The records after the last indexed block form a final block, it has to be scanned
+        blocks = []
+        block_first = 0
+        for block_start, block_end, block_mask in index:
+            blocks.append((block_start, block_first, block_end, block_mask))
+            block_first = block_end
+        if block_first < record_count:
+            blocks.append((None, block_first, record_count, None))
+
+        begin = 0
+        if start is not None and index:
+            # The block before the first one starting after start may hold the first matching record
+            begin = max(bisect.bisect_right(block_starts, start) - 1, 0)
+
+        mask = None if proxy_ID is None else proxy_mask(proxy_ID)
+
+        for block_start, first, last, block_mask in blocks[begin:]:
+            if end is not None and block_start is not None and block_start > end:
+                return
+            if mask is not None and block_mask is not None and not block_mask & mask:
+                continue
+
+            for number in range(first, last):
+                event = Event._make(RECORD.unpack_from(data, HEADER.size + number * RECORD.size))
+                if start is not None and event.timestamp < start:
+                    continue
+                if end is not None and event.timestamp > end:
+                    return
+                if proxy_ID is not None and event.proxy_ID != proxy_ID:
+                    continue
+                if event_type is not None and event.event_type != event_type:
+                    continue
+                yield event
+
+
+def query(directory, start=None, end=None, proxy_ID=None, event_type=None):
+    """
+    Yields the events of a journal within a time range, only opening the segments that overlap it.
+
+    Args:
+        directory (str): The directory of the journal.
+        start (float, optional): The earliest timestamp.
+        end (float, optional): The latest timestamp.
+        proxy_ID (int, optional): Only yield events of this proxy.
+        event_type (int, optional): Only yield events of this type.
+
+    Yields:
+        Event: The matching events in order.
+    """
+    segments = list_segments(directory)
+    first_timestamps = [first for first, _ in segments]
+
+    begin = 0
+    if start is not None:
+        begin = max(bisect.bisect_right(first_timestamps, start) - 1, 0)
+
+    for first, path in segments[begin:]:
+        if end is not None and first > end:
+            return
+        yield from query_segment(path, start, end, proxy_ID, event_type)
+
+
+def parse_time(value):
+    """
+    Parses a timestamp given as seconds since the epoch or in ISO 8601 format (local time).
+
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def format_event(event):
+    """
+    Returns a readable line for an event.
+
+    """
+    fields = [
+        datetime.datetime.fromtimestamp(event.timestamp).isoformat(timespec="milliseconds"),
+        EVENT_NAMES.get(event.event_type, str(event.event_type)),
+    ]
+    if event.proxy_ID != UNSET:
+        fields.append(f"proxy={event.proxy_ID}")
+    if event.row != UNSET:
+        fields.append(f"position={event.row},{event.col}")
+    if event.state != UNSET:
+        fields.append(f"state={event.state}")
+    if not math.isnan(event.latency):
+        fields.append(f"latency={event.latency * 1000:.1f}ms")
+    return " ".join(fields)
+
+
+def main():
+    event_types = {name: event_type for event_type, name in EVENT_NAMES.items()}
+
+    parser = argparse.ArgumentParser(description="Query the dashboard event journal.")
+    parser.add_argument("--directory", default="journal", help="The directory of the journal.")
+    parser.add_argument("--start", type=parse_time, help="The earliest time, as epoch seconds or ISO 8601.")
+    parser.add_argument("--end", type=parse_time, help="The latest time, as epoch seconds or ISO 8601.")
+    parser.add_argument("--proxy", type=int, help="Only show events of this proxy ID.")
+    parser.add_argument("--event", choices=sorted(event_types), help="Only show events of this type.")
+    parser.add_argument("--summary", action="store_true", help="Only print the number of events and their queue latencies.")
+    args = parser.parse_args()
+
+    events = query(args.directory, args.start, args.end, args.proxy, event_types.get(args.event))
+
+    if not args.summary:
+        for event in events:
+            print(format_event(event))
+        return
+
+    count = 0
+    latencies = []
+    for event in events:
+        count += 1
+        if not math.isnan(event.latency):
+            latencies.append(event.latency)
+
+    print(f"{count} events")
+    if latencies:
+        latencies.sort()
+        print(f"latency: average {sum(latencies) / len(latencies) * 1000:.1f} ms, "
+              f"median {latencies[len(latencies) // 2] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+import collections
+import threading
+import time
+
+# Stages a message passes from the MQTT receipt to the serial write, in order
+STAGE_RECEIVE = "receive"  # on_message received the message
+STAGE_DISPATCH = "dispatch"  # The message is processed, after waiting in an ingest queue
+STAGE_COALESCE = "coalesce"  # The update is held by the coalescer until its window has passed
+STAGE_COMPARE = "compare"  # The updated proxy is compared with its announced data
+STAGE_ANIMATION = "animation"  # handle_animation builds the animation
+STAGE_ENQUEUE = "enqueue"  # The animation is added to the queue of the light controller
+STAGE_DEQUEUE = "dequeue"  # The light controller took the animation from the queue
+STAGE_WRITE = "write"  # The animation was written to the serial port
+
+TOTAL = "total"
+
+# Each power of two is split into 2 ** SUB_BUCKET_BITS buckets, so a recorded value is off by at most 1 / 2 ** SUB_BUCKET_BITS
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Latencies are recorded in microseconds up to 2 ** MAX_VALUE_BITS (about 12 days), longer ones are clamped
+MAX_VALUE_BITS = 40
+MAX_VALUE = (1 << MAX_VALUE_BITS) - 1
+BUCKET_COUNT = (MAX_VALUE_BITS - SUB_BUCKET_BITS + 1) * SUB_BUCKETS
+
+SUMMARY_PERCENTILES = (50, 90, 99, 99.9)
+
+# Finished traces are recorded into the histograms in batches, at the latest once this many are waiting
+MAX_PENDING_TRACES = 4096
+RECORD_INTERVAL = 1.0  # Time (in seconds) between the batches recorded by the summary thread
+
+
+def bucket_index(value):
+    """
+    Returns the bucket of a value in microseconds, values below 2 * SUB_BUCKETS have a bucket each.
+
+    """
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def bucket_value(index):
+    """
+    Returns the value in the middle of a bucket, in microseconds.
+
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    return ((index - (shift << SUB_BUCKET_BITS)) << shift) + ((1 << shift) >> 1)
+
+
+class LatencyHistogram:
+    """
+    A histogram of latencies with log-linear buckets like an HDR histogram: the buckets get wider with the value,
+    so recording is one index calculation and the relative error stays the same from microseconds to hours.
+
+    Attributes:
+        counts (list): The number of values in each bucket.
+        count (int): The number of recorded values.
+        total (float): The sum of the recorded values, in seconds.
+        max (float): The largest recorded value, in seconds (0 while empty).
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.reset()
+
+    def reset(self):
+        """
+        Removes all recorded values.
+
+        """
+        for index in range(BUCKET_COUNT):
+            self.counts[index] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """
+        Records a latency.
+
+        Args:
+            seconds (float): The latency in seconds.
+
+        """
+        value = int(seconds * 1e6)
+        if value < 2 * SUB_BUCKETS:
+            index = value if value > 0 else 0
+        else:
+            if value > MAX_VALUE:
+                value = MAX_VALUE
+            # Same as bucket_index, inlined for the hot path
+            shift = value.bit_length() - SUB_BUCKET_BITS - 1
+            index = (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        """
+        Adds the values of another histogram.
+
+        Args:
+            other (LatencyHistogram): The histogram to add.
+
+        """
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """
+        Returns the latency below which the given percentage of the recorded values lie.
+
+        Args:
+            percent (float): The percentage, e.g. 99.9.
+
+        Returns:
+            float: The latency in seconds, or None if no values were recorded.
+        """
+        if self.count == 0:
+            return None
+
+        target = max(1, int(self.count * percent / 100.0 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                # The middle of the bucket may lie beyond the largest recorded value
+                return min(bucket_value(index) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Returns the number of values, their mean, percentiles and maximum.
+
+        Returns:
+            dict: The count, and the mean, "p50", "p90", "p99", "p99.9" and max latency in seconds.
+        """
+        summary = {"count": self.count, "mean": self.total / self.count if self.count else None}
+        for percent in SUMMARY_PERCENTILES:
+            summary[f"p{percent:g}"] = self.percentile(percent)
+        summary["max"] = self.max if self.count else None
+        return summary
+
+
+class Trace:
+    """
+    The times a message reached each stage.
+
+    Attributes:
+        stamps (list): The (stage, time.perf_counter() value) tuples in order.
+        handed_off (bool): Indicates that the trace is continued by a fork, e.g. on the thread of the light controller.
+    """
+
+    __slots__ = ("stamps", "handed_off")
+
+    def __init__(self, stamps=None):
+        self.stamps = stamps if stamps is not None else []
+        self.handed_off = False
+
+    def stamp(self, stage):
+        self.stamps.append((stage, time.perf_counter()))
+
+    def fork(self):
+        """
+        Returns a copy of the trace that is continued separately, e.g. for each animation of a message.
+
+        """
+        return Trace(list(self.stamps))
+
+
+class LatencyTracer:
+    """
+    A class that traces messages from the MQTT receipt to the serial write and records the latency between
+    consecutive stages in a histogram per stage pair. The trace of the message processed by a thread is kept thread-local,
+    so only the stage calls are needed in the hot paths. Components without a tracer skip them with one comparison.
+    Finished traces are only queued, they are recorded into the histograms in batches by the summary thread or on demand.
+
+    Args:
+        logger (Logger, optional): The logger the summaries are written to. Defaults to None.
+        summary_interval (float, optional): The time (in seconds) between logged summaries once started, None to only
+            export the summary on demand. Defaults to None.
+
+    Attributes:
+        logger (Logger): The logger the summaries are written to, or None.
+        summary_interval (float): The time (in seconds) between logged summaries, or None.
+        histograms (dict): Maps each stage pair, e.g. (STAGE_RECEIVE, STAGE_DISPATCH), and TOTAL to its LatencyHistogram.
+        pending (collections.deque): The stamps of the finished traces that are not recorded yet.
+        finished (int): The number of recorded traces.
+        worker_thread (threading.Thread): The thread logging the periodic summaries.
+    """
+
+    def __init__(self, logger=None, summary_interval=None):
+        self.logger = logger
+        self.summary_interval = summary_interval
+        self.histograms = {}
+        self.pending = collections.deque()
+        self.finished = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stop_event = threading.Event()
+        self.worker_thread = None
+
+    def begin(self, timestamp=None):
+        """
+        Starts the trace of a message on the current thread.
+
+        Args:
+            timestamp (float, optional): The time.time() value the message was received at, it is stamped as STAGE_RECEIVE.
+
+        Returns:
+            Trace: The new trace.
+        """
+        trace = Trace()
+        now = time.perf_counter()
+        if timestamp is not None:
+            trace.stamps.append((STAGE_RECEIVE, now - max(0.0, time.time() - timestamp)))
+        trace.stamps.append((STAGE_DISPATCH, now))
+        self.local.trace = trace
+        return trace
+
+    def current(self):
+        """
+        Returns the trace of the current thread, or None.
+
+        """
+        return getattr(self.local, "trace", None)
+
+    def attach(self, trace):
+        """
+        Continues a trace on the current thread, e.g. after it was held by the coalescer.
+
+        Args:
+            trace (Trace): The trace, None clears the trace of the thread.
+
+        """
+        self.local.trace = trace
+
+    def stamp(self, stage):
+        """
+        Stamps the trace of the current thread with a stage.
+
+        Args:
+            stage (str): The reached stage.
+
+        """
+        trace = getattr(self.local, "trace", None)
+        if trace is not None:
+            trace.stamp(stage)
+
+    def hand_off(self, stage):
+        """
+        Forks the trace of the current thread to be continued elsewhere, and stamps the fork with a stage.
+
+        Args:
+            stage (str): The stage the fork starts at, e.g. STAGE_ENQUEUE.
+
+        Returns:
+            Trace: The fork, or None if the thread has no trace.
+        """
+        trace = getattr(self.local, "trace", None)
+        if trace is None:
+            return None
+
+        trace.handed_off = True
+        fork = trace.fork()
+        fork.stamp(stage)
+        return fork
+
+    def end(self):
+        """
+        Ends the trace of the current thread. It is recorded unless it was handed off, then the fork records it once finished.
+
+        """
+        trace = getattr(self.local, "trace", None)
+        if trace is None:
+            return
+
+        self.local.trace = None
+        if not trace.handed_off:
+            self.finish(trace)
+
+    def finish(self, trace, stage=None):
+        """
+        Finishes a trace. Its latencies are recorded with the next summary, so the hot path only queues it.
+
+        Args:
+            trace (Trace): The finished trace.
+            stage (str, optional): The last stage to stamp before finishing, e.g. STAGE_WRITE.
+
+        """
+        if stage is not None:
+            trace.stamp(stage)
+
+        if len(trace.stamps) < 2:
+            return
+
+        self.pending.append(trace.stamps)
+        if len(self.pending) >= MAX_PENDING_TRACES:
+            self.record_pending()
+
+    def record_pending(self):
+        """
+        Records the latencies between the stages of the finished traces into the histograms.
+
+        """
+        with self.lock:
+            histograms = self.histograms
+            pending = self.pending
+
+            while pending:
+                stamps = pending.popleft()
+                previous_stage, previous_time = stamps[0]
+                for stage, stamp_time in stamps[1:]:
+                    pair = (previous_stage, stage)
+                    histogram = histograms.get(pair)
+                    if histogram is None:
+                        histogram = histograms[pair] = LatencyHistogram()
+                    histogram.record(stamp_time - previous_time)
+                    previous_stage, previous_time = stage, stamp_time
+
+                histogram = histograms.get(TOTAL)
+                if histogram is None:
+                    histogram = histograms[TOTAL] = LatencyHistogram()
+                histogram.record(stamps[-1][1] - stamps[0][1])
+                self.finished += 1
+
+    def summary(self):
+        """
+        Returns the summary of each stage pair.
+
+        Returns:
+            dict: Maps each stage pair, e.g. "receive -> dispatch", and TOTAL to the summary of its histogram, see LatencyHistogram.summary.
+        """
+        self.record_pending()
+        with self.lock:
+            return {pair if pair == TOTAL else " -> ".join(pair): histogram.summary() for pair, histogram in self.histograms.items()}
+
+    def format_summary(self):
+        """
+        Returns a readable line with the latency percentiles in milliseconds for each stage pair, as a list.
+
+        """
+        lines = []
+        for name, summary in self.summary().items():
+            fields = [f"{name}: {summary['count']} traces"]
+            for key in ("mean",) + tuple(f"p{percent:g}" for percent in SUMMARY_PERCENTILES) + ("max",):
+                fields.append(f"{key} {summary[key] * 1000:.3f} ms")
+            lines.append(", ".join(fields))
+        return lines
+
+    def log_summary(self):
+        """
+        Writes the summary to the log.
+
+        """
+        if self.logger is None:
+            return
+        for line in self.format_summary():
+            self.logger.info("(latency) %s", line)
+
+    def reset(self):
+        """
+        Removes all recorded latencies.
+
+        """
+        with self.lock:
+            self.pending.clear()
+            self.histograms = {}
+            self.finished = 0
+
+    def start(self):
+        """
+        Starts logging the summary every summary_interval seconds.
+
+        """
+        if self.summary_interval is None or self.worker_thread is not None:
+            return
+
+        self.stop_event.clear()
+        self.worker_thread = threading.Thread(target=self._log_summaries)
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
+
+    def stop(self):
+        """
+        Stops the periodic summaries and logs a last one.
+
+        """
+        if self.worker_thread is not None:
+            self.stop_event.set()
+            self.worker_thread.join()
+            self.worker_thread = None
+        self.log_summary()
+
+    def _log_summaries(self):
+        """
+        A private method that logs the summary until the tracer is stopped.
+
+        """
+        next_summary = time.monotonic() + self.summary_interval
+        while not self.stop_event.wait(min(RECORD_INTERVAL, self.summary_interval)):
+            self.record_pending()
+            if time.monotonic() >= next_summary:
+                self.log_summary()
+                next_summary += self.summary_interval
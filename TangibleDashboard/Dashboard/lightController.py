@@ -1,8 +1,20 @@
 import threading
 import time
-from queue import Queue
 
 import serial
+from animationQueue import PRIORITY_BOOT, PRIORITY_COORDINATES, PRIORITY_PATH, AnimationQueue
+from eventJournal import EVENT_ACK_TIMEOUT, EVENT_ANIMATION_SENT
+from latencyTracer import STAGE_DEQUEUE, STAGE_ENQUEUE, STAGE_WRITE
+from serialProtocol import PROTOCOLS
+
+FLOW_CONTROL_MODES = ("fixed", "ack")
+
+# The line the ESP32 prints once an animation is done and it is ready for the next message
+READY_MESSAGE = b"READY"
+
+# The baud rates the ESP32 can switch to, tried from the fastest
+SUPPORTED_BAUDRATES = (921600, 115200)
+BAUDRATE_TIMEOUT = 2  # Maximum time (in seconds) to wait for the ESP32 to confirm a baud rate
 
 
 class LightController:
@@ -13,21 +25,87 @@ class LightController:
         port (str): The serial port to connect to.
         baudrate (int): The baud rate for the serial communication (should be 9600).
         logger (Logger): The logger object for logging messages.
+        serial_port (serial.Serial, optional): An already opened serial port to use instead of opening the port.
+        flow_control (str, optional): How the sending of messages is paced, either "fixed" (wait the fixed delay after each
+            message) or "ack" (wait until the ESP32 reports it is ready, at most ack_timeout seconds). Defaults to "fixed".
+        ack_timeout (float, optional): The maximum time (in seconds) to wait for the ready message in "ack" mode. Defaults to 10.
+        protocol (str, optional): The serial protocol, either "ascii" (text lines, understood by every firmware) or "binary"
+            (fixed-width frames with sequence number and CRC-8). Defaults to "ascii".
+        target_baudrate (int, optional): The highest baud rate to negotiate with the ESP32 at startup. Defaults to None (keep the baud rate).
+        journal (EventJournal, optional): The journal the sent animations are recorded in. Defaults to None.
+        tracer (LatencyTracer, optional): Continues the latency traces of the queued animations up to the serial write. Defaults to None.
+        metrics (DashboardMetrics, optional): Exports the queue depth and counters and counts the enqueued and dropped animations. Defaults to None.
 
     Attributes:
         serial_port (serial.Serial): The serial port object for communication.
-        message_queue (Queue): A queue to store the messages to be sent.
+        message_queue (AnimationQueue): A priority queue to store the messages to be sent.
         logger (Logger): The logger object for logging messages.
         delay (int): The minimum delay (in seconds) between sending messages.
         worker_thread (threading.Thread): The thread for sending messages.
+        flow_control (str): How the sending of messages is paced.
+        ack_timeout (float): The maximum time (in seconds) to wait for the ready message in "ack" mode.
+        ready_event (threading.Event): Set by the reader thread when the ESP32 reports it is ready.
+        reader_thread (threading.Thread): The thread reading the serial port in "ack" mode.
+        sent (int): The number of messages sent.
+        ack_timeouts (int): The number of messages the ready message did not arrive in time for.
+        first_sent (float): The time the first message was sent.
+        protocol (AsciiProtocol or BinaryProtocol): Encodes and frames the messages.
+        sequence (int): The sequence number of the next frame.
+        bytes_written (int): The number of bytes written to the serial port.
+        journal (EventJournal): The journal the sent animations are recorded in, or None.
+        tracer (LatencyTracer): Continues the latency traces of the queued animations up to the serial write, or None.
+        traces (dict): Maps the supersession key of each queued animation to its trace while tracing.
+        metrics (DashboardMetrics): Exports the queue depth and counters and counts the enqueued and dropped animations, or None.
 
     """
 
-    def __init__(self, port, baudrate, logger):
-        self.serial_port = serial.Serial(port, baudrate, timeout=1)
-        self.message_queue = Queue()
+    def __init__(self, port, baudrate, logger, serial_port=None, flow_control="fixed", ack_timeout=10, protocol="ascii", target_baudrate=None, journal=None, tracer=None, metrics=None):
+        if flow_control not in FLOW_CONTROL_MODES:
+            raise ValueError(f"Invalid flow control '{flow_control}', expected one of {FLOW_CONTROL_MODES}.")
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Invalid protocol '{protocol}', expected one of {tuple(PROTOCOLS)}.")
+
+        if serial_port is None:
+            serial_port = serial.Serial(port, baudrate, timeout=1)
+
+        self.serial_port = serial_port
+        self.message_queue = AnimationQueue()
         self.logger = logger
         self.delay = 5  # Minimum delay of 5 seconds between messages
+        self.worker_thread = None
+        self.flow_control = flow_control
+        self.ack_timeout = ack_timeout
+        self.ready_event = threading.Event()
+        self.reader_thread = None
+        self.sent = 0
+        self.ack_timeouts = 0
+        self.first_sent = None
+        self.protocol = PROTOCOLS[protocol]()
+        self.sequence = 0
+        self.bytes_written = 0
+        self.journal = journal
+        self.tracer = tracer
+        self.traces = {}
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.add_light_controller(self)
+
+        # Negotiate before the reader thread starts, so the answer is not consumed by it
+        if target_baudrate is not None:
+            self.negotiate_baudrate(target_baudrate)
+
+        if flow_control == "ack":
+            self.reader_thread = threading.Thread(target=self._read_messages)
+            self.reader_thread.daemon = True
+            self.reader_thread.start()
+
+        self.start()
+
+    def start(self):
+        """
+        Starts the worker thread that sends the queued messages.
+
+        """
         self.worker_thread = threading.Thread(target=self._send_messages)
         self.worker_thread.daemon = True  # Daemonize the thread so it will automatically stop when the main program exits
         self.worker_thread.start()
@@ -38,37 +116,217 @@ class LightController:
 
         """
         while True:
-            message = self.message_queue.get()
-            self.serial_port.write(message.encode())
-            self.logger.info(f"(send_messages) Message sent: {message}")
-            time.sleep(self.delay)
+            message, wait, key, proxy_ID, position = self.message_queue.get()
+            trace = self.dequeue_trace(key) if self.tracer is not None else None
+            self.logger.info("(send_messages) Message waited %.3f s in queue, %s messages left.", wait, self.message_queue.qsize())
+            self.write(message)
+            if trace is not None:
+                self.tracer.finish(trace, STAGE_WRITE)
+            if self.journal is not None:
+                self.journal.record(EVENT_ANIMATION_SENT, proxy_ID, position, latency=wait)
+
+            if self.flow_control == "ack":
+                self.wait_ready()
+            else:
+                time.sleep(self.delay)
+
+    def write(self, message):
+        """
+        Frames an encoded message and writes it to the serial port.
+
+        Args:
+            message: The message encoded by the protocol.
+
+        """
+        data = self.protocol.frame(message, self.sequence)
+        self.sequence = (self.sequence + 1) & 0xFF
+
+        # Clear the ready flag first, so only a ready message for this animation releases the next one
+        self.ready_event.clear()
+        self.serial_port.write(data)
+
+        if self.first_sent is None:
+            self.first_sent = time.monotonic()
+        self.sent += 1
+        self.bytes_written += len(data)
+        self.logger.info("(send_messages) Message sent: %s", self.protocol.describe(message))
+
+    def negotiate_baudrate(self, target_baudrate):
+        """
+        Asks the ESP32 to switch to the fastest supported baud rate up to the target and follows it once it confirms.
+        Firmware without support does not confirm, so the current baud rate is kept.
+        The ESP32 ends every request with a ready message, which is read here, so it is not taken as the ready message
+        of the first animation in "ack" mode.
+
+        Args:
+            target_baudrate (int): The highest baud rate to use.
+
+        Returns:
+            int: The baud rate in use afterwards.
+        """
+        for baudrate in SUPPORTED_BAUDRATES:
+            if baudrate > target_baudrate or baudrate <= self.serial_port.baudrate:
+                continue
+
+            confirmation = f"BAUD,{baudrate}".encode()
+            self.serial_port.reset_input_buffer()
+            self.serial_port.write(f"baud,{baudrate}\n".encode())
+
+            deadline = time.monotonic() + BAUDRATE_TIMEOUT
+            while time.monotonic() < deadline:
+                line = self.serial_port.readline().strip()
+                if line == confirmation:
+                    # The ready message is sent at the new baud rate
+                    self.serial_port.baudrate = baudrate
+                    self.read_ready(deadline)
+                    self.logger.info("(negotiate_baudrate) Switched to %s baud.", baudrate)
+                    return baudrate
+                if line == b"BAUD,ERR":
+                    self.read_ready(deadline)
+                    break
+                if line == READY_MESSAGE:
+                    # Firmware without support ended the request without confirming it
+                    break
+
+        self.logger.warning("(negotiate_baudrate) Keeping %s baud.", self.serial_port.baudrate)
+        return self.serial_port.baudrate
+
+    def read_ready(self, deadline):
+        """
+        Reads lines from the serial port until the ready message, used before the reader thread is started.
+
+        Args:
+            deadline (float): The time.monotonic() value to give up at.
+
+        Returns:
+            bool: True if the ready message arrived, False on timeout.
+        """
+        while time.monotonic() < deadline:
+            if self.serial_port.readline().strip() == READY_MESSAGE:
+                return True
+        return False
+
+    def wait_ready(self):
+        """
+        Waits until the ESP32 reports the animation is done, at most ack_timeout seconds.
+
+        Returns:
+            bool: True if the ready message arrived, False on timeout.
+        """
+        start = time.monotonic()
+
+        if not self.ready_event.wait(self.ack_timeout):
+            self.ack_timeouts += 1
+            if self.journal is not None:
+                self.journal.record(EVENT_ACK_TIMEOUT, latency=self.ack_timeout)
+            self.logger.warning("(wait_ready) No ready message after %s s, sending the next message.", self.ack_timeout)
+            return False
+
+        self.logger.info("(wait_ready) Animation done after %.3f s, %.3f animations/s.", time.monotonic() - start, self.animations_per_second())
+        return True
+
+    def _read_messages(self):
+        """
+        A private method that continuously reads lines from the serial port and signals ready messages.
+
+        """
+        while True:
+            try:
+                line = self.serial_port.readline()
+            except serial.SerialException as e:
+                self.logger.error("(read_messages) Failed to read from serial port: %s", e)
+                time.sleep(1)
+                continue
+
+            if line.strip() == READY_MESSAGE:
+                self.ready_event.set()
+
+    def animations_per_second(self):
+        """
+        Returns the achieved rate of sent animations since the first message was sent.
 
-    def send_coordinates(self, x, y):
+        """
+        if self.first_sent is None:
+            return 0.0
+
+        elapsed = time.monotonic() - self.first_sent
+        if elapsed <= 0:
+            return 0.0
+        return self.sent / elapsed
+
+    def stats(self):
+        """
+        Returns the counters of the light controller.
+
+        Returns:
+            dict: The number of sent messages, the ready message timeouts, the achieved animations per second
+                and the queue depth, superseded messages and time in queue.
+        """
+        queue_stats = self.message_queue.stats()
+        return {
+            "sent": self.sent,
+            "ack_timeouts": self.ack_timeouts,
+            "animations_per_second": self.animations_per_second(),
+            "queue_depth": queue_stats["depth"],
+            "superseded": queue_stats["superseded"],
+            "average_wait": queue_stats["average_wait"],
+            "max_wait": queue_stats["max_wait"],
+        }
+
+    def send_coordinates(self, x, y, priority=PRIORITY_COORDINATES, key=None, proxy_ID=None):
         """
         Adds a message with the given coordinates to the message queue.
+        A queued message for the same position is replaced instead of adding another one. The coordinates of a proxy
+        are only shown for its latest position, so a queued message of the same proxy for another position is dropped.
 
         Args:
             x (int): The x-coordinate.
             y (int): The y-coordinate.
+            priority (int, optional): The priority of the message. Defaults to PRIORITY_COORDINATES.
+            key (hashable, optional): The supersession key. Defaults to the position.
+            proxy_ID (int, optional): The ID of the proxy at the coordinates, recorded in the journal when the message is sent.
 
         """
-        message = f"{x},{y}\n"
-        self.message_queue.put(message)
+        try:
+            message = self.protocol.encode_coordinates(x, y)
+        except (ValueError, TypeError) as e:
+            if self.metrics is not None:
+                self.metrics.count_encode_failure()
+            self.logger.error("(send_coordinates) Failed to encode coordinates %s,%s: %s", x, y, e)
+            return
+
+        if key is None:
+            key = ("coordinates", x, y)
+        group = ("coordinates", proxy_ID) if proxy_ID is not None else None
+        self.enqueue(message, priority, key, proxy_ID, (x, y), group)
         self.logger.info("(send_coordinates) Coordinates Message added to queue.")
 
-    def send_path(self, x1, y1, x2, y2):
+    def send_path(self, x1, y1, x2, y2, priority=PRIORITY_PATH, key=None, proxy_ID=None):
         """
         Adds a message with the given path coordinates to the message queue.
+        A queued message with the same key is replaced instead of adding another one.
 
         Args:
             x1 (int): The x-coordinate of the starting point.
             y1 (int): The y-coordinate of the starting point.
             x2 (int): The x-coordinate of the ending point.
             y2 (int): The y-coordinate of the ending point.
+            priority (int, optional): The priority of the message. Defaults to PRIORITY_PATH.
+            key (hashable, optional): The supersession key, e.g. the pair of proxy IDs. Defaults to the pair of positions.
+            proxy_ID (int, optional): The ID of the proxy at the starting point, recorded in the journal when the message is sent.
 
         """
-        message = f"{x1},{y1},{x2},{y2}\n"
-        self.message_queue.put(message)
+        try:
+            message = self.protocol.encode_path(x1, y1, x2, y2)
+        except (ValueError, TypeError) as e:
+            if self.metrics is not None:
+                self.metrics.count_encode_failure()
+            self.logger.error("(send_path) Failed to encode path %s,%s,%s,%s: %s", x1, y1, x2, y2, e)
+            return
+
+        if key is None:
+            key = ("path", x1, y1, x2, y2)
+        self.enqueue(message, priority, key, proxy_ID, (x1, y1))
         self.logger.info("(send_path) Path Message added to queue.")
 
     def send_boot(self):
@@ -76,7 +334,46 @@ class LightController:
         Adds a message for the boot-animation to start
         
         """
-        message = "boot"
-        self.message_queue.put(message)
-        self.logger.info("(send_path) Path Message added to queue.")
-            
\ No newline at end of file
+        message = self.protocol.encode_boot()
+        self.enqueue(message, PRIORITY_BOOT, "boot")
+        self.logger.info("(send_boot) Boot Message added to queue.")
+
+    def enqueue(self, message, priority, key=None, proxy_ID=None, position=None, group=None):
+        """
+        Adds a message to the message queue.
+
+        Args:
+            message: The message encoded by the protocol.
+            priority (int): The priority of the message.
+            key (hashable, optional): The supersession key of the message.
+            proxy_ID (int, optional): The ID of the proxy the message animates.
+            position (tuple, optional): The position the message animates.
+            group (hashable, optional): The supersession group of the message.
+
+        """
+        if self.tracer is not None and key is not None:
+            # A superseding message takes over the key, the trace of the replaced message is dropped with it
+            trace = self.tracer.hand_off(STAGE_ENQUEUE)
+            if trace is not None:
+                self.traces[key] = trace
+
+        if self.metrics is not None:
+            self.metrics.count_animation_enqueued()
+
+        if self.message_queue.put(message, priority, key, proxy_ID, position, group):
+            self.logger.info("(enqueue) Replaced queued message for %s.", key)
+
+    def dequeue_trace(self, key):
+        """
+        Takes the trace of a dequeued message and stamps it.
+
+        Args:
+            key (hashable): The supersession key of the message.
+
+        Returns:
+            Trace: The trace of the message, or None if it was not traced.
+        """
+        trace = self.traces.pop(key, None)
+        if trace is not None:
+            trace.stamp(STAGE_DEQUEUE)
+        return trace
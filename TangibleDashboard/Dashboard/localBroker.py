@@ -0,0 +1,276 @@
+import threading
+
+from paho.mqtt.client import topic_matches_sub
+
+
+class LocalMessage:
+    """
+    A message delivered by the LocalBroker, with the attributes of mqtt.MQTTMessage used by the dashboard.
+
+    Args:
+        topic (str): The topic of the message.
+        payload (bytes): The payload of the message.
+        qos (int, optional): The quality of service level. Defaults to 0.
+        retain (bool, optional): Indicates if the message is a retained message. Defaults to False.
+    """
+
+    def __init__(self, topic, payload, qos=0, retain=False):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+
+
+class LocalBroker:
+    """
+    A lightweight in-process stand-in for an MQTT broker, used for testing without a network.
+    Messages are delivered synchronously on the thread that publishes them.
+
+    Attributes:
+        subscriptions (dict): Maps each topic filter to the set of subscribed clients.
+        wildcards (dict): The entries of subscriptions whose topic filter contains a wildcard.
+        retained (dict): Stores the last retained message per topic.
+        published (int): The number of messages published to the broker.
+        delivered (int): The number of messages delivered to clients.
+    """
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.wildcards = {}
+        self.retained = {}
+        self.published = 0
+        self.delivered = 0
+        self.lock = threading.Lock()
+
+    def client(self):
+        """
+        Creates a client connected to this broker.
+
+        Returns:
+            LocalClient: The new client.
+        """
+        return LocalClient(self)
+
+    def subscribe(self, client, topic_filter):
+        """
+        Subscribes a client to a topic filter and delivers the matching retained messages.
+
+        Args:
+            client (LocalClient): The subscribing client.
+            topic_filter (str): The topic filter, MQTT wildcards are supported.
+
+        """
+        self.subscribe_all(client, [topic_filter])
+
+    def subscribe_all(self, client, topic_filters):
+        """
+        Subscribes a client to several topic filters at once and delivers the matching retained messages.
+
+        Args:
+            client (LocalClient): The subscribing client.
+            topic_filters (list): The topic filters, MQTT wildcards are supported.
+
+        """
+        with self.lock:
+            subscriptions = dict(self.subscriptions)
+            retained = []
+            for topic_filter in topic_filters:
+                subscriptions[topic_filter] = subscriptions.get(topic_filter, frozenset()) | {client}
+                retained.extend(message for topic, message in self.retained.items() if topic_matches_sub(topic_filter, topic))
+            self._set_subscriptions(subscriptions)
+
+        for message in retained:
+            client.deliver(message)
+
+    def unsubscribe(self, client, topic_filter):
+        """
+        Unsubscribes a client from a topic filter.
+
+        Args:
+            client (LocalClient): The subscribed client.
+            topic_filter (str): The topic filter.
+
+        """
+        self.unsubscribe_all(client, [topic_filter])
+
+    def unsubscribe_all(self, client, topic_filters):
+        """
+        Unsubscribes a client from several topic filters at once.
+
+        Args:
+            client (LocalClient): The subscribed client.
+            topic_filters (list): The topic filters.
+
+        """
+        with self.lock:
+            subscriptions = dict(self.subscriptions)
+            for topic_filter in topic_filters:
+                clients = subscriptions.get(topic_filter, frozenset()) - {client}
+                if clients:
+                    subscriptions[topic_filter] = clients
+                else:
+                    subscriptions.pop(topic_filter, None)
+            self._set_subscriptions(subscriptions)
+
+    def _set_subscriptions(self, subscriptions):
+        """
+        A private method that swaps in a new subscription table, publish never sees a partially updated one.
+
+        Args:
+            subscriptions (dict): The new subscription table.
+
+        """
+        self.wildcards = {topic_filter: clients for topic_filter, clients in subscriptions.items() if "+" in topic_filter or "#" in topic_filter}
+        self.subscriptions = subscriptions
+
+    def disconnect(self, client):
+        """
+        Removes all subscriptions of a client.
+
+        Args:
+            client (LocalClient): The disconnecting client.
+
+        """
+        self.unsubscribe_all(client, list(self.subscriptions))
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        """
+        Publishes a message to all clients subscribed to a matching topic filter.
+
+        Args:
+            topic (str): The topic of the message.
+            payload (bytes): The payload of the message.
+            qos (int, optional): The quality of service level. Defaults to 0.
+            retain (bool, optional): Stores the message for future subscribers. Defaults to False.
+
+        """
+        message = LocalMessage(topic, payload, qos)
+        self.published += 1
+
+        if retain:
+            with self.lock:
+                if payload:
+                    self.retained[topic] = LocalMessage(topic, payload, qos, True)
+                else:
+                    self.retained.pop(topic, None)
+
+        # Exact filters are looked up directly, only wildcard filters need to be matched
+        wildcards = self.wildcards
+        receivers = set(self.subscriptions.get(topic, ()))
+        for topic_filter, clients in wildcards.items():
+            if topic_matches_sub(topic_filter, topic):
+                receivers.update(clients)
+
+        for client in receivers:
+            client.deliver(message)
+        self.delivered += len(receivers)
+
+
+class LocalClient:
+    """
+    A client of the LocalBroker that mimics the parts of the mqtt.Client interface used by the dashboard,
+    so it can be passed to the MessageHandler instead of a networked client.
+
+    Args:
+        broker (LocalBroker): The broker the client connects to.
+
+    Attributes:
+        broker (LocalBroker): The broker the client connects to.
+        on_connect (callable): Called with (client, userdata, flags, rc) when the client connects.
+        on_message (callable): Called with (client, userdata, message) for every delivered message.
+        userdata: User-defined data passed to the callbacks.
+        connected (bool): Indicates if the client is connected.
+        connects (int): The number of times the client connected.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.on_connect = None
+        self.on_message = None
+        self.userdata = None
+        self.connected = False
+        self.connects = 0
+
+    def connect(self, host=None, port=1883, keepalive=60):
+        """
+        Connects to the broker and calls on_connect, the address is ignored.
+
+        Returns:
+            int: 0, the MQTT success code.
+        """
+        self.connected = True
+        self.connects += 1
+        if self.on_connect is not None:
+            self.on_connect(self, self.userdata, {}, 0)
+        return 0
+
+    def reconnect(self):
+        """
+        Drops all subscriptions and connects again, like a broker without persistent sessions.
+
+        """
+        self.broker.disconnect(self)
+        return self.connect()
+
+    def disconnect(self):
+        """
+        Disconnects from the broker and removes all subscriptions.
+
+        """
+        self.connected = False
+        self.broker.disconnect(self)
+        return 0
+
+    def is_connected(self):
+        return self.connected
+
+    def loop_start(self):
+        # Messages are delivered on the publishing thread, so there is no network loop to run
+        return 0
+
+    def loop_stop(self):
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        """
+        Subscribes to a topic filter or a list of (topic filter, qos) tuples.
+
+        """
+        topics = topic if isinstance(topic, list) else [(topic, qos)]
+        self.broker.subscribe_all(self, [topic_filter for topic_filter, _ in topics])
+        return 0, None
+
+    def unsubscribe(self, topic):
+        """
+        Unsubscribes from a topic filter or a list of topic filters.
+
+        """
+        topics = topic if isinstance(topic, list) else [topic]
+        self.broker.unsubscribe_all(self, topics)
+        return 0, None
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """
+        Publishes a message, str and number payloads are encoded like mqtt.Client does.
+
+        """
+        if payload is None:
+            payload = b""
+        elif isinstance(payload, str):
+            payload = payload.encode()
+        elif isinstance(payload, (int, float)):
+            payload = str(payload).encode()
+
+        self.broker.publish(topic, payload, qos, retain)
+        return 0, None
+
+    def deliver(self, message):
+        """
+        Delivers a message from the broker to the on_message callback.
+
+        Args:
+            message (LocalMessage): The delivered message.
+
+        """
+        if self.connected and self.on_message is not None:
+            self.on_message(self, self.userdata, message)
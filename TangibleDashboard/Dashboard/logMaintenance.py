@@ -0,0 +1,294 @@
+import argparse
+import gzip
+import io
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIONS = ("gzip", "zstd", None)
+
+COMPRESSED_SUFFIXES = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+# Suffix of a compressed file that is still being written
+PARTIAL_SUFFIX = ".tmp"
+
+CHUNK_SIZE = 64 * 1024
+
+
+def open_log(path):
+    """
+    Opens a log file for reading, decompressing it while it is read if it was compressed on rotation.
+
+    Args:
+        path (str): The path of the log file.
+
+    Returns:
+        io.TextIOBase: The text stream of the log file.
+    """
+    if path.endswith(COMPRESSED_SUFFIXES["gzip"]):
+        return gzip.open(path, "rt", errors="replace")
+
+    if path.endswith(COMPRESSED_SUFFIXES["zstd"]):
+        if zstandard is None:
+            raise RuntimeError(f"Reading '{path}' requires the zstandard package.")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+        return io.TextIOWrapper(stream, errors="replace")
+
+    return open(path, "r", errors="replace")
+
+
+def iter_log_lines(paths):
+    """
+    Yields the lines of several log files in order, without loading a whole file into memory.
+
+    Args:
+        paths (list): The paths of the log files.
+
+    Yields:
+        str: The lines without their line break.
+    """
+    for path in paths:
+        with open_log(path) as log_file:
+            for line in log_file:
+                yield line.rstrip("\n")
+
+
+class LogMaintainer:
+    """
+    A class that compresses rotated log files and enforces the retention of the log directory on a background thread.
+    Its rotate method is used as the rotator of a rotating file handler, so the logging thread only renames the closed file.
+
+    Args:
+        log_file_path (str): The path of the active log file, rotated files start with it.
+        compression (str, optional): The compression of rotated files, either "gzip", "zstd" (requires the zstandard package)
+            or None. Defaults to "gzip".
+        max_bytes (int, optional): The maximum total size (in bytes) of the rotated files, the oldest are deleted first. Defaults to None (no limit).
+        max_age (float, optional): The maximum age (in seconds) of the rotated files. Defaults to None (no limit).
+
+    Attributes:
+        log_file_path (str): The path of the active log file.
+        compression (str): The compression of rotated files, or None.
+        max_bytes (int): The maximum total size (in bytes) of the rotated files, or None.
+        max_age (float): The maximum age (in seconds) of the rotated files, or None.
+        pending (queue.SimpleQueue): The rotated files waiting to be compressed.
+        compressed (int): The number of compressed files.
+        deleted (int): The number of files deleted by the retention.
+        worker_thread (threading.Thread): The thread compressing and deleting the files.
+    """
+
+    def __init__(self, log_file_path, compression="gzip", max_bytes=None, max_age=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Invalid compression '{compression}', expected one of {COMPRESSIONS}.")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("The zstd compression requires the zstandard package.")
+
+        self.log_file_path = log_file_path
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.pending = queue.SimpleQueue()
+        self.compressed = 0
+        self.deleted = 0
+        self.worker_thread = None
+
+    def rotate(self, source, dest):
+        """
+        Renames the closed log file and hands it over to the background thread.
+
+        Args:
+            source (str): The path of the closed log file.
+            dest (str): The path of the rotated log file.
+
+        """
+        if os.path.exists(source):
+            os.replace(source, dest)
+            self.pending.put(dest)
+
+    def start(self):
+        """
+        Starts the background thread, which first handles files left over from a previous run.
+
+        """
+        self.worker_thread = threading.Thread(target=self._maintain)
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
+
+    def stop(self):
+        """
+        Compresses the remaining rotated files and stops the background thread.
+
+        """
+        if self.worker_thread is not None:
+            self.pending.put(None)
+            self.worker_thread.join()
+            self.worker_thread = None
+
+    def _maintain(self):
+        """
+        A private method that compresses the rotated files and applies the retention after each one.
+
+        """
+        self._lower_priority()
+        self._sweep()
+
+        while True:
+            path = self.pending.get()
+            if path is None:
+                return
+
+            try:
+                self.compress(path)
+                self.apply_retention()
+            except OSError as e:
+                print(f"[ERROR] (log_maintenance) Failed to maintain '{path}': {e}", file=sys.stderr)
+
+    def _sweep(self):
+        """
+        A private method that handles the files left over from a previous run, logging the errors so the background
+        thread keeps running.
+
+        """
+        try:
+            paths = self.rotated_files()
+        except OSError as e:
+            print(f"[ERROR] (log_maintenance) Failed to list the rotated logs: {e}", file=sys.stderr)
+            return
+
+        for path in paths:
+            try:
+                if path.endswith(PARTIAL_SUFFIX):
+                    # Compression interrupted by the end of the previous run, the original file still exists
+                    os.remove(path)
+                elif not self.is_compressed(path):
+                    self.compress(path)
+            except OSError as e:
+                print(f"[ERROR] (log_maintenance) Failed to maintain '{path}': {e}", file=sys.stderr)
+
+        try:
+            self.apply_retention()
+        except OSError as e:
+            print(f"[ERROR] (log_maintenance) Failed to apply the retention: {e}", file=sys.stderr)
+
+    def _lower_priority(self):
+        """
+        A private method that gives the background thread the lowest CPU priority, where supported.
+
+        """
+        try:
+            # On Linux the priority of a single thread can be set through its native ID
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+    def is_compressed(self, path):
+        """
+        Returns True if the path is a compressed log file.
+
+        """
+        return path.endswith(tuple(COMPRESSED_SUFFIXES.values()))
+
+    def rotated_files(self):
+        """
+        Lists the rotated files of the log, oldest first.
+
+        Returns:
+            list: The paths of the rotated files.
+        """
+        directory, base_name = os.path.split(self.log_file_path)
+        prefix = base_name + "."
+        paths = [os.path.join(directory, name) for name in os.listdir(directory or ".") if name.startswith(prefix)]
+        return sorted(paths)
+
+    def compress(self, path):
+        """
+        Compresses a rotated log file in chunks and deletes the original.
+
+        Args:
+            path (str): The path of the rotated log file.
+
+        """
+        if self.compression is None or not os.path.exists(path):
+            return
+
+        compressed_path = path + COMPRESSED_SUFFIXES[self.compression]
+        partial_path = compressed_path + PARTIAL_SUFFIX
+
+        with open(path, "rb") as source:
+            if self.compression == "gzip":
+                with gzip.open(partial_path, "wb", compresslevel=6) as target:
+                    shutil.copyfileobj(source, target, CHUNK_SIZE)
+            else:
+                with open(partial_path, "wb") as target:
+                    zstandard.ZstdCompressor(level=3).copy_stream(source, target, read_size=CHUNK_SIZE)
+
+        # Keep the modification time, the retention is based on it
+        stat = os.stat(path)
+        os.utime(partial_path, (stat.st_atime, stat.st_mtime))
+        os.replace(partial_path, compressed_path)
+        os.remove(path)
+        self.compressed += 1
+
+    def apply_retention(self):
+        """
+        Deletes the rotated files older than max_age and the oldest files beyond max_bytes.
+
+        """
+        if self.max_bytes is None and self.max_age is None:
+            return
+
+        files = []
+        for path in self.rotated_files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        now = time.time()
+
+        for modified, size, path in files:
+            too_old = self.max_age is not None and now - modified > self.max_age
+            too_large = self.max_bytes is not None and total > self.max_bytes
+            if not too_old and not too_large:
+                break
+
+            os.remove(path)
+            total -= size
+            self.deleted += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print rotated dashboard logs, decompressing them on the fly.")
+    parser.add_argument("paths", nargs="+", help="The log files, or log directories to print all files of.")
+    parser.add_argument("--contains", help="Only print lines containing this text.")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            # Rotated files keep their modification time, so the active log file comes last
+            files = [os.path.join(path, name) for name in os.listdir(path) if not name.endswith(PARTIAL_SUFFIX)]
+            paths.extend(sorted(files, key=os.path.getmtime))
+        else:
+            paths.append(path)
+
+    for line in iter_log_lines(paths):
+        if args.contains is None or args.contains in line:
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
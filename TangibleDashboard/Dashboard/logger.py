@@ -1,20 +1,44 @@
-import datetime
+import atexit
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+
+from logMaintenance import LogMaintainer
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    A QueueHandler that hands the unformatted record to the listener thread, so the message arguments
+    are only formatted there instead of on the calling thread.
+    """
+
+    def prepare(self, record):
+        return record
 
 
 class Logger:
     """
     A custom logger class that logs messages to a file and prints them to the console.
+    The calling thread only puts the record into a queue, a listener thread formats and writes it.
 
     Args:
         log_file (str, optional): The name of the log file. If not provided, a log file with the current date will be created.
+        console (bool, optional): Indicates if the messages are also printed to the console. Defaults to True.
+        compression (str, optional): The compression of rotated log files, either "gzip", "zstd" or None. Defaults to "gzip".
+        max_bytes (int, optional): The maximum total size (in bytes) of the rotated log files. Defaults to 100 MB.
+        max_age_days (float, optional): The number of days rotated log files are kept. Defaults to 30.
 
     Attributes:
         logger (logging.Logger): The logger object used for logging messages.
+        listener (QueueListener): The listener thread writing the queued records to the file and console handlers.
+        maintainer (LogMaintainer): Compresses the rotated log files and deletes old ones in the background.
+        rate_limits (dict): Maps the message of a rate limited call site to its next allowed time and suppressed count.
     """
-    def __init__(self, log_file=None):
+    def __init__(self, log_file=None, console=True, compression="gzip", max_bytes=100 * 1024 * 1024, max_age_days=30):
         # Ensure the logs directory exists
         log_dir = 'logs'
         if not os.path.exists(log_dir):
@@ -30,37 +54,108 @@ class Logger:
         handler = TimedRotatingFileHandler(log_file_path, when="midnight", interval=1)
         handler.suffix = "%Y-%m-%d_%H-%M"
         handler.setLevel(logging.INFO)
-        
+
+        # The handler only renames the closed file, compression and retention run on the maintainer thread
+        max_age = None if max_age_days is None else max_age_days * 24 * 60 * 60
+        self.maintainer = LogMaintainer(log_file_path, compression, max_bytes, max_age)
+        handler.rotator = self.maintainer.rotate
+        self.maintainer.start()
+
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
         handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        handlers = [handler]
 
-    def info(self, message):
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+            handlers.append(console_handler)
+
+        log_queue = queue.SimpleQueue()
+        self.logger.addHandler(DeferredQueueHandler(log_queue))
+        self.listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        self.rate_limits = {}
+        self.rate_limit_lock = threading.Lock()
+
+        # Write the remaining records when the program exits
+        atexit.register(self.stop)
+
+    def info(self, message, *args, rate_limit=None):
         """
         Logs an info-level message.
 
         Args:
-            message (str): The message to be logged.
+            message (str): The message to be logged, with %-style placeholders for the args.
+            *args: The arguments merged into the message when it is written.
+            rate_limit (float, optional): The minimum time (in seconds) between two messages from this call site.
         """
-        self.logger.info(message)
-        print(f"[INFO] {message}")
+        self._log(logging.INFO, message, args, rate_limit)
 
-    def warning(self, message):
+    def warning(self, message, *args, rate_limit=None):
         """
         Logs a warning-level message.
 
         Args:
-            message (str): The message to be logged.
+            message (str): The message to be logged, with %-style placeholders for the args.
+            *args: The arguments merged into the message when it is written.
+            rate_limit (float, optional): The minimum time (in seconds) between two messages from this call site.
         """
-        self.logger.warning(message)
-        print(f"[WARNING] {message}")
+        self._log(logging.WARNING, message, args, rate_limit)
 
-    def error(self, message):
+    def error(self, message, *args, rate_limit=None):
         """
         Logs an error-level message.
 
         Args:
-            message (str): The message to be logged.
+            message (str): The message to be logged, with %-style placeholders for the args.
+            *args: The arguments merged into the message when it is written.
+            rate_limit (float, optional): The minimum time (in seconds) between two messages from this call site.
         """
-        self.logger.error(message)
-        print(f"[ERROR] {message}")
+        self._log(logging.ERROR, message, args, rate_limit)
+
+    def _log(self, level, message, args, rate_limit):
+        if not self.logger.isEnabledFor(level):
+            return
+
+        if rate_limit is not None:
+            # The unformatted message identifies the call site
+            now = time.monotonic()
+            with self.rate_limit_lock:
+                limit = self.rate_limits.get(message)
+
+                if limit is not None and now < limit[0]:
+                    limit[1] += 1
+                    return
+
+                self.rate_limits[message] = [now + rate_limit, 0]
+
+            if limit is not None and limit[1]:
+                message = message + " (%d similar messages suppressed)"
+                args = args + (limit[1],)
+
+        self.logger.log(level, message, *args)
+
+    def stop(self):
+        """
+        Writes the remaining queued records and stops the listener and maintainer threads.
+
+        """
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.maintainer.stop()
+
+
+class NullLogger:
+    """
+    A logger with the interface of Logger that discards every message, e.g. for benchmarks, replays and simulations.
+
+    """
+
+    def info(self, message, *args, rate_limit=None):
+        pass
+
+    def warning(self, message, *args, rate_limit=None):
+        pass
+
+    def error(self, message, *args, rate_limit=None):
+        pass
@@ -3,28 +3,64 @@ import sys
 import time
 
 import serial
+from eventJournal import EventJournal
+from latencyTracer import LatencyTracer
 from lightController import LightController
 from logger import Logger
 from messageHandler import MessageHandler
+from metrics import DashboardMetrics, MetricsServer
+from profilingHooks import ProfilingHooks
 from proxy import Proxy
+from trafficRecorder import TrafficRecorder
 
 logger = Logger()
 
+# Set a directory, e.g. "journal", to record the proxy updates and animations for journalQuery.py,
+# the oldest segments are deleted beyond 1 GB or 30 days
+EVENT_JOURNAL = None
+journal = EventJournal(EVENT_JOURNAL, max_bytes=1024 * 1024 * 1024, max_age=30 * 24 * 60 * 60, logger=logger) if EVENT_JOURNAL else None
+
+# kill -USR1 <pid> writes a 30 s profile of all threads, kill -USR2 <pid> the allocation growth, both to logs/
+profilingHooks = ProfilingHooks(logger)
+profilingHooks.install()
+
+# Set a path, e.g. "traffic/dashboard.trc", to record the received MQTT messages for trafficReplay.py
+TRAFFIC_RECORDING = None
+recorder = TrafficRecorder(TRAFFIC_RECORDING) if TRAFFIC_RECORDING else None
+
+# Set to True to log the latency of each processing stage, from the MQTT receipt to the serial write, every minute
+LATENCY_TRACING = False
+tracer = LatencyTracer(logger, summary_interval=60) if LATENCY_TRACING else None
+
+# Set a port, e.g. 9464, to serve the throughput, queue depth and drop counters on http://<host>:<port>/metrics for Prometheus
+METRICS_PORT = None
+metrics = DashboardMetrics() if METRICS_PORT else None
+
 # Initialize the LightController
-lightController = LightController('/dev/ttyUSB0', 9600, logger)
+lightController = LightController('/dev/ttyUSB0', 9600, logger, journal=journal, tracer=tracer, metrics=metrics)
 
 # Proxy setup
-Proxy0 = Proxy(0, logger)
-Proxy1 = Proxy(1, logger)
-Proxy2 = Proxy(2, logger)
-Proxy3 = Proxy(3, logger)
+Proxy0 = Proxy(0, logger, metrics=metrics)
+Proxy1 = Proxy(1, logger, metrics=metrics)
+Proxy2 = Proxy(2, logger, metrics=metrics)
+Proxy3 = Proxy(3, logger, metrics=metrics)
 
 proxy_list = [Proxy0, Proxy1, Proxy2, Proxy3]
+# Time (in seconds) repeated state messages of a proxy are dropped before decoding, e.g. 30, 0 processes every message
+DUPLICATE_TTL = 0
+# Time (in seconds) the updates of a proxy are collected, so only its latest position and state queue an animation, 0 compares every update
+COALESCE_WINDOW = 0.5
+
 # Initialize the MessageHandler
-messageHandler = MessageHandler('test.mosquitto.org', proxy_list, lightController, "dashboardAnimations", "dashboardOverride", logger)
+messageHandler = MessageHandler('test.mosquitto.org', proxy_list, lightController, "dashboardAnimations", "dashboardOverride", logger, worker_count=1, coalesce_window=COALESCE_WINDOW, journal=journal, recorder=recorder, tracer=tracer, metrics=metrics, duplicate_ttl=DUPLICATE_TTL)
 
 # Start the MessageHandler
 messageHandler.start()
+if tracer is not None:
+    tracer.start()
+metrics_server = MetricsServer(metrics, METRICS_PORT, logger=logger) if metrics is not None else None
+if metrics_server is not None:
+    metrics_server.start()
 
 lightController.send_boot()
 
@@ -48,3 +84,11 @@ try:
 except KeyboardInterrupt:
     # Graceful shutdown on Ctrl+C
     messageHandler.stop()
+    if journal is not None:
+        journal.close()
+    if recorder is not None:
+        recorder.close()
+    if tracer is not None:
+        tracer.stop()
+    if metrics_server is not None:
+        metrics_server.stop()
@@ -0,0 +1,47 @@
+import asyncio
+
+from asyncRuntime import AsyncLightController, AsyncMessageHandler, run_dashboard
+from eventJournal import EventJournal
+from logger import Logger
+from profilingHooks import ProfilingHooks
+from proxy import Proxy
+
+
+async def main():
+    logger = Logger()
+
+    # Set a directory, e.g. "journal", to record the proxy updates and animations for journalQuery.py
+    EVENT_JOURNAL = None
+    journal = EventJournal(EVENT_JOURNAL, max_bytes=1024 * 1024 * 1024, max_age=30 * 24 * 60 * 60, logger=logger) if EVENT_JOURNAL else None
+
+    # kill -USR1 <pid> writes a 30 s profile of all threads, kill -USR2 <pid> the allocation growth, both to logs/
+    profilingHooks = ProfilingHooks(logger)
+    profilingHooks.install()
+
+    # Initialize the LightController
+    lightController = AsyncLightController('/dev/ttyUSB0', 9600, logger, journal=journal)
+
+    # Proxy setup
+    proxy_list = [Proxy(ID, logger) for ID in range(4)]
+
+    # Time (in seconds) the updates of a proxy are collected, so only its latest position and state queue an animation
+    COALESCE_WINDOW = 0.5
+
+    # Initialize the MessageHandler
+    messageHandler = AsyncMessageHandler('test.mosquitto.org', proxy_list, lightController, "dashboardAnimations", "dashboardOverride", logger, coalesce_window=COALESCE_WINDOW, journal=journal)
+
+    lightController.send_boot()
+
+    # Run the MessageHandler and the LightController on the same event loop
+    try:
+        await run_dashboard(messageHandler, lightController)
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+try:
+    asyncio.run(main())
+except KeyboardInterrupt:
+    # Graceful shutdown on Ctrl+C, asyncio.run cancels the running tasks
+    pass
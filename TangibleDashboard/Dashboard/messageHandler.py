@@ -1,4 +1,24 @@
+import functools
+import threading
+import time
+
 import paho.mqtt.client as mqtt
+from animationQueue import PRIORITY_COORDINATES, PRIORITY_OVERRIDE, PRIORITY_PATH
+from changeDetector import ANIMATION_COORDINATES, ANIMATION_HUB_PATH, ANIMATION_PROXY_PATH, CHANGE_TYPES, ChangeDetector
+from duplicateFilter import DuplicateFilter
+from eventJournal import EVENT_ANIMATION_QUEUED, EVENT_HUB_STATE, EVENT_OVERRIDE, EVENT_PROXY_STATE
+from ingestQueue import IngestQueue
+from latencyTracer import STAGE_ANIMATION, STAGE_COALESCE, STAGE_COMPARE
+from metrics import TOPIC_ANIMATION, TOPIC_HUB_STATE, TOPIC_OVERRIDE, TOPIC_PROXY_STATE, TOPIC_UNKNOWN
+from payloadParser import ERROR_MESSAGES, STATE_PLUGGED_IN, parse_int, parse_override, parse_path, parse_proxy_state, parse_state
+from proxyRegistry import ProxyRegistry
+from topicRouter import TopicRouter
+from updateCoalescer import UpdateCoalescer
+
+SUBSCRIBE_MODES = ("single", "batched", "wildcard")
+
+# Minimum time (in seconds) between two log messages of the per-message call sites
+HOT_PATH_LOG_INTERVAL = 1.0
 
 
 class MessageHandler:
@@ -12,29 +32,96 @@ class MessageHandler:
         animation_topic (str): The general topic for animation messages from the hub.
         override_topic (str): The topic for manual override messages.
         logger (Logger): The logger object for logging messages.
+        subscribe_mode (str, optional): How topics are subscribed on (re)connect, either "single" (one SUBSCRIBE per topic),
+            "batched" (all topics in one SUBSCRIBE) or "wildcard" (one wildcard filter resolved by the router). Defaults to "batched".
+        wildcard_filter (str, optional): The topic filter used in "wildcard" mode, required in that mode. MQTT wildcards have
+            to span a whole topic level, so the single-level topics of the dashboard are only matched by "+", which receives every
+            single-level topic of the broker. Only use it on a broker dedicated to the dashboard. Defaults to None.
+        worker_count (int, optional): The number of worker threads processing the received messages. With 0 the messages
+            are processed on the MQTT network thread. Messages on the same topic are always processed by the same worker. Defaults to 0.
+        queue_size (int, optional): The maximum number of messages waiting per worker. Defaults to 1000.
+        overflow_policy (str, optional): What happens if a worker queue is full, either "block", "drop_oldest" or "drop_newest". Defaults to "block".
+        client (mqtt.Client, optional): The MQTT client to use, e.g. a LocalClient of an in-process broker. Defaults to a new mqtt.Client.
+        coalesce_window (float, optional): The time (in seconds) updates of a proxy are coalesced before they are compared,
+            so only the latest position and state queue an animation. With 0 every update is compared immediately. Defaults to 0.
+        journal (EventJournal, optional): The journal the proxy updates and queued animations are recorded in. Defaults to None.
+        recorder (TrafficRecorder, optional): Records every received message, so the traffic can be replayed with trafficReplay.py. Defaults to None.
+        tracer (LatencyTracer, optional): Traces the latency of each message through the processing stages. Defaults to None.
+        metrics (DashboardMetrics, optional): Counts the received messages per topic type, parse failures and reconnects. Defaults to None.
+        duplicate_ttl (float, optional): The time (in seconds) byte-identical repeats of the last state message of a proxy
+            are dropped before they are decoded. With 0 every message is processed. Defaults to 0.
 
     Attributes:
         broker_address (str): The address of the MQTT broker.
-        proxy_list (list): A list of proxy objects.
+        proxies (ProxyRegistry): The registry of proxy objects, indexed by their ID.
         light_controller (object): The object that controls the light animations.
         animation_topic (str): The general topic for animation messages from the hub.
         override_topic (str): The topic for manual override messages.
         logger (Logger): The logger object for logging messages.
-        proxy_data (list): A list that stores the data for each proxy for comparison.
+        router (TopicRouter): Maps each subscribed topic to its handler and target proxy.
+        subscribe_mode (str): How topics are subscribed on (re)connect.
+        wildcard_filter (str): The topic filter used in "wildcard" mode.
+        ingest_queues (list): The IngestQueue of each worker, or None if messages are processed on the network thread.
+        workers (list): The worker threads draining the ingest queues.
+        state_lock (threading.RLock): Serializes the processing of messages that change the proxy state.
+        coalescer (UpdateCoalescer): Collects the updates of each proxy within the coalesce window, or None if disabled.
+        change_detector (ChangeDetector): Decides the animation of each change from the changed fields of the proxy.
+        animations (dict): Maps each animation of the change detector to the function queuing it for a proxy.
         client (mqtt.Client): The MQTT client instance.
+        journal (EventJournal): The journal the proxy updates and queued animations are recorded in, or None.
+        recorder (TrafficRecorder): Records every received message, or None.
+        tracer (LatencyTracer): Traces the latency of each message through the processing stages, or None.
+        pending_traces (dict): Maps the proxy ID to the trace of its first coalesced update while tracing.
+        metrics (DashboardMetrics): Counts the received messages per topic type, parse failures and reconnects, or None.
+        connections (int): The number of times the client connected to the broker.
+        duplicate_filter (DuplicateFilter): Drops repeats of the last state message of each proxy, or None if disabled.
     """
 
-    def __init__(self, broker_address, proxy_list, light_controller, animation_topic, override_topic, logger):
+    def __init__(self, broker_address, proxy_list, light_controller, animation_topic, override_topic, logger, subscribe_mode="batched", wildcard_filter=None, worker_count=0, queue_size=1000, overflow_policy="block", client=None, coalesce_window=0, journal=None, recorder=None, tracer=None, metrics=None, duplicate_ttl=0):
+        if subscribe_mode not in SUBSCRIBE_MODES:
+            raise ValueError(f"Invalid subscribe mode '{subscribe_mode}', expected one of {SUBSCRIBE_MODES}.")
+        if subscribe_mode == "wildcard" and wildcard_filter is None:
+            raise ValueError("The wildcard subscribe mode needs a wildcard filter.")
+
         self.broker_address = broker_address
-        self.proxy_list = proxy_list
+        self.proxies = ProxyRegistry(proxy_list)
         self.light_controller = light_controller
         self.animation_topic = animation_topic
         self.override_topic = override_topic
         self.logger = logger
-
-        # Initialize proxy_data with one (0, 0, 0) tuple for each element in proxy_list
-        self.proxy_data = [(0, 0, 0) for _ in proxy_list]
-        self.client = mqtt.Client()
+        self.subscribe_mode = subscribe_mode
+        self.wildcard_filter = wildcard_filter
+
+        # Start the comparison of each proxy from an announced (0, 0, 0)
+        for proxy in self.proxies:
+            proxy.table.reset_announced(proxy.index)
+        self.router = TopicRouter()
+        self.state_lock = threading.RLock()
+        self.workers = []
+        self.duplicate_filter = DuplicateFilter(duplicate_ttl) if duplicate_ttl > 0 else None
+        self.ingest_queues = None
+        if worker_count > 0:
+            on_drop = self.forget_dropped if self.duplicate_filter is not None else None
+            self.ingest_queues = [IngestQueue(queue_size, overflow_policy, on_drop) for _ in range(worker_count)]
+        self.coalescer = None
+        if coalesce_window > 0:
+            # While tracing, the changes are flushed one by one, so each is compared with the trace of its proxy
+            self.coalescer = UpdateCoalescer(coalesce_window, self._flush_change, self._flush_changes if tracer is None else None)
+        self.change_detector = ChangeDetector()
+        self.animations = {
+            ANIMATION_COORDINATES: lambda proxy: self.handle_animation(proxy.ID, "coordinates"),
+            ANIMATION_PROXY_PATH: lambda proxy: self.handle_animation(f"{proxy.ID},0", "path"),
+            ANIMATION_HUB_PATH: lambda proxy: self.handle_animation(f"0,{proxy.ID}", "path"),
+        }
+        self.client = client if client is not None else mqtt.Client()
+        self.journal = journal
+        self.recorder = recorder
+        self.tracer = tracer
+        self.pending_traces = {}
+        self.metrics = metrics
+        self.connections = 0
+        if metrics is not None:
+            metrics.add_message_handler(self)
 
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
@@ -50,22 +137,32 @@ class MessageHandler:
             rc (int): The connection result code.
 
         """
-        self.logger.info(f"(on_connect) Connected with result code {rc}")
-        # Subscribe to set_state and is_state topics for each proxy
-        for proxy in self.proxy_list:
-            proxy_state_update_topic = f"proxy_state_update_proxy_{proxy.ID}"
-            hub_state_update_topic = f"hub_state_update_proxy_{proxy.ID}"
-            client.subscribe(proxy_state_update_topic)
-            client.subscribe(hub_state_update_topic)
-            self.logger.info(f"(on_connect) Subscribed to {proxy_state_update_topic} and {hub_state_update_topic}")
+        self.logger.info("(on_connect) Connected with result code %s", rc)
+        if self.metrics is not None and self.connections > 0:
+            self.metrics.count_reconnect()
+        self.connections += 1
+        self.build_routes()
+
+        if self.subscribe_mode == "wildcard":
+            # A single filter covers every proxy, the router resolves the topics locally
+            client.subscribe(self.wildcard_filter)
+            self.logger.info("(on_connect) Subscribed to %s", self.wildcard_filter)
+            return
 
-        # Subscribe to general animation topic for the hub
-        client.subscribe(self.animation_topic)
-        self.logger.info(f"(on_connect) Subscribed to {self.animation_topic}")
+        topics = [self.animation_topic, self.override_topic]
+        for proxy in self.proxies:
+            topics.extend(self.proxy_topics(proxy.ID))
 
-        # Subscribe to the override topic for the hub
-        client.subscribe(self.override_topic)
-        self.logger.info(f"(on_connect) Subscribed to {self.override_topic}")
+        if self.subscribe_mode == "batched":
+            # Subscribe to all topics with a single SUBSCRIBE packet
+            client.subscribe([(topic, 0) for topic in topics])
+            self.logger.info("(on_connect) Subscribed to %s topics in one request", len(topics))
+            return
+
+        # Subscribe to the animation and override topics for the hub and the set_state and is_state topics for each proxy
+        for topic in topics:
+            client.subscribe(topic)
+            self.logger.info("(on_connect) Subscribed to %s", topic)
 
     def on_message(self, client, userdata, msg):
         """
@@ -78,27 +175,185 @@ class MessageHandler:
 
         """
         topic = msg.topic
-        
-        try:
-            payload = msg.payload.decode()
-        except Exception as e:
-            self.logger.error(f"(on_message) Failed to decode payload: {e}")
+        timestamp = time.time()
+
+        if self.recorder is not None:
+            self.recorder.record(timestamp, topic, msg.payload)
+
+        if self.subscribe_mode == "wildcard" and self.router.resolve(topic) is None:
+            # Foreign topics matched by the wildcard filter are dropped before decoding
             return
 
-        self.logger.info(f"(on_message) Message received on topic {topic}: {payload}")
+        if self.duplicate_filter is not None and self.is_duplicate(topic, msg.payload, timestamp):
+            return
 
-        if(topic == self.animation_topic):
-           self.handle_animation(payload, "path")
+        if self.ingest_queues is None:
+            self.process_message(topic, msg.payload, timestamp)
+            return
 
-        elif(topic == self.override_topic):
-            self.handle_manual_override(payload)
+        # Only hand the raw message over, so the network thread never waits for the processing
+        queue = self.ingest_queues[hash(topic) % len(self.ingest_queues)]
+        queue.put((topic, msg.payload, timestamp))
 
-        else:
-            self.handle_message(topic, payload)
+    def is_duplicate(self, topic, payload, timestamp):
+        """
+        Checks if a message repeats the last state message of its proxy within the duplicate ttl.
+        Only the state topics of registered proxies are filtered, animations and overrides are commands that are always processed.
+        Repeats are only dropped if processing them would change nothing, see DuplicateFilter.
+
+        Args:
+            topic (str): The topic of the received message.
+            payload (bytes): The raw payload of the received message.
+            timestamp (float): The time the message was received.
+
+        Returns:
+            bool: True if the message should be dropped.
+        """
+        route = self.router.resolve(topic)
+        if route is None or route.proxy is None:
+            if topic == self.override_topic:
+                # An override changes a proxy outside of its own topics, so the next state message of each proxy is processed
+                self.duplicate_filter.clear()
+            return False
+
+        # The manual position of a proxy in override mode is never announced, so each of its updates replays the path animation
+        if route.proxy.override:
+            return False
+
+        return self.duplicate_filter.check(route.proxy.ID, topic, payload, timestamp)
+
+    def forget_dropped(self, item):
+        """
+        Forgets a message that was dropped from a full queue as the last message of its proxy,
+        otherwise its retransmit would be dropped as a repeat and the state change would never be applied.
+
+        Args:
+            item (tuple): The topic, raw payload and receive time of the dropped message.
+        """
+        topic, payload, _ = item
+        route = self.router.resolve(topic)
+        if route is not None and route.proxy is not None:
+            self.duplicate_filter.discard(route.proxy.ID, topic, payload)
+
+    def process_message(self, topic, payload, timestamp):
+        """
+        Decodes a received message and dispatches it to the handler routed for its topic.
+
+        Args:
+            topic (str): The topic of the received message.
+            payload (bytes): The raw payload of the received message.
+            timestamp (float): The time the message was received.
+
+        """
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.begin(timestamp)
+
+        try:
+            try:
+                payload = payload.decode()
+            except Exception as e:
+                self.logger.error("(on_message) Failed to decode payload: %s", e)
+                return
+
+            self.logger.info("(on_message) Message received on topic %s: %s", topic, payload, rate_limit=HOT_PATH_LOG_INTERVAL)
+
+            with self.state_lock:
+                route = self.router.resolve(topic)
+
+                if self.metrics is not None:
+                    topic_type = route.topic_type if route is not None else None
+                    self.metrics.count_message(topic_type or TOPIC_UNKNOWN)
+
+                if route is None:
+                    self.handle_message(topic, payload)
+                    return
+
+                route.handler(payload)
+        finally:
+            if tracer is not None:
+                tracer.end()
+
+    def _process_queue(self, queue):
+        """
+        A private method that continuously processes the messages from an ingest queue.
+
+        Args:
+            queue (IngestQueue): The queue to drain.
+
+        """
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+
+            topic, payload, timestamp = item
+            queue.record_wait(time.time() - timestamp)
+            try:
+                self.process_message(topic, payload, timestamp)
+            except Exception as e:
+                # A failing message must not end the worker, its queue would fill and block the network thread
+                self.logger.error("(_process_queue) Failed to process message on topic %s: %s", topic, e, rate_limit=HOT_PATH_LOG_INTERVAL)
+
+    def ingest_stats(self):
+        """
+        Returns the combined counters of the ingest queues.
+
+        Returns:
+            dict: The queue depth, maximum depth, number of enqueued and dropped messages and the longest wait,
+                or None if messages are processed on the network thread.
+        """
+        if self.ingest_queues is None:
+            return None
+
+        stats = [queue.stats() for queue in self.ingest_queues]
+        return {
+            "depth": sum(s["depth"] for s in stats),
+            "max_depth": max(s["max_depth"] for s in stats),
+            "enqueued": sum(s["enqueued"] for s in stats),
+            "dropped": sum(s["dropped"] for s in stats),
+            "max_wait": max(s["max_wait"] for s in stats),
+        }
+
+    def build_routes(self):
+        """
+        Builds the topic router, mapping every subscribed topic to its handler and target proxy.
+
+        """
+        router = TopicRouter()
+        router.add_route(self.animation_topic, functools.partial(self.handle_animation, animation_type="path"), topic_type=TOPIC_ANIMATION)
+        router.add_route(self.override_topic, self.handle_manual_override, topic_type=TOPIC_OVERRIDE)
+
+        for proxy in self.proxies:
+            self.add_proxy_routes(proxy, router)
+
+        if self.subscribe_mode == "wildcard":
+            # Proxies without a route of their own fall back to the parsing in handle_message
+            for prefix, topic_type in zip(self.proxy_topics(""), (TOPIC_PROXY_STATE, TOPIC_HUB_STATE)):
+                router.add_prefix_route(prefix, self.handle_message, topic_type)
+
+        # Swap the router at once, so workers never see a partially built one
+        self.router = router
+
+    def add_proxy_routes(self, proxy, router=None):
+        """
+        Adds the routes for the topics of a proxy.
+
+        Args:
+            proxy (Proxy): The proxy object.
+            router (TopicRouter, optional): The router to add the routes to. Defaults to the active router.
+
+        """
+        if router is None:
+            router = self.router
+
+        proxy_state_update_topic, hub_state_update_topic = self.proxy_topics(proxy.ID)
+        router.add_route(proxy_state_update_topic, functools.partial(self.handle_proxy_state, proxy), proxy, TOPIC_PROXY_STATE)
+        router.add_route(hub_state_update_topic, functools.partial(self.handle_hub_state, proxy), proxy, TOPIC_HUB_STATE)
 
     def handle_message(self, topic, payload):
         """
-        Handles the received message based on the topic and payload.
+        Handles a message on a topic that is not routed, based on the topic and payload.
 
         Args:
             topic (str): The topic of the received message.
@@ -107,172 +362,270 @@ class MessageHandler:
         """
         # Extract the proxy ID from the topic
         parts = topic.split("_")
-        proxy_ID = self.safe_int_cast(parts[-1])
+        proxy_ID = parse_int(parts[-1])
         
         # Find the proxy
-        proxy = next((p for p in self.proxy_list if p.ID == proxy_ID), None)
+        proxy = self.proxies.get(proxy_ID)
         
         if proxy is None:
-            self.logger.warning(f"(handle_message) Proxy with ID {proxy_ID} not found.")
+            self.logger.warning("(handle_message) Proxy with ID %s not found.", proxy_ID)
             return
         
         # Process based on topic type
         if parts[0] == "proxy":
-            data = payload.split(",")
+            self.handle_proxy_state(proxy, payload)
+        elif parts[0] == "hub":
+            self.handle_hub_state(proxy, payload)
+        else:
+            self.logger.warning("(handle_message) Invalid topic '%s'.", topic)
 
-            if len(data) != 4:
-                self.logger.warning(f"(handle_message) Invalid payload '{payload}' format for 'set' message.")
-                return
-            
-            if(data[3] == "x"):
-                proxy.update(self.safe_int_cast(data[0]), self.safe_int_cast(data[1]), self.safe_int_cast(data[2]), True, False)
-                # Set override back to False, as the state can only be 'x' if the Proxy get freshly plugged in
-                proxy.override = False
-
-            else:
-                # If the override flag is set, do not update the position
-                if(proxy.override):
-                    proxy.state = self.safe_int_cast(data[3])
-                    self.compare_proxy_data(proxy, "proxy")
-                    return
-                
-                proxy.update(self.safe_int_cast(data[0]), self.safe_int_cast(data[1]), self.safe_int_cast(data[2]), True, self.safe_int_cast(data[3]))
-                
-            self.compare_proxy_data(proxy, "proxy")
+    def handle_proxy_state(self, proxy, payload):
+        """
+        Handles a state update published by a proxy.
 
-            self.logger.info(f"(handle_message) Updated Proxy {proxy_ID} with TileValue {data[0]}, rowValue {data[1]}, colValue {data[2]} and State {data[3]}.")
-            
-        elif parts[0] == "hub":
-            # Check if the payload is a valid state
-            state = self.safe_int_cast(payload)
-            if (state is None):
-                self.logger.info(f"(handle_message) Invalid state '{payload}'.")
+        Args:
+            proxy (Proxy): The proxy object.
+            payload (str): The payload of the received message in format 'tile,row,col,state'.
+
+        """
+        error, data = parse_proxy_state(payload)
+
+        if error:
+            if self.metrics is not None:
+                self.metrics.count_parse_failure()
+            self.logger.warning("(handle_proxy_state) Invalid payload '%s' for 'set' message: %s.", payload, ERROR_MESSAGES[error], rate_limit=HOT_PATH_LOG_INTERVAL)
+            return
+        
+        if(data.state is None):
+            proxy.update(data.tile, data.row, data.col, True, False)
+            # Set override back to False, as the state can only be 'x' if the Proxy get freshly plugged in
+            proxy.override = False
+
+        else:
+            # If the override flag is set, do not update the position
+            if(proxy.override):
+                proxy.state = data.state
+                self.submit_change(proxy, "proxy")
+                if self.journal is not None:
+                    self.journal.record(EVENT_PROXY_STATE, proxy.ID, proxy.position, proxy.state)
                 return
             
-            if (state == 0 or state == 1 or state == 2):
-                # do nothing
-                pass
-            else:
-                self.logger.info(f"(handle_message) Invalid state '{payload}'.")
-                return
-
-            proxy.state = state
+            proxy.update(data.tile, data.row, data.col, True, data.state)
             
-            self.compare_proxy_data(proxy, "hub")
-            self.logger.info(f"(handle_message) Updated Proxy {proxy_ID} with State {payload}.")
+        self.submit_change(proxy, "proxy")
+        if self.journal is not None:
+            self.journal.record(EVENT_PROXY_STATE, proxy.ID, proxy.position, proxy.state)
+
+        self.logger.info("(handle_proxy_state) Updated Proxy %s with TileValue %s, rowValue %s, colValue %s and State %s.", proxy.ID, data.tile, data.row, data.col, STATE_PLUGGED_IN if data.state is None else data.state)
+
+    def handle_hub_state(self, proxy, payload):
+        """
+        Handles a state update for a proxy published by the hub.
+
+        Args:
+            proxy (Proxy): The proxy object.
+            payload (str): The payload of the received message, the new state.
+
+        """
+        # Check if the payload is a valid state
+        error, state = parse_state(payload)
+        if error:
+            if self.metrics is not None:
+                self.metrics.count_parse_failure()
+            self.logger.info("(handle_hub_state) Invalid state '%s'.", payload, rate_limit=HOT_PATH_LOG_INTERVAL)
+            return
+        
+        if (state == 0 or state == 1 or state == 2):
+            # do nothing
+            pass
         else:
-            self.logger.warning(f"(handle_message) Invalid topic '{topic}'.")
+            self.logger.info("(handle_hub_state) Invalid state '%s'.", payload)
+            return
+
+        proxy.state = state
+        
+        self.submit_change(proxy, "hub")
+        if self.journal is not None:
+            self.journal.record(EVENT_HUB_STATE, proxy.ID, proxy.position, state)
+        self.logger.info("(handle_hub_state) Updated Proxy %s with State %s.", proxy.ID, payload)
+
+    def submit_change(self, proxy, change_type):
+        """
+        Passes a change of a proxy on to the comparison, through the coalescer if it is enabled.
+
+        Args:
+            proxy (Proxy): The proxy object.
+            change_type (str): The type of change (either "proxy" or "hub").
+
+        """
+        if self.coalescer is None:
+            self.compare_proxy_data(proxy, change_type)
+            return
+
+        if self.tracer is not None and proxy.ID not in self.pending_traces:
+            trace = self.tracer.hand_off(STAGE_COALESCE)
+            if trace is not None:
+                self.pending_traces[proxy.ID] = trace
+
+        self.coalescer.submit(proxy, change_type)
+
+    def _flush_change(self, proxy, change_type):
+        """
+        A private method that compares a coalesced change once its window has passed.
+
+        Args:
+            proxy (Proxy): The proxy object.
+            change_type (str): The type of change (either "proxy" or "hub").
+
+        """
+        with self.state_lock:
+            if self.tracer is not None:
+                self.tracer.attach(self.pending_traces.pop(proxy.ID, None))
+
+            # The proxy may have been removed while the change was pending
+            if self.proxies.get(proxy.ID) is proxy:
+                self.compare_proxy_data(proxy, change_type)
+
+            if self.tracer is not None:
+                self.tracer.end()
+
+    def _flush_changes(self, changes):
+        """
+        A private method that compares all coalesced changes whose window has passed in one batch.
+
+        Args:
+            changes (list): The (proxy, change_type) tuples.
+
+        """
+        with self.state_lock:
+            updates = []
+            for proxy, change_type in changes:
+                # The proxy may have been removed while the change was pending
+                if self.proxies.get(proxy.ID) is not proxy:
+                    continue
+                if change_type not in CHANGE_TYPES:
+                    self.logger.warning("(_flush_changes) Invalid change type '%s'.", change_type)
+                    continue
+                updates.append((proxy, change_type))
+
+            self.change_detector.detect_batch(updates, self.perform_action)
 
     def compare_proxy_data(self, proxy, change_type):
         """
-        Compares the data of the proxy with the stored proxy data and performs actions based on the change type.
+        Compares the data of the proxy with its last announced data and performs the action the change detector decides.
+        Both are stored in the columns of the proxy table.
 
         Args:
             proxy (object): The proxy object.
             changeType (str): The type of change (either "proxy" or "hub").
 
         """
-        if change_type == "proxy":
-            # Extracting x and y coordinates from the position tuple
-            proxy_row, proxy_col = proxy.position
-            
-            if(proxy_row != self.proxy_data[proxy.ID][0] or proxy_col != self.proxy_data[proxy.ID][1]):
-                if(proxy.override):
-                    self.handle_animation(f"{proxy.ID},0", "path")
-                else:   
-                    self.handle_animation(proxy.ID, "coordinates")
-                    self.update_proxy_data(proxy)
-
-            elif(proxy.state != self.proxy_data[proxy.ID][2]):
-                self.handle_animation(f"{proxy.ID},0", "path")
-                self.update_proxy_data(proxy)
-            else:
-                return
-        elif change_type == "hub":
-            if(proxy.state != self.proxy_data[proxy.ID][2]):
-                self.handle_animation(f"0, {proxy.ID}", "path")
-                self.update_proxy_data(proxy)
-            else:
-                return
-        else:
-            self.logger.warning(f"(compare_proxy_data) Invalid change type '{change_type}'.")
+        if self.tracer is not None:
+            self.tracer.stamp(STAGE_COMPARE)
 
-    def update_proxy_data(self, proxy):
+        if change_type not in CHANGE_TYPES:
+            self.logger.warning("(compare_proxy_data) Invalid change type '%s'.", change_type)
+            return
+
+        action = self.change_detector.detect(proxy, change_type)
+        if action is not None:
+            self.perform_action(proxy, action)
+
+    def perform_action(self, proxy, action):
         """
-        Updates the stored proxy data with the data from the proxy object.
+        Queues the animation of an action and announces the data of the proxy if the action requires it.
 
         Args:
             proxy (object): The proxy object.
+            action (Action): The action decided by the change detector.
 
         """
-        if(proxy.position is None):
-            self.proxy_data[proxy.ID] = (None, None, proxy.state)
-            return
+        self.animations[action.animation](proxy)
+        if action.announce:
+            self.update_proxy_data(proxy)
 
-        proxy_row, proxy_col = proxy.position
-        self.proxy_data[proxy.ID] = (proxy_row, proxy_col, proxy.state)
+    def update_proxy_data(self, proxy):
+        """
+        Stores the current position and state of the proxy as announced.
+
+        Args:
+            proxy (object): The proxy object.
+
+        """
+        proxy.table.announce(proxy.index)
 
-    def handle_animation(self, payload, animation_type):
+    def handle_animation(self, payload, animation_type, priority=None):
         """
         Handles the animation based on the payload and animation type.
 
         Args:
             payload (str): The payload of the animation.
             animationType (str): The type of animation (either "path" or "coordinates").
+            priority (int, optional): The priority of the animation message. Defaults to PRIORITY_PATH for paths
+                and PRIORITY_COORDINATES for coordinates.
 
         """
+        if self.tracer is not None:
+            self.tracer.stamp(STAGE_ANIMATION)
+
         if animation_type == "path":
-            data = payload.split(",")
-            if len(data) != 2:
-                self.logger.warning(f"(handle_animation) Invalid payload '{payload}' format for path animation.")
+            error, data = parse_path(payload)
+            if error:
+                if self.metrics is not None:
+                    self.metrics.count_parse_failure()
+                self.logger.warning("(handle_animation) Invalid payload '%s' for path animation: %s.", payload, ERROR_MESSAGES[error], rate_limit=HOT_PATH_LOG_INTERVAL)
                 return
 
-            start_proxy = next((p for p in self.proxy_list if p.ID == self.safe_int_cast(data[0])), None)
-            end_proxy = next((p for p in self.proxy_list if p.ID == self.safe_int_cast(data[1])), None)
+            start_proxy = self.proxies.get(data.start_ID)
+            end_proxy = self.proxies.get(data.end_ID)
 
             if start_proxy is None or end_proxy is None:
                 self.logger.warning("(handle_animation) Proxy IDs not connected or invalid.")
                 return
             
             if(start_proxy.position is None or end_proxy.position is None):
-                self.logger.warning(f"(handle_animation) Proxy positions for Proxy IDs '{start_proxy.ID}' or '{end_proxy.ID}' not set.")
+                self.logger.warning("(handle_animation) Proxy positions for Proxy IDs '%s' or '%s' not set.", start_proxy.ID, end_proxy.ID)
                 return
             
             if(not start_proxy.is_plugged_in or not end_proxy.is_plugged_in):
-                self.logger.warning(f"(handle_animation) Proxies '{start_proxy.ID}' or '{end_proxy.ID}' not connected.")
+                self.logger.warning("(handle_animation) Proxies '%s' or '%s' not connected.", start_proxy.ID, end_proxy.ID)
                 return
             
             # Extracting x and y coordinates from the position tuple
             start_x, start_y = start_proxy.position
             end_x, end_y = end_proxy.position
 
-            self.logger.info(f"(handle_animation) Sending path from Proxy {start_proxy.ID} to Proxy {end_proxy.ID}.")
-            self.light_controller.send_path(start_x, start_y, end_x, end_y)
+            self.logger.info("(handle_animation) Sending path from Proxy %s to Proxy %s.", start_proxy.ID, end_proxy.ID)
+            # A newer path between the same pair of proxies replaces a queued one
+            self.light_controller.send_path(start_x, start_y, end_x, end_y, PRIORITY_PATH if priority is None else priority,
+                                            ("path", start_proxy.ID, end_proxy.ID), proxy_ID=start_proxy.ID)
+            if self.journal is not None:
+                self.journal.record(EVENT_ANIMATION_QUEUED, start_proxy.ID, start_proxy.position)
 
         elif animation_type == "coordinates":
-            if len(str(payload)) != 1:
-                self.logger.warning(f"(handle_animation) Invalid payload '{payload}' format for coordinates animation.")
-                return
-            
-            proxy = next((p for p in self.proxy_list if p.ID == self.safe_int_cast(payload)), None)
+            # Animations queued by the dashboard itself pass the proxy ID as an int
+            proxy = self.proxies.get(payload if isinstance(payload, int) else parse_int(payload))
 
             if proxy is None:
-                self.logger.warning(f"(handle_animation) Proxy with ID {proxy.ID} not found.")
+                self.logger.warning("(handle_animation) Proxy with ID %s not found.", payload)
                 return
             
             if (proxy.position is None):
-                self.logger.warning(f"(handle_animation) Position for Proxy with ID {proxy.ID} not set.")
+                self.logger.warning("(handle_animation) Position for Proxy with ID %s not set.", proxy.ID)
                 return
             
             if(not proxy.is_plugged_in):
-                self.logger.warning(f"(handle_animation) Proxy with ID {proxy.ID} not connected.")
+                self.logger.warning("(handle_animation) Proxy with ID %s not connected.", proxy.ID)
                 return
             
-            self.logger.info(f"(handle_animation) Sending coordinates for Proxy {proxy.ID}.")
-            self.light_controller.send_coordinates(proxy.position[0], proxy.position[1])
+            self.logger.info("(handle_animation) Sending coordinates for Proxy %s.", proxy.ID)
+            x, y = proxy.position
+            self.light_controller.send_coordinates(x, y, PRIORITY_COORDINATES if priority is None else priority, proxy_ID=proxy.ID)
+            if self.journal is not None:
+                self.journal.record(EVENT_ANIMATION_QUEUED, proxy.ID, proxy.position)
 
         else:
-            self.logger.warning(f"(handle_animation) Invalid animation type '{animation_type}'.")
+            self.logger.warning("(handle_animation) Invalid animation type '%s'.", animation_type)
 
     def handle_manual_override(self, payload):
         """
@@ -282,25 +635,94 @@ class MessageHandler:
             payload (String): The payload of the override message in format 'ID,x,y'.
 
         """
-        parts = payload.split(",")
-        if len(parts) != 3:
-            self.logger.warning(f"(on_message) Invalid payload '{payload}' format for 'override' message.")
+        error, data = parse_override(payload)
+        if error:
+            if self.metrics is not None:
+                self.metrics.count_parse_failure()
+            self.logger.warning("(on_message) Invalid payload '%s' for 'override' message: %s.", payload, ERROR_MESSAGES[error], rate_limit=HOT_PATH_LOG_INTERVAL)
             return
         
-        proxy = next((p for p in self.proxy_list if p.ID == self.safe_int_cast(parts[0])), None)
+        proxy = self.proxies.get(data.ID)
 
         if proxy is None:
-            self.logger.warning(f"(on_message) Proxy with ID {parts[0]} not found.")
+            self.logger.warning("(on_message) Proxy with ID %s not found.", data.ID)
             return
         
-        proxy.position = self.safe_int_cast(parts[1]), self.safe_int_cast(parts[2])
+        proxy.position = data.x, data.y
         proxy.is_plugged_in = True
 
-        self.handle_animation(proxy.ID, "coordinates")
-        self.logger.info(f"(handle_manual_override) Manual override for Proxy {proxy.ID} with position {proxy.position}.")
+        if self.journal is not None:
+            self.journal.record(EVENT_OVERRIDE, proxy.ID, proxy.position, proxy.state)
+        self.handle_animation(proxy.ID, "coordinates", PRIORITY_OVERRIDE)
+        self.logger.info("(handle_manual_override) Manual override for Proxy %s with position %s.", proxy.ID, proxy.position)
 
         proxy.override = True
 
+    def add_proxy(self, proxy):
+        """
+        Registers a proxy at runtime and subscribes to its topics if the client is already connected.
+
+        Args:
+            proxy (Proxy): The proxy object to register.
+
+        """
+        with self.state_lock:
+            self.proxies.add(proxy)
+            self.add_proxy_routes(proxy)
+
+        if self.duplicate_filter is not None:
+            self.duplicate_filter.forget(proxy.ID)
+
+        if self.client.is_connected() and self.subscribe_mode != "wildcard":
+            proxy_state_update_topic, hub_state_update_topic = self.proxy_topics(proxy.ID)
+            self.client.subscribe([(proxy_state_update_topic, 0), (hub_state_update_topic, 0)])
+            self.logger.info("(add_proxy) Subscribed to %s and %s", proxy_state_update_topic, hub_state_update_topic)
+
+        self.logger.info("(add_proxy) Proxy %s added.", proxy.ID)
+
+    def remove_proxy(self, proxy_ID):
+        """
+        Unregisters a proxy at runtime and unsubscribes from its topics.
+
+        Args:
+            proxy_ID (int): The ID of the proxy to unregister.
+
+        Returns:
+            Proxy: The removed proxy object, or None if no proxy with this ID was registered.
+        """
+        with self.state_lock:
+            proxy = self.proxies.remove(proxy_ID)
+
+            if proxy is None:
+                self.logger.warning("(remove_proxy) Proxy with ID %s not found.", proxy_ID)
+                return None
+
+            proxy.table.reset_announced(proxy.index)
+
+            for topic in self.proxy_topics(proxy_ID):
+                self.router.remove_route(topic)
+
+        if self.duplicate_filter is not None:
+            self.duplicate_filter.forget(proxy_ID)
+
+        if self.client.is_connected() and self.subscribe_mode != "wildcard":
+            self.client.unsubscribe(list(self.proxy_topics(proxy_ID)))
+
+        self.logger.info("(remove_proxy) Proxy %s removed.", proxy_ID)
+        return proxy
+
+    def proxy_topics(self, proxy_ID):
+        """
+        Builds the topics a proxy publishes its own state and receives the hub state on.
+
+        Args:
+            proxy_ID (int): The ID of the proxy.
+
+        Returns:
+            tuple: The proxy state update topic and the hub state update topic.
+        """
+        return f"proxy_state_update_proxy_{proxy_ID}", f"hub_state_update_proxy_{proxy_ID}"
+
     def safe_int_cast(self, value):
         """
         Safely casts a value to an integer.
@@ -314,7 +736,9 @@ class MessageHandler:
         try:
             return int(value)
         except (ValueError, TypeError) as e:
-            self.logger.error(f"(safe_int_cast) Failed to cast '{value}' to int: {e}")
+            if self.metrics is not None:
+                self.metrics.count_parse_failure()
+            self.logger.error("(safe_int_cast) Failed to cast '%s' to int: %s", value, e, rate_limit=HOT_PATH_LOG_INTERVAL)
             return None
 
     def start(self):
@@ -322,6 +746,16 @@ class MessageHandler:
         Starts the message handler.
 
         """
+        if self.ingest_queues is not None:
+            for queue in self.ingest_queues:
+                worker = threading.Thread(target=self._process_queue, args=(queue,))
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+        if self.coalescer is not None:
+            self.coalescer.start()
+
         self.client.connect(self.broker_address)
         self.client.loop_start()
         self.logger.info("Message Handler started.")
@@ -333,4 +767,20 @@ class MessageHandler:
         """
         self.client.loop_stop()
         self.client.disconnect()
+
+        if self.ingest_queues is not None:
+            self.logger.info("(stop) Ingest queue stats: %s", self.ingest_stats())
+            for queue in self.ingest_queues:
+                queue.close()
+            for worker in self.workers:
+                worker.join()
+            self.workers = []
+
+        if self.coalescer is not None:
+            self.coalescer.stop()
+            self.logger.info("(stop) Coalesced %s proxy updates.", self.coalescer.coalesced)
+
+        if self.duplicate_filter is not None:
+            self.logger.info("(stop) Suppressed %s duplicate messages.", self.duplicate_filter.suppressed)
+
         self.logger.info("Message Handler stopped.")
@@ -0,0 +1,351 @@
+import http.server
+import threading
+import time
+
+# Topic types the received messages are counted by
+TOPIC_PROXY_STATE = "proxy_state"  # A proxy published its raw values and state
+TOPIC_HUB_STATE = "hub_state"  # The hub published the state of a proxy
+TOPIC_ANIMATION = "animation"  # The hub requested a path animation
+TOPIC_OVERRIDE = "override"  # A manual override of a proxy position
+TOPIC_UNKNOWN = "unknown"  # A topic without a route
+
+TOPIC_TYPES = (TOPIC_PROXY_STATE, TOPIC_HUB_STATE, TOPIC_ANIMATION, TOPIC_OVERRIDE, TOPIC_UNKNOWN)
+
+DECODE_TYPES = ("tile", "row", "col")
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_PATH = "/metrics"
+DEFAULT_PORT = 9464
+
+
+class ThreadCounters:
+    """
+    The counters of one thread, only incremented by the thread that owns them.
+    The counters of each topic and decode type exist from the start, so a scrape can copy the dicts while they are counted.
+
+    Attributes:
+        messages_received (dict): The number of received messages per topic type.
+        parse_failures (int): The number of payloads the payload parser rejected and values safe_int_cast failed to cast.
+        fallback_decodes (dict): The number of raw values per type that only matched through the closest match fallback.
+        animations_enqueued (int): The number of animations added to the queue of a light controller.
+        encode_failures (int): The number of animations dropped because they could not be encoded.
+        mqtt_reconnects (int): The number of connections to the broker after the first one of each message handler.
+    """
+    __slots__ = ("messages_received", "parse_failures", "fallback_decodes", "animations_enqueued", "encode_failures", "mqtt_reconnects")
+
+    def __init__(self):
+        self.messages_received = dict.fromkeys(TOPIC_TYPES, 0)
+        self.parse_failures = 0
+        self.fallback_decodes = dict.fromkeys(DECODE_TYPES, 0)
+        self.animations_enqueued = 0
+        self.encode_failures = 0
+        self.mqtt_reconnects = 0
+
+
+class DashboardMetrics:
+    """
+    A class that counts the throughput, queue depths and drops of a dashboard and renders them in the Prometheus text format.
+    The hot paths only increment counters through the count_* methods. Each thread counts into its own ThreadCounters, so
+    the message handler workers and the light controller thread never wait for each other or for a scrape, and a scrape
+    sums the counters of all threads without taking a lock. The queue depths and the counters the light controllers and
+    message handlers keep anyway are read when the snapshot is rendered. A rendered snapshot is cached for cache_interval
+    seconds, so scrapes never render more often than that, however many clients scrape.
+
+    Args:
+        cache_interval (float, optional): The time (in seconds) a rendered snapshot is served before it is rendered again. Defaults to 1.0.
+
+    Attributes:
+        thread_counters (list): The counters of every thread that counted, kept after the thread ends.
+        light_controllers (list): The light controllers whose counters and queue depth are exported.
+        message_handlers (list): The message handlers whose ingest queues and suppressed duplicates are exported.
+        cache_interval (float): The time (in seconds) a rendered snapshot is served before it is rendered again.
+        snapshot (bytes): The last rendered snapshot, or None.
+        rendered (float): The time the snapshot was rendered.
+    """
+
+    def __init__(self, cache_interval=1.0):
+        self.thread_counters = []
+        self.local = threading.local()
+        self.light_controllers = []
+        self.message_handlers = []
+        self.cache_interval = cache_interval
+        self.snapshot = None
+        self.rendered = 0.0
+        self.register_lock = threading.Lock()
+        self.render_lock = threading.Lock()
+
+    def _counters(self):
+        """
+        A private method that returns the counters of the calling thread, registering them on the first count.
+
+        """
+        try:
+            return self.local.counters
+        except AttributeError:
+            counters = ThreadCounters()
+            # Only taken once per thread, a scrape copies the list without it
+            with self.register_lock:
+                self.thread_counters = self.thread_counters + [counters]
+            self.local.counters = counters
+            return counters
+
+    def count_message(self, topic_type):
+        """
+        Counts a received message of a topic type.
+
+        """
+        self._counters().messages_received[topic_type] += 1
+
+    def count_parse_failure(self):
+        """
+        Counts a payload or value that failed to parse.
+
+        """
+        self._counters().parse_failures += 1
+
+    def count_fallback_decode(self, type):
+        """
+        Counts a raw value of a type that only matched through the closest match fallback.
+
+        """
+        self._counters().fallback_decodes[type] += 1
+
+    def count_animation_enqueued(self):
+        """
+        Counts an animation added to the queue of a light controller.
+
+        """
+        self._counters().animations_enqueued += 1
+
+    def count_encode_failure(self):
+        """
+        Counts an animation dropped because it could not be encoded.
+
+        """
+        self._counters().encode_failures += 1
+
+    def count_reconnect(self):
+        """
+        Counts a reconnect to the MQTT broker.
+
+        """
+        self._counters().mqtt_reconnects += 1
+
+    def totals(self):
+        """
+        Sums the counters of all threads without stopping them from counting.
+
+        Returns:
+            ThreadCounters: The summed counters.
+        """
+        totals = ThreadCounters()
+        # The list is replaced instead of appended to, so it is read without the register lock
+        for counters in self.thread_counters:
+            for topic_type, count in counters.messages_received.items():
+                totals.messages_received[topic_type] += count
+            for type, count in counters.fallback_decodes.items():
+                totals.fallback_decodes[type] += count
+            totals.parse_failures += counters.parse_failures
+            totals.animations_enqueued += counters.animations_enqueued
+            totals.encode_failures += counters.encode_failures
+            totals.mqtt_reconnects += counters.mqtt_reconnects
+        return totals
+
+    def add_light_controller(self, light_controller):
+        """
+        Exports the sent animations, written bytes and queue of a light controller.
+
+        """
+        self.light_controllers.append(light_controller)
+
+    def add_message_handler(self, message_handler):
+        """
+        Exports the depth and drops of the ingest queues and the suppressed duplicates of a message handler.
+
+        """
+        self.message_handlers.append(message_handler)
+
+    def samples(self):
+        """
+        Collects the current value of every metric.
+
+        Returns:
+            list: The (name, type, help, samples) tuples, with samples as a list of (labels, value) tuples.
+        """
+        sent = bytes_written = queue_depth = superseded = ack_timeouts = 0
+        for light_controller in self.light_controllers:
+            queue_stats = light_controller.message_queue.stats()
+            sent += light_controller.sent
+            bytes_written += light_controller.bytes_written
+            ack_timeouts += light_controller.ack_timeouts
+            queue_depth += queue_stats["depth"]
+            superseded += queue_stats["superseded"]
+
+        ingest_depth = ingest_dropped = duplicates = 0
+        for message_handler in self.message_handlers:
+            stats = message_handler.ingest_stats()
+            if stats is not None:
+                ingest_depth += stats["depth"]
+                ingest_dropped += stats["dropped"]
+            if message_handler.duplicate_filter is not None:
+                duplicates += message_handler.duplicate_filter.suppressed
+
+        totals = self.totals()
+        messages_received = totals.messages_received
+        fallback_decodes = totals.fallback_decodes
+        parse_failures = totals.parse_failures
+        animations_enqueued = totals.animations_enqueued
+        encode_failures = totals.encode_failures
+        mqtt_reconnects = totals.mqtt_reconnects
+
+        return [
+            ("dashboard_messages_received_total", "counter", "MQTT messages received per topic type.",
+             [({"topic_type": topic_type}, count) for topic_type, count in messages_received.items()]),
+            ("dashboard_parse_failures_total", "counter", "Payloads or values that failed to parse.",
+             [({}, parse_failures)]),
+            ("dashboard_fallback_decodes_total", "counter", "Raw ADC values decoded through the closest match fallback.",
+             [({"type": type}, count) for type, count in fallback_decodes.items()]),
+            ("dashboard_animations_enqueued_total", "counter", "Animations added to the light controller queue.",
+             [({}, animations_enqueued)]),
+            ("dashboard_animations_sent_total", "counter", "Animations written to the serial port.",
+             [({}, sent)]),
+            ("dashboard_animations_dropped_total", "counter", "Animations dropped before they were sent, per reason.",
+             [({"reason": "superseded"}, superseded), ({"reason": "encode_error"}, encode_failures)]),
+            ("dashboard_animation_queue_depth", "gauge", "Animations waiting in the light controller queue.",
+             [({}, queue_depth)]),
+            ("dashboard_ack_timeouts_total", "counter", "Animations the ready message of the ESP32 did not arrive in time for.",
+             [({}, ack_timeouts)]),
+            ("dashboard_serial_bytes_written_total", "counter", "Bytes written to the serial port.",
+             [({}, bytes_written)]),
+            ("dashboard_ingest_queue_depth", "gauge", "Received messages waiting in the ingest queues.",
+             [({}, ingest_depth)]),
+            ("dashboard_ingest_dropped_total", "counter", "Received messages dropped because an ingest queue was full.",
+             [({}, ingest_dropped)]),
+            ("dashboard_duplicates_suppressed_total", "counter", "Repeated state messages dropped before they were decoded.",
+             [({}, duplicates)]),
+            ("dashboard_mqtt_reconnects_total", "counter", "Reconnects to the MQTT broker.",
+             [({}, mqtt_reconnects)]),
+        ]
+
+    def format(self):
+        """
+        Renders the current value of every metric in the Prometheus text format.
+
+        Returns:
+            str: The rendered metrics.
+        """
+        lines = []
+        for name, type, help, samples in self.samples():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            for labels, value in samples:
+                if labels:
+                    label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {value}")
+                else:
+                    lines.append(f"{name} {value}")
+        lines.append("")
+        return "\n".join(lines)
+
+    def render(self):
+        """
+        Returns the cached snapshot, rendering a new one if it is older than cache_interval.
+
+        Returns:
+            bytes: The metrics in the Prometheus text format.
+        """
+        snapshot = self.snapshot
+        if snapshot is not None and time.monotonic() - self.rendered < self.cache_interval:
+            return snapshot
+
+        # Concurrent scrapes wait for one render instead of rendering each
+        with self.render_lock:
+            if self.snapshot is None or time.monotonic() - self.rendered >= self.cache_interval:
+                self.snapshot = self.format().encode()
+                self.rendered = time.monotonic()
+            return self.snapshot
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the cached snapshot of the metrics of the server on METRICS_PATH.
+
+    """
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+
+        body = self.server.metrics.render()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not logged, the dashboard log is kept for the dashboard
+        pass
+
+
+class MetricsServer:
+    """
+    A class that serves the metrics of a dashboard over HTTP on a background thread.
+
+    Args:
+        metrics (DashboardMetrics): The metrics to serve.
+        port (int, optional): The port to listen on. Defaults to DEFAULT_PORT.
+        address (str, optional): The address to listen on. Defaults to "" (all interfaces).
+        logger (Logger, optional): The logger object for logging messages. Defaults to None.
+
+    Attributes:
+        metrics (DashboardMetrics): The metrics to serve.
+        port (int): The port to listen on, the port actually bound once started.
+        address (str): The address to listen on.
+        logger (Logger): The logger object for logging messages, or None.
+        server (http.server.ThreadingHTTPServer): The HTTP server, or None while stopped.
+        worker_thread (threading.Thread): The thread serving the requests.
+    """
+
+    def __init__(self, metrics, port=DEFAULT_PORT, address="", logger=None):
+        self.metrics = metrics
+        self.port = port
+        self.address = address
+        self.logger = logger
+        self.server = None
+        self.worker_thread = None
+
+    def start(self):
+        """
+        Starts serving the metrics.
+
+        """
+        if self.server is not None:
+            return
+
+        self.server = http.server.ThreadingHTTPServer((self.address, self.port), MetricsRequestHandler)
+        self.server.daemon_threads = True
+        self.server.metrics = self.metrics
+        self.port = self.server.server_address[1]
+
+        self.worker_thread = threading.Thread(target=self.server.serve_forever)
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
+        if self.logger is not None:
+            self.logger.info("(start) Serving metrics on port %s%s", self.port, METRICS_PATH)
+
+    def stop(self):
+        """
+        Stops serving the metrics.
+
+        """
+        if self.server is None:
+            return
+
+        self.server.shutdown()
+        self.server.server_close()
+        self.worker_thread.join()
+        self.server = None
+        self.worker_thread = None
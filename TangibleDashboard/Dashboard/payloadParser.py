@@ -0,0 +1,173 @@
+from collections import namedtuple
+
+# Error codes of the parsers, OK (0) means the payload was parsed
+OK = 0
+ERROR_FIELD_COUNT = 1  # The payload has more or fewer comma separated fields than its shape
+ERROR_INVALID_NUMBER = 2  # A field is not an integer
+ERROR_INVALID_STATE = 3  # The state is neither an integer nor 'x'
+
+ERROR_MESSAGES = {
+    ERROR_FIELD_COUNT: "wrong number of fields",
+    ERROR_INVALID_NUMBER: "field is not an integer",
+    ERROR_INVALID_STATE: "state is neither an integer nor 'x'",
+}
+
+# Longer numbers are rejected, so int() never has to convert an arbitrarily long string
+MAX_DIGITS = 18
+
+# The canonical text of the values the proxies and the hub send (12 bit raw ADC values, states and proxy IDs) is converted
+# with a dict lookup, which is several times faster than int() and validates the field at the same time
+CACHED_INTS = 4096
+INT_CACHE = {str(value): value for value in range(CACHED_INTS)}
+cached_int = INT_CACHE.get
+
+# Creates a record from a tuple of its fields, skipping the argument handling of the generated __new__
+make_record = tuple.__new__
+
+# The state a proxy reports when it was freshly plugged in
+STATE_PLUGGED_IN = "x"
+
+# A proxy state update, state is None if the proxy reported 'x' (freshly plugged in)
+ProxyState = namedtuple("ProxyState", ["tile", "row", "col", "state"])
+
+# A path animation between two proxies
+PathAnimation = namedtuple("PathAnimation", ["start_ID", "end_ID"])
+
+# A manual override of the position of a proxy
+Override = namedtuple("Override", ["ID", "x", "y"])
+
+
+def parse_int(field):
+    """
+    Parses a decimal integer without raising, an optional sign and surrounding whitespace are accepted like by int().
+    The parsers look fields up in INT_CACHE first and only fall back to this for other values.
+
+    Args:
+        field (str): The text of the field.
+
+    Returns:
+        int: The parsed integer, or None if the field is not an integer of at most MAX_DIGITS digits.
+    """
+    if field.isdecimal() and len(field) <= MAX_DIGITS:
+        return int(field)
+
+    field = field.strip()
+    digits = field[1:] if field[:1] in ("-", "+") else field
+    if digits.isdecimal() and len(digits) <= MAX_DIGITS:
+        return int(field)
+    return None
+
+
+def parse_proxy_state(payload):
+    """
+    Parses the payload 'tile,row,col,state' a proxy publishes, with state 'x' if the proxy was freshly plugged in.
+
+    Args:
+        payload (str): The payload of the message.
+
+    Returns:
+        tuple: The error code and the ProxyState, or None if the error code is not OK.
+    """
+    fields = payload.split(",")
+    if len(fields) != 4:
+        return ERROR_FIELD_COUNT, None
+
+    tile_field, row_field, col_field, state_field = fields
+    tile = cached_int(tile_field)
+    row = cached_int(row_field)
+    col = cached_int(col_field)
+    if tile is None or row is None or col is None:
+        tile = parse_int(tile_field)
+        row = parse_int(row_field)
+        col = parse_int(col_field)
+        if tile is None or row is None or col is None:
+            return ERROR_INVALID_NUMBER, None
+
+    state = cached_int(state_field)
+    if state is None:
+        if state_field == STATE_PLUGGED_IN:
+            return OK, make_record(ProxyState, (tile, row, col, None))
+
+        state = parse_int(state_field)
+        if state is None:
+            return ERROR_INVALID_STATE, None
+    return OK, make_record(ProxyState, (tile, row, col, state))
+
+
+def parse_state(payload):
+    """
+    Parses the payload 'state' the hub publishes for a proxy.
+
+    Args:
+        payload (str): The payload of the message.
+
+    Returns:
+        tuple: The error code and the state, or None if the error code is not OK.
+    """
+    state = cached_int(payload)
+    if state is None:
+        state = parse_int(payload)
+        if state is None:
+            return ERROR_INVALID_NUMBER, None
+    return OK, state
+
+
+def parse_path(payload):
+    """
+    Parses the payload 'start ID,end ID' of a path animation.
+
+    Args:
+        payload (str): The payload of the message.
+
+    Returns:
+        tuple: The error code and the PathAnimation, or None if the error code is not OK.
+    """
+    fields = payload.split(",")
+    if len(fields) != 2:
+        return ERROR_FIELD_COUNT, None
+
+    start_field, end_field = fields
+    start_ID = cached_int(start_field)
+    end_ID = cached_int(end_field)
+    if start_ID is None or end_ID is None:
+        start_ID = parse_int(start_field)
+        end_ID = parse_int(end_field)
+        if start_ID is None or end_ID is None:
+            return ERROR_INVALID_NUMBER, None
+    return OK, make_record(PathAnimation, (start_ID, end_ID))
+
+
+def parse_override(payload):
+    """
+    Parses the payload 'ID,x,y' of a manual override.
+
+    Args:
+        payload (str): The payload of the message.
+
+    Returns:
+        tuple: The error code and the Override, or None if the error code is not OK.
+    """
+    fields = payload.split(",")
+    if len(fields) != 3:
+        return ERROR_FIELD_COUNT, None
+
+    ID_field, x_field, y_field = fields
+    ID = cached_int(ID_field)
+    x = cached_int(x_field)
+    y = cached_int(y_field)
+    if ID is None or x is None or y is None:
+        ID = parse_int(ID_field)
+        x = parse_int(x_field)
+        y = parse_int(y_field)
+        if ID is None or x is None or y is None:
+            return ERROR_INVALID_NUMBER, None
+    return OK, make_record(Override, (ID, x, y))
+
+
+# The parser of each payload shape, e.g. to fuzz or benchmark them together
+PARSERS = {
+    "proxy_state": parse_proxy_state,
+    "state": parse_state,
+    "path": parse_path,
+    "override": parse_override,
+}
@@ -0,0 +1,292 @@
+import collections
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+
+# Frames stored per allocation traceback, more frames find the caller but make tracing slower
+TRACEMALLOC_FRAMES = 10
+
+# Number of allocation sites listed in a snapshot diff
+TOP_ALLOCATIONS = 50
+
+
+def frame_label(code):
+    """
+    Returns the label of a function in a collapsed stack, e.g. "process_message (messageHandler.py:162)".
+
+    """
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    A profiler that samples the stacks of all threads at a fixed interval, e.g. the paho network thread,
+    the light controller worker and the main loop. Unlike cProfile it needs no hook in the profiled threads,
+    so the dashboard runs at its usual speed between two samples.
+    The samples are written as collapsed stacks (one "thread;outer;...;inner count" line per stack), which
+    flamegraph.pl, speedscope and inferno read directly.
+
+    Args:
+        interval (float, optional): The time (in seconds) between two samples. Defaults to 0.01.
+
+    Attributes:
+        interval (float): The time (in seconds) between two samples.
+        stacks (collections.Counter): Counts the samples of each collapsed stack.
+        samples (int): The number of times the threads were sampled.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+
+    def sample(self, ignore=None):
+        """
+        Records the current stack of every thread.
+
+        Args:
+            ignore (int, optional): The identifier of a thread that is not recorded, e.g. the sampling thread.
+
+        """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for ident, frame in sys._current_frames().items():
+            if ident == ignore:
+                continue
+
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            labels.reverse()
+            self.stacks[";".join(labels)] += 1
+
+        self.samples += 1
+
+    def run(self, duration, stop_event=None):
+        """
+        Samples all other threads for a duration.
+
+        Args:
+            duration (float): The time (in seconds) to sample.
+            stop_event (threading.Event, optional): Ends the sampling early once set.
+
+        """
+        ignore = threading.get_ident()
+        deadline = time.monotonic() + duration
+        next_sample = time.monotonic()
+
+        while True:
+            self.sample(ignore)
+
+            next_sample += self.interval
+            now = time.monotonic()
+            if next_sample >= deadline:
+                break
+            if next_sample < now:
+                # Sampling fell behind, skip the missed samples instead of catching up in a burst
+                next_sample = now
+            if stop_event is not None:
+                if stop_event.wait(next_sample - now):
+                    break
+            else:
+                time.sleep(next_sample - now)
+
+    def write(self, path):
+        """
+        Writes the recorded stacks in the collapsed stack format.
+
+        Args:
+            path (str): The path of the output file.
+
+        """
+        with open(path, "w") as output:
+            for stack, count in self.stacks.most_common():
+                output.write(f"{stack} {count}\n")
+
+
+class ProfilingHooks:
+    """
+    A class that lets a running dashboard be profiled through signals, without restarting it.
+    On SIGUSR1 all threads are sampled for profile_duration seconds and the stacks are written to
+    <log_dir>/profile_<time>.collapsed. The first SIGUSR2 starts tracing the allocations with tracemalloc, every
+    following one writes the allocation sites that grew the most since the previous SIGUSR2 to
+    <log_dir>/tracemalloc_<time>.txt, and the full snapshot to a .snapshot file that tracemalloc.Snapshot.load reads.
+    The signal handlers only start a thread, the dashboard threads are never blocked by the profiling.
+
+    e.g. kill -USR1 $(pgrep -f main.py)
+
+    Args:
+        logger (Logger): The logger object for logging messages.
+        log_dir (str, optional): The directory the results are written to. Defaults to "logs".
+        profile_duration (float, optional): The time (in seconds) the threads are sampled on SIGUSR1. Defaults to 30.
+        sample_interval (float, optional): The time (in seconds) between two samples. Defaults to 0.01.
+
+    Attributes:
+        logger (Logger): The logger object for logging messages.
+        log_dir (str): The directory the results are written to.
+        profile_duration (float): The time (in seconds) the threads are sampled on SIGUSR1.
+        sample_interval (float): The time (in seconds) between two samples.
+        profile_thread (threading.Thread): The thread of the running profile, or None.
+        snapshot (tracemalloc.Snapshot): The allocations at the previous SIGUSR2, or None.
+        stop_event (threading.Event): Ends a running profile early once set.
+        previous_handlers (dict): Maps each installed signal to the handler it replaced.
+    """
+
+    def __init__(self, logger, log_dir="logs", profile_duration=30, sample_interval=0.01):
+        self.logger = logger
+        self.log_dir = log_dir
+        self.profile_duration = profile_duration
+        self.sample_interval = sample_interval
+        self.profile_thread = None
+        self.snapshot = None
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.previous_handlers = {}
+
+    def install(self):
+        """
+        Installs the handlers of SIGUSR1 and SIGUSR2, must be called from the main thread.
+
+        Returns:
+            bool: True if the handlers were installed, False if the platform has no such signals (e.g. Windows).
+        """
+        if not hasattr(signal, "SIGUSR1") or not hasattr(signal, "SIGUSR2"):
+            self.logger.warning("(install) Profiling signals are not supported on this platform.")
+            return False
+
+        self.previous_handlers[signal.SIGUSR1] = signal.signal(signal.SIGUSR1, self._on_profile_signal)
+        self.previous_handlers[signal.SIGUSR2] = signal.signal(signal.SIGUSR2, self._on_snapshot_signal)
+        self.logger.info("(install) Profiling hooks installed, send SIGUSR1 to profile and SIGUSR2 to snapshot the allocations of process %s.", os.getpid())
+        return True
+
+    def uninstall(self):
+        """
+        Restores the previous signal handlers and ends a running profile early.
+
+        """
+        for signal_number, handler in self.previous_handlers.items():
+            signal.signal(signal_number, handler)
+        self.previous_handlers = {}
+
+        self.stop_event.set()
+        thread = self.profile_thread
+        if thread is not None:
+            thread.join()
+
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.snapshot = None
+
+    def _on_profile_signal(self, signal_number, frame):
+        self.start_profile()
+
+    def _on_snapshot_signal(self, signal_number, frame):
+        thread = threading.Thread(target=self.snapshot_allocations, name="allocation-snapshot")
+        thread.daemon = True
+        thread.start()
+
+    def start_profile(self, duration=None):
+        """
+        Starts sampling all threads in the background, unless a profile is already running.
+
+        Args:
+            duration (float, optional): The time (in seconds) to sample. Defaults to profile_duration.
+
+        Returns:
+            bool: True if the profile was started.
+        """
+        with self.lock:
+            if self.profile_thread is not None:
+                self.logger.warning("(start_profile) A profile is already running.")
+                return False
+
+            self.stop_event.clear()
+            self.profile_thread = threading.Thread(target=self.profile, args=(duration,), name="sampling-profiler")
+            self.profile_thread.daemon = True
+            self.profile_thread.start()
+            return True
+
+    def profile(self, duration=None):
+        """
+        Samples all other threads and writes the collapsed stacks.
+
+        Args:
+            duration (float, optional): The time (in seconds) to sample. Defaults to profile_duration.
+
+        Returns:
+            str: The path of the written file, or None if it could not be written.
+        """
+        if duration is None:
+            duration = self.profile_duration
+
+        try:
+            self.logger.info("(profile) Sampling all threads for %s s.", duration)
+            profiler = SamplingProfiler(self.sample_interval)
+            start = time.monotonic()
+            profiler.run(duration, self.stop_event)
+
+            path = self.output_path("profile", "collapsed")
+            profiler.write(path)
+            self.logger.info("(profile) Wrote %s samples of %.1f s to %s.", profiler.samples, time.monotonic() - start, path)
+            return path
+        except OSError as e:
+            self.logger.error("(profile) Failed to write the profile: %s", e)
+            return None
+        finally:
+            with self.lock:
+                self.profile_thread = None
+
+    def snapshot_allocations(self):
+        """
+        Starts tracing the allocations on the first call, later calls write the difference to the previous call.
+
+        Returns:
+            str: The path of the written diff, or None if tracing was only started or the diff could not be written.
+        """
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                self.snapshot = tracemalloc.take_snapshot()
+                self.logger.info("(snapshot_allocations) Started tracing the allocations, send SIGUSR2 again to write the growth since now.")
+                return None
+
+            previous = self.snapshot
+            snapshot = tracemalloc.take_snapshot()
+            self.snapshot = snapshot
+
+        # Allocations of tracemalloc itself would show up as the largest growth
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        snapshot = snapshot.filter_traces(filters)
+        statistics = snapshot.compare_to(previous.filter_traces(filters), "lineno") if previous is not None else snapshot.statistics("lineno")
+
+        try:
+            path = self.output_path("tracemalloc", "txt")
+            with open(path, "w") as output:
+                current, peak = tracemalloc.get_traced_memory()
+                output.write(f"Traced memory: {current} bytes, peak {peak} bytes\n")
+                output.write(f"Top {TOP_ALLOCATIONS} allocation sites by growth since the previous snapshot:\n")
+                for statistic in statistics[:TOP_ALLOCATIONS]:
+                    output.write(f"{statistic}\n")
+
+            snapshot.dump(path[:-len(".txt")] + ".snapshot")
+        except OSError as e:
+            self.logger.error("(snapshot_allocations) Failed to write the allocation snapshot: %s", e)
+            return None
+
+        self.logger.info("(snapshot_allocations) Wrote the allocation growth to %s.", path)
+        return path
+
+    def output_path(self, name, extension):
+        """
+        Returns the path of a new result file in the log directory, named after the current time.
+
+        """
+        if not os.path.exists(self.log_dir):
+            os.makedirs(self.log_dir)
+        timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+        return os.path.join(self.log_dir, f"{name}_{timestamp}_{os.getpid()}.{extension}")
@@ -1,14 +1,30 @@
 import time
+import weakref
 
-from config import Config
+from config import get_config
+from proxyTable import DEFAULT_TABLE, FLAG_OVERRIDE, FLAG_PLUGGED_IN, FLAG_PLUGGED_IN_KNOWN, FLAG_POSITION, NONE, from_column, to_column
+
+# The ESP32 ADC has a resolution of 12 bit, so raw values range from 0 to 4095
+ADC_RESOLUTION = 4096
+
+# Factor of the voltage divider of each type, applied to the ADC voltage
+VOLTAGE_FACTORS = {"tile": 1.68, "row": 1.51, "col": 1.51}
+
+# Tolerance below and above a voltage level that still matches it
+MATCH_TOLERANCES = {"tile": (0.22, 0.05), "row": (1, 0.05), "col": (1, 0.05)}
 
 
 class Proxy:
     """
     A class that stores the relevant data for a Proxy device.
+    The position, state and flags are stored in a row of a ProxyTable, the proxy object is a view of that row.
 
     Args:
         ID (int): The unique identifier for the proxy.
+        logger (Logger): The logger object for the proxy.
+        config (Config, optional): The shared calibration of the dashboard. Defaults to get_config().
+        table (ProxyTable, optional): The table storing the state of the proxy. Defaults to DEFAULT_TABLE.
+        metrics (DashboardMetrics, optional): Counts the raw values decoded through the closest match fallback. Defaults to None.
 
     Attributes:
         position (tuple): The position of the proxy (initially None).
@@ -17,23 +33,105 @@ class Proxy:
         col_value (int): The column value associated with the proxy (initially None).
         state (int): The state of the proxy (initially None).
         is_plugged_in (bool): Indicates whether the proxy is plugged in (initially None).
-        config (Config): The configuration object for the proxy.
+        config (Config): The shared configuration object for the proxy.
         override (bool): Indicates if the proxy is in override mode (initially False).
+        last_update (float): The time of the last update, 0 if the proxy was never updated.
         ID (int): The unique identifier for the proxy.
         logger (Logger): The logger object for the proxy.
+        lookup_tables (dict): The precompiled ADC lookup tables per type, shared by all proxies with the same config.
+        table (ProxyTable): The table storing the state of the proxy.
+        index (int): The row of the proxy in the table.
+        metrics (DashboardMetrics): Counts the raw values decoded through the closest match fallback, or None.
     """
-    def __init__(self, ID, logger):
-        self.position = None
+    __slots__ = ("ID", "logger", "config", "lookup_tables", "table", "index", "tile_value", "row_value", "col_value", "metrics")
+
+    # Maps each config to its lookup tables, weakly so the tables of a config replaced by a reload are freed with it
+    compiled_tables = weakref.WeakKeyDictionary()
+
+    def __init__(self, ID, logger, config=None, table=None, metrics=None):
+        self.table = table if table is not None else DEFAULT_TABLE
+        self.index = self.table.allocate()
         self.tile_value = None
         self.row_value = None
         self.col_value = None
-        self.state = None
-        self.is_plugged_in = None
-        self.config = Config()
-        self.override = False
+        self.config = config if config is not None else get_config()
         self.ID = ID
         self.logger = logger
-        
+        self.metrics = metrics
+
+        # Compile the lookup tables once per config, the first proxy created at startup pays for all others
+        self.lookup_tables = self.compiled_tables.get(self.config)
+        if self.lookup_tables is None:
+            self.lookup_tables = {type: self.compile_lookup_table(type) for type in ("tile", "row", "col")}
+            self.compiled_tables[self.config] = self.lookup_tables
+
+    @property
+    def position(self):
+        table, index = self.table, self.index
+        if not table.flags[index] & FLAG_POSITION:
+            return None
+        return from_column(table.row[index]), from_column(table.col[index])
+
+    @position.setter
+    def position(self, position):
+        table, index = self.table, self.index
+        if position is None:
+            table.flags[index] &= ~FLAG_POSITION
+            table.row[index] = NONE
+            table.col[index] = NONE
+            return
+
+        row, col = position
+        table.row[index] = to_column(row)
+        table.col[index] = to_column(col)
+        table.flags[index] |= FLAG_POSITION
+
+    @property
+    def state(self):
+        return from_column(self.table.state[self.index])
+
+    @state.setter
+    def state(self, state):
+        self.table.state[self.index] = to_column(state)
+
+    @property
+    def is_plugged_in(self):
+        flags = self.table.flags[self.index]
+        if not flags & FLAG_PLUGGED_IN_KNOWN:
+            return None
+        return bool(flags & FLAG_PLUGGED_IN)
+
+    @is_plugged_in.setter
+    def is_plugged_in(self, plugged_in):
+        table, index = self.table, self.index
+        if plugged_in is None:
+            table.flags[index] &= ~(FLAG_PLUGGED_IN_KNOWN | FLAG_PLUGGED_IN)
+        elif plugged_in:
+            table.flags[index] |= FLAG_PLUGGED_IN_KNOWN | FLAG_PLUGGED_IN
+        else:
+            table.flags[index] = (table.flags[index] | FLAG_PLUGGED_IN_KNOWN) & ~FLAG_PLUGGED_IN
+
+    @property
+    def override(self):
+        return bool(self.table.flags[self.index] & FLAG_OVERRIDE)
+
+    @override.setter
+    def override(self, override):
+        if override:
+            self.table.flags[self.index] |= FLAG_OVERRIDE
+        else:
+            self.table.flags[self.index] &= ~FLAG_OVERRIDE
+
+    @property
+    def last_update(self):
+        return self.table.last_update[self.index]
+
+    def release(self):
+        """
+        Returns the row of the proxy to its table, the proxy must not be used afterwards.
+
+        """
+        self.table.release(self.index)
 
     def update(self, tile, row, col, plugged_in, state = False):
         """
@@ -55,6 +153,7 @@ class Proxy:
             self.state = state
 
         self.set_position()
+        self.table.last_update[self.index] = time.time()
 
     def calculate_voltage(self, raw_value, type):
         """
@@ -68,17 +167,59 @@ class Proxy:
             The calculated voltage.
         """
         adc = (raw_value / 4095.0) * 3.3
-        if type == "tile":
-            return adc * 1.68
-        elif type == "row":
-            return adc * 1.51
-        elif type == "col":
-            return adc * 1.51
-        return None
+        factor = VOLTAGE_FACTORS.get(type)
+        if factor is None:
+            return None
+        return adc * factor
+
+    def match_voltage(self, voltage, type):
+        """
+        Match a voltage against the voltage list of the given type.
+
+        Args:
+            voltage: The voltage calculated from the raw ADC value.
+            type: The type of voltage divider ("tile", "row", or "col").
+
+        Returns:
+            A tuple of the matched position number and a flag that is True if the
+            number is the closest_match fallback instead of a match within the tolerance.
+        """
+        data_list = self.config.voltage_lists[type]
+
+        below, above = MATCH_TOLERANCES[type]
+        for voltage_level, number in data_list:
+            if voltage_level - below <= voltage <= voltage_level + above:
+                return number, False
+
+        # Find the closest voltage match
+        closest_match = min(data_list, key=lambda x: abs(x[0] - voltage))
+        return closest_match[1], True
+
+    def compile_lookup_table(self, type):
+        """
+        Precompute the matched position number for every possible raw ADC value.
+
+        Args:
+            type: The type of voltage divider ("tile", "row", or "col").
+
+        Returns:
+            A tuple of two bytearrays with ADC_RESOLUTION entries each, the first one
+            mapping the raw value to the position number, the second one flagging fallback matches.
+        """
+        numbers = bytearray(ADC_RESOLUTION)
+        fallbacks = bytearray(ADC_RESOLUTION)
+
+        for raw_value in range(ADC_RESOLUTION):
+            number, fallback = self.match_voltage(self.calculate_voltage(raw_value, type), type)
+            numbers[raw_value] = number
+            fallbacks[raw_value] = fallback
+
+        return numbers, fallbacks
 
     def convert_value(self, raw_value, type):
         """
         Match the correct position based on the voltage.
+        Values within the ADC range are resolved through the precompiled lookup tables.
 
         Args:
             raw_value: The raw value read from the ADC.
@@ -88,28 +229,23 @@ class Proxy:
             The matched position number.
             Returns closest_match calculation if nothing matches
         """
-        voltage = self.calculate_voltage(raw_value, type)
-        data_list = getattr(self.config, f"{type}List")
-
-        # Find the closest voltage match
-        closest_match = min(data_list, key=lambda x: abs(x[0] - voltage))
-
-        if type == "tile":
-            for voltage_level, number in data_list:
-                if voltage_level - 0.22 <= voltage <= voltage_level + 0.05:
-                    return number
+        table = self.lookup_tables.get(type)
 
-            self.logger.warning("(convert_value) Returning fallback value for tile")
-            return closest_match[1]
-        
-        else:
-            for voltage_level, number in data_list:
-                if voltage_level - 1 <= voltage <= voltage_level + 0.05:
-                    return number
+        if table is not None and isinstance(raw_value, int) and 0 <= raw_value < ADC_RESOLUTION:
+            numbers, fallbacks = table
+            if fallbacks[raw_value]:
+                if self.metrics is not None:
+                    self.metrics.count_fallback_decode(type)
+                self.logger.warning("(convert_value) Returning fallback value for %s", type)
+            return numbers[raw_value]
 
-            self.logger.warning(f"(convert_value) Returning fallback value for {type}")
-            return closest_match[1]
+        number, fallback = self.match_voltage(self.calculate_voltage(raw_value, type), type)
 
+        if fallback:
+            if self.metrics is not None:
+                self.metrics.count_fallback_decode(type)
+            self.logger.warning("(convert_value) Returning fallback value for %s", type)
+        return number
 
     def apply_adjustments(self, tile, row, col):
         """
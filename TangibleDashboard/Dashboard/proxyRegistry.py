@@ -0,0 +1,83 @@
+import threading
+
+
+class ProxyRegistry:
+    """
+    A class that stores the proxy objects indexed by their ID.
+    IDs do not need to be dense or start at 0, and proxies can be added or removed at runtime.
+
+    Args:
+        proxy_list (list, optional): The list of proxy objects to register initially.
+
+    Attributes:
+        proxies (dict): Maps the proxy ID to the proxy object.
+        lock (threading.Lock): Guards modifications of the registry.
+    """
+
+    def __init__(self, proxy_list=None):
+        self.proxies = {}
+        self.lock = threading.Lock()
+
+        if proxy_list is not None:
+            for proxy in proxy_list:
+                self.add(proxy)
+
+    def add(self, proxy):
+        """
+        Registers a proxy.
+
+        Args:
+            proxy (Proxy): The proxy object to register.
+
+        Raises:
+            ValueError: If a different proxy with the same ID is already registered.
+        """
+        with self.lock:
+            registered = self.proxies.get(proxy.ID)
+            if registered is not None and registered is not proxy:
+                raise ValueError(f"Proxy with ID {proxy.ID} is already registered.")
+
+            # Copy on write, so lookups from other threads never see a dict that is being resized
+            proxies = dict(self.proxies)
+            proxies[proxy.ID] = proxy
+            self.proxies = proxies
+
+    def remove(self, proxy_ID):
+        """
+        Unregisters a proxy.
+
+        Args:
+            proxy_ID (int): The ID of the proxy to unregister.
+
+        Returns:
+            Proxy: The removed proxy object, or None if no proxy with this ID is registered.
+        """
+        with self.lock:
+            if proxy_ID not in self.proxies:
+                return None
+
+            proxies = dict(self.proxies)
+            proxy = proxies.pop(proxy_ID)
+            self.proxies = proxies
+            return proxy
+
+    def get(self, proxy_ID):
+        """
+        Looks up a proxy by its ID.
+
+        Args:
+            proxy_ID (int): The ID of the proxy.
+
+        Returns:
+            Proxy: The proxy object, or None if no proxy with this ID is registered.
+        """
+        return self.proxies.get(proxy_ID)
+
+    def __contains__(self, proxy_ID):
+        return proxy_ID in self.proxies
+
+    def __iter__(self):
+        return iter(self.proxies.values())
+
+    def __len__(self):
+        return len(self.proxies)
@@ -0,0 +1,144 @@
+import threading
+from array import array
+
+# Stored in the integer columns for None and for values outside their range
+NONE = -2 ** 31
+
+# Bits of the flags column
+FLAG_POSITION = 1  # The proxy has a position
+FLAG_PLUGGED_IN_KNOWN = 2  # The plugged in state was reported, is_plugged_in is None otherwise
+FLAG_PLUGGED_IN = 4  # The proxy is plugged in
+FLAG_OVERRIDE = 8  # The proxy is in override mode
+
+
+def to_column(value):
+    """
+    Converts a value for an integer column, None and values outside the 32 bit range are stored as NONE.
+
+    """
+    if value is None or not -2 ** 31 < value < 2 ** 31:
+        return NONE
+    return int(value)
+
+
+def from_column(value):
+    """
+    Converts a value of an integer column back, NONE is returned as None.
+
+    """
+    return None if value == NONE else value
+
+
+class ProxyTable:
+    """
+    A struct-of-arrays table that stores the state of many proxies in one array per field, each proxy owns one row.
+    Besides the current position and state it stores the last announced position and state, the values the
+    last animation was based on, so changes are detected by comparing columns.
+
+    Attributes:
+        row (array): The row of the position of each proxy.
+        col (array): The column of the position of each proxy.
+        state (array): The state of each proxy.
+        flags (array): The FLAG_* bits of each proxy.
+        last_update (array): The time of the last update of each proxy.
+        announced_row (array): The row of the last announced position of each proxy.
+        announced_col (array): The column of the last announced position of each proxy.
+        announced_state (array): The last announced state of each proxy.
+        free (list): The released rows, reused before the table grows.
+    """
+
+    def __init__(self):
+        self.row = array("i")
+        self.col = array("i")
+        self.state = array("i")
+        self.flags = array("B")
+        self.last_update = array("d")
+        self.announced_row = array("i")
+        self.announced_col = array("i")
+        self.announced_state = array("i")
+        self.free = []
+        self.lock = threading.Lock()
+
+    def allocate(self):
+        """
+        Reserves a row for a proxy, initialized to no position, no state and an announced (0, 0, 0).
+
+        Returns:
+            int: The index of the row.
+        """
+        with self.lock:
+            if self.free:
+                index = self.free.pop()
+                self.reset(index)
+                return index
+
+            self.row.append(NONE)
+            self.col.append(NONE)
+            self.state.append(NONE)
+            self.flags.append(0)
+            self.last_update.append(0.0)
+            self.announced_row.append(0)
+            self.announced_col.append(0)
+            self.announced_state.append(0)
+            return len(self.flags) - 1
+
+    def reset(self, index):
+        """
+        Resets a row to its initial values.
+
+        Args:
+            index (int): The index of the row.
+
+        """
+        self.row[index] = NONE
+        self.col[index] = NONE
+        self.state[index] = NONE
+        self.flags[index] = 0
+        self.last_update[index] = 0.0
+        self.reset_announced(index)
+
+    def reset_announced(self, index):
+        """
+        Resets the announced position and state of a row to (0, 0, 0).
+
+        Args:
+            index (int): The index of the row.
+
+        """
+        self.announced_row[index] = 0
+        self.announced_col[index] = 0
+        self.announced_state[index] = 0
+
+    def announce(self, index):
+        """
+        Stores the current position and state of a row as announced.
+
+        Args:
+            index (int): The index of the row.
+
+        """
+        if self.flags[index] & FLAG_POSITION:
+            self.announced_row[index] = self.row[index]
+            self.announced_col[index] = self.col[index]
+        else:
+            self.announced_row[index] = NONE
+            self.announced_col[index] = NONE
+        self.announced_state[index] = self.state[index]
+
+    def release(self, index):
+        """
+        Returns a row to the table for reuse.
+
+        Args:
+            index (int): The index of the row.
+
+        """
+        with self.lock:
+            self.free.append(index)
+
+    def __len__(self):
+        return len(self.flags) - len(self.free)
+
+
+# The table of all proxies that are not given their own table
+DEFAULT_TABLE = ProxyTable()
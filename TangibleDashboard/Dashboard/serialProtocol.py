@@ -0,0 +1,209 @@
+import functools
+
+# Start byte of every binary frame, never the first character of an ASCII message
+FRAME_SYNC = 0xA5
+
+OPCODE_COORDINATES = 0x01
+OPCODE_PATH = 0x02
+OPCODE_BOOT = 0x03
+
+
+def _build_crc8_table(polynomial=0x07):
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ polynomial) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+
+# CRC-8 with polynomial 0x07 and initial value 0 (CRC-8/SMBUS)
+CRC8_TABLE = _build_crc8_table()
+
+
+def crc8(data, crc=0):
+    """
+    Calculates the CRC-8 of the data.
+
+    Args:
+        data (bytes): The data.
+        crc (int, optional): The CRC of the preceding data, to continue the calculation. Defaults to 0.
+
+    Returns:
+        int: The CRC-8 value.
+    """
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+# Encoded messages are cached per argument tuple in module-level caches shared by all protocol instances,
+# caches on the methods would keep every instance alive
+ENCODE_CACHE_SIZE = 1024
+
+
+@functools.lru_cache(maxsize=ENCODE_CACHE_SIZE)
+def encode_ascii_coordinates(x, y):
+    """
+    Encodes a coordinates animation in the ASCII protocol.
+
+    Args:
+        x (int): The x-coordinate.
+        y (int): The y-coordinate.
+
+    Returns:
+        bytes: The encoded message.
+    """
+    return f"{x},{y}\n".encode()
+
+
+@functools.lru_cache(maxsize=ENCODE_CACHE_SIZE)
+def encode_ascii_path(x1, y1, x2, y2):
+    """
+    Encodes a path animation in the ASCII protocol.
+
+    Args:
+        x1 (int): The x-coordinate of the starting point.
+        y1 (int): The y-coordinate of the starting point.
+        x2 (int): The x-coordinate of the ending point.
+        y2 (int): The y-coordinate of the ending point.
+
+    Returns:
+        bytes: The encoded message.
+    """
+    return f"{x1},{y1},{x2},{y2}\n".encode()
+
+
+def _encode_binary(opcode, *coordinates):
+    body = bytes((opcode,) + coordinates)
+    return bytes((FRAME_SYNC,)) + body, crc8(body)
+
+
+@functools.lru_cache(maxsize=ENCODE_CACHE_SIZE)
+def encode_binary_coordinates(x, y):
+    """
+    Encodes a coordinates animation in the binary protocol.
+
+    Args:
+        x (int): The x-coordinate.
+        y (int): The y-coordinate.
+
+    Returns:
+        tuple: The encoded message as the frame body and its CRC.
+
+    Raises:
+        ValueError: If a coordinate does not fit into one byte.
+    """
+    return _encode_binary(OPCODE_COORDINATES, x, y)
+
+
+@functools.lru_cache(maxsize=ENCODE_CACHE_SIZE)
+def encode_binary_path(x1, y1, x2, y2):
+    """
+    Encodes a path animation in the binary protocol.
+
+    Args:
+        x1 (int): The x-coordinate of the starting point.
+        y1 (int): The y-coordinate of the starting point.
+        x2 (int): The x-coordinate of the ending point.
+        y2 (int): The y-coordinate of the ending point.
+
+    Returns:
+        tuple: The encoded message as the frame body and its CRC.
+
+    Raises:
+        ValueError: If a coordinate does not fit into one byte.
+    """
+    return _encode_binary(OPCODE_PATH, x1, y1, x2, y2)
+
+
+class AsciiProtocol:
+    """
+    The text protocol understood by every light controller firmware, one comma separated message per line.
+    """
+
+    name = "ascii"
+
+    encode_coordinates = staticmethod(encode_ascii_coordinates)
+    encode_path = staticmethod(encode_ascii_path)
+
+    def encode_boot(self):
+        """
+        Encodes the boot animation, terminated by a newline like every other message.
+
+        Returns:
+            bytes: The encoded message.
+        """
+        return b"boot\n"
+
+    def frame(self, message, sequence):
+        """
+        Returns the bytes to write for an encoded message, ASCII messages have no framing.
+
+        Args:
+            message (bytes): The encoded message.
+            sequence (int): The sequence number of the message (unused).
+
+        Returns:
+            bytes: The bytes to write to the serial port.
+        """
+        return message
+
+    def describe(self, message):
+        """
+        Returns a readable representation of an encoded message for the log.
+
+        """
+        return message.decode(errors="replace").strip()
+
+
+class BinaryProtocol:
+    """
+    A compact binary protocol with fixed-width frames:
+    sync byte (0xA5), opcode, one byte per coordinate, sequence number and the CRC-8 over opcode, coordinates and sequence number.
+
+    Encoded messages hold the opcode, the coordinates and the CRC of both, so they can be cached and only the
+    sequence number and the final CRC byte are added when the frame is written.
+    """
+
+    name = "binary"
+
+    encode_coordinates = staticmethod(encode_binary_coordinates)
+    encode_path = staticmethod(encode_binary_path)
+
+    def encode_boot(self):
+        """
+        Encodes the boot animation.
+
+        Returns:
+            tuple: The encoded message as the frame body and its CRC.
+        """
+        return _encode_binary(OPCODE_BOOT)
+
+    def frame(self, message, sequence):
+        """
+        Completes an encoded message to a frame.
+
+        Args:
+            message (tuple): The encoded message as the frame body and its CRC.
+            sequence (int): The sequence number of the message (0 - 255).
+
+        Returns:
+            bytes: The bytes to write to the serial port.
+        """
+        body, crc = message
+        return body + bytes((sequence, CRC8_TABLE[crc ^ sequence]))
+
+    def describe(self, message):
+        """
+        Returns a readable representation of an encoded message for the log.
+
+        """
+        return message[0].hex(" ")
+
+
+PROTOCOLS = {
+    "ascii": AsciiProtocol,
+    "binary": BinaryProtocol,
+}
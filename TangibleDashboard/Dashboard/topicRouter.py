@@ -0,0 +1,110 @@
+import functools
+from collections import namedtuple
+
+# A route binds a topic to the callable that handles its payload, the proxy it targets (None for hub-wide topics)
+# and the type of the topic the messages are counted by (None if not counted)
+Route = namedtuple("Route", ["handler", "proxy", "topic_type"], defaults=(None,))
+
+
+class TopicRouter:
+    """
+    A class that maps MQTT topics directly to their handler, so dispatching a message is a single dict lookup.
+    Topics received through a wildcard subscription can be resolved locally by prefix routes.
+
+    Attributes:
+        routes (dict): Maps the topic string to its Route.
+        prefix_routes (list): Stores (prefix, handler, topic_type) tuples that are checked if no exact route exists.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.prefix_routes = []
+
+    def add_route(self, topic, handler, proxy=None, topic_type=None):
+        """
+        Adds or replaces the route for a topic.
+
+        Args:
+            topic (str): The exact topic string.
+            handler (callable): The function that is called with the payload of a message on this topic.
+            proxy (Proxy, optional): The proxy targeted by the topic.
+            topic_type (str, optional): The type of the topic, see metrics.TOPIC_TYPES.
+
+        """
+        self.routes[topic] = Route(handler, proxy, topic_type)
+
+    def add_prefix_route(self, prefix, handler, topic_type=None):
+        """
+        Adds a route for all topics starting with the prefix that have no exact route.
+
+        Args:
+            prefix (str): The topic prefix.
+            handler (callable): The function that is called with the topic and the payload of a message.
+            topic_type (str, optional): The type of the topics, see metrics.TOPIC_TYPES.
+
+        """
+        self.prefix_routes = self.prefix_routes + [(prefix, handler, topic_type)]
+
+    def remove_route(self, topic):
+        """
+        Removes the route for a topic.
+
+        Args:
+            topic (str): The exact topic string.
+
+        Returns:
+            Route: The removed route, or None if the topic was not routed.
+        """
+        return self.routes.pop(topic, None)
+
+    def resolve(self, topic):
+        """
+        Looks up the route for a topic.
+
+        Args:
+            topic (str): The topic of the received message.
+
+        Returns:
+            Route: The route for the topic, or None if the topic is not routed.
+        """
+        route = self.routes.get(topic)
+        if route is not None or not self.prefix_routes:
+            return route
+
+        for prefix, handler, topic_type in self.prefix_routes:
+            if topic.startswith(prefix):
+                return Route(functools.partial(handler, topic), None, topic_type)
+
+        return None
+
+    def dispatch(self, topic, payload):
+        """
+        Calls the handler routed for the topic with the payload.
+
+        Args:
+            topic (str): The topic of the received message.
+            payload (str): The payload of the received message.
+
+        Returns:
+            bool: True if a route was found, False otherwise.
+        """
+        route = self.resolve(topic)
+        if route is None:
+            return False
+
+        route.handler(payload)
+        return True
+
+    def clear(self):
+        """
+        Removes all routes.
+
+        """
+        self.routes = {}
+        self.prefix_routes = []
+
+    def __contains__(self, topic):
+        return topic in self.routes
+
+    def __len__(self):
+        return len(self.routes)
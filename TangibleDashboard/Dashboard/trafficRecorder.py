@@ -0,0 +1,138 @@
+import os
+import struct
+import threading
+
+# Magic and version at the start of every recording
+HEADER = struct.Struct("<4sB")
+MAGIC = b"DTRC"
+VERSION = 1
+
+# Timestamp, topic number and payload length of each message
+RECORD = struct.Struct("<dHI")
+
+# Length of a topic name, written before the name when a topic appears for the first time
+TOPIC_NAME = struct.Struct("<H")
+
+# Maximum number of different topics in one recording
+MAX_TOPICS = 0xFFFF
+
+
+class TrafficRecorder:
+    """
+    A class that records the received MQTT messages to a compact binary file, so the traffic can be replayed later.
+    Each topic name is written once, later messages on the same topic only store its number.
+
+    Args:
+        path (str): The path of the recording file, an existing file is overwritten.
+
+    Attributes:
+        path (str): The path of the recording file.
+        topics (dict): Maps each recorded topic to its number.
+        recorded (int): The number of recorded messages.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self.topics = {}
+        self.recorded = 0
+        self.lock = threading.Lock()
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+
+    def record(self, timestamp, topic, payload):
+        """
+        Appends a received message to the recording.
+
+        Args:
+            timestamp (float): The time the message was received.
+            topic (str): The topic of the message.
+            payload (bytes): The raw payload of the message.
+
+        """
+        with self.lock:
+            if self.file is None:
+                return
+
+            number = self.topics.get(topic)
+            if number is None:
+                if len(self.topics) >= MAX_TOPICS:
+                    return
+                number = len(self.topics)
+                self.topics[topic] = number
+                name = topic.encode()
+                self.file.write(RECORD.pack(timestamp, number, len(payload)) + TOPIC_NAME.pack(len(name)) + name + payload)
+            else:
+                self.file.write(RECORD.pack(timestamp, number, len(payload)) + payload)
+
+            self.recorded += 1
+
+    def flush(self):
+        """
+        Writes the buffered messages to the file.
+
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+
+    def close(self):
+        """
+        Flushes and closes the recording.
+
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_traffic(path):
+    """
+    Reads the messages of a recording.
+
+    Args:
+        path (str): The path of the recording file.
+
+    Yields:
+        tuple: The timestamp, topic and raw payload of each message, in the order they were received.
+
+    Raises:
+        ValueError: If the file is not a recording, was written by an unknown version or is corrupt.
+    """
+    with open(path, "rb") as recording:
+        header = recording.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"'{path}' is not a traffic recording.")
+
+        magic, version = HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a traffic recording.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported traffic recording version {version}.")
+
+        topics = []
+        while True:
+            record = recording.read(RECORD.size)
+            # A message that was cut off by a crash ends the recording
+            if len(record) < RECORD.size:
+                return
+
+            timestamp, number, payload_length = RECORD.unpack(record)
+            if number == len(topics):
+                name_length = recording.read(TOPIC_NAME.size)
+                if len(name_length) < TOPIC_NAME.size:
+                    return
+                name = recording.read(TOPIC_NAME.unpack(name_length)[0])
+                topics.append(name.decode())
+            elif number > len(topics):
+                raise ValueError(f"Corrupt traffic recording '{path}', unknown topic number {number}.")
+
+            payload = recording.read(payload_length)
+            if len(payload) < payload_length:
+                return
+
+            yield timestamp, topics[number], payload
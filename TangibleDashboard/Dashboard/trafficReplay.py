@@ -0,0 +1,227 @@
+import argparse
+import threading
+import time
+
+from eventJournal import EVENT_ANIMATION_SENT
+from lightController import LightController
+from localBroker import LocalBroker
+from logger import NullLogger
+from messageHandler import SUBSCRIBE_MODES, MessageHandler
+from proxy import Proxy
+from proxyTable import ProxyTable
+from trafficRecorder import read_traffic
+
+# Topic prefixes the proxy IDs of a recording are taken from, see MessageHandler.proxy_topics
+PROXY_TOPIC_PREFIXES = ("proxy_state_update_proxy_", "hub_state_update_proxy_")
+
+# Maximum time (in seconds) to wait for the light controller to send the remaining animations
+DRAIN_TIMEOUT = 30
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class ReplaySerial:
+    """
+    A serial port stand-in for the light controller that only counts the written frames.
+
+    Attributes:
+        writes (int): The number of written frames.
+        bytes_written (int): The number of written bytes.
+    """
+
+    def __init__(self):
+        self.writes = 0
+        self.bytes_written = 0
+        self.baudrate = 9600
+
+    def write(self, data):
+        self.writes += 1
+        self.bytes_written += len(data)
+        return len(data)
+
+    def readline(self):
+        time.sleep(0.1)
+        return b""
+
+    def close(self):
+        pass
+
+
+class ReplaySink:
+    """
+    Collects the queue latency of each animation the light controller sent, passed to it in place of an EventJournal.
+
+    Attributes:
+        latencies (list): The time (in seconds) each sent animation waited in the queue.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def record(self, event_type, proxy_ID=None, position=None, state=None, latency=None):
+        if event_type == EVENT_ANIMATION_SENT and latency is not None:
+            with self.lock:
+                self.latencies.append(latency)
+
+    def close(self):
+        pass
+
+
+def proxy_IDs(messages):
+    """
+    Collects the IDs of the proxies that appear in the topics of a recording.
+
+    Args:
+        messages (list): The (timestamp, topic, payload) tuples.
+
+    Returns:
+        list: The sorted proxy IDs.
+    """
+    IDs = set()
+    for topic in {topic for _, topic, _ in messages}:
+        for prefix in PROXY_TOPIC_PREFIXES:
+            if topic.startswith(prefix):
+                try:
+                    IDs.add(int(topic[len(prefix):]))
+                except ValueError:
+                    pass
+    return sorted(IDs)
+
+
+def percentile(sorted_values, percent):
+    """
+    Returns the nearest-rank percentile of a sorted list.
+
+    """
+    if not sorted_values:
+        return 0.0
+    rank = int(len(sorted_values) * percent / 100.0 + 0.5)
+    return sorted_values[min(max(rank - 1, 0), len(sorted_values) - 1)]
+
+
+def replay(messages, speed=1.0, worker_count=0, coalesce_window=0, subscribe_mode="batched", animation_topic="dashboardAnimations", override_topic="dashboardOverride"):
+    """
+    Feeds recorded messages through a MessageHandler on a LocalBroker, with a light controller writing to a ReplaySerial.
+
+    Args:
+        messages (list): The (timestamp, topic, payload) tuples of the recording.
+        speed (float, optional): The replay speed relative to the recording, 0 replays as fast as possible. Defaults to 1.0.
+        worker_count (int, optional): The number of ingest workers of the handler. Defaults to 0.
+        coalesce_window (float, optional): The coalesce window of the handler. Defaults to 0.
+        subscribe_mode (str, optional): The subscribe mode of the handler. Defaults to "batched".
+        animation_topic (str, optional): The animation topic of the recording. Defaults to "dashboardAnimations".
+        override_topic (str, optional): The override topic of the recording. Defaults to "dashboardOverride".
+
+    Returns:
+        dict: The replayed messages, the elapsed time, the message latencies (from the publish to the end of the processing)
+            and queue latencies (from the queuing to the serial write of an animation) in seconds, and the serial sink counters.
+    """
+    logger = NullLogger()
+    table = ProxyTable()
+    proxy_list = [Proxy(ID, logger, table=table) for ID in proxy_IDs(messages)]
+
+    serial_port = ReplaySerial()
+    sink = ReplaySink()
+    light_controller = LightController(None, 9600, logger, serial_port=serial_port, journal=sink)
+    light_controller.delay = 0  # The sink has no animation to wait for
+
+    # The local broker only carries the recorded traffic, so the wildcard mode can match every topic
+    broker = LocalBroker()
+    wildcard_filter = "+" if subscribe_mode == "wildcard" else None
+    handler = MessageHandler("localhost", proxy_list, light_controller, animation_topic, override_topic, logger,
+                             subscribe_mode=subscribe_mode, wildcard_filter=wildcard_filter, worker_count=worker_count,
+                             coalesce_window=coalesce_window, client=broker.client())
+
+    message_latencies = []
+    process_message = handler.process_message
+
+    def timed_process_message(topic, payload, timestamp):
+        process_message(topic, payload, timestamp)
+        message_latencies.append(time.time() - timestamp)
+
+    handler.process_message = timed_process_message
+    handler.start()
+
+    publisher = broker.client()
+    publisher.connect()
+
+    start = time.perf_counter()
+    first_timestamp = messages[0][0] if messages else 0.0
+    for timestamp, topic, payload in messages:
+        if speed > 0:
+            delay = start + (timestamp - first_timestamp) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        publisher.publish(topic, payload)
+
+    # Stopping the handler drains the ingest queues and flushes the coalesced updates
+    handler.stop()
+
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while light_controller.message_queue.qsize() > 0 or len(sink.latencies) < light_controller.sent:
+        if time.monotonic() > deadline:
+            break
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "messages": len(messages),
+        "proxies": len(proxy_list),
+        "elapsed": elapsed,
+        "message_latencies": sorted(message_latencies),
+        "queue_latencies": sorted(sink.latencies),
+        "animations": serial_port.writes,
+        "bytes_written": serial_port.bytes_written,
+        "superseded": light_controller.message_queue.stats()["superseded"],
+    }
+
+
+def parse_speed(value):
+    """
+    Parses a replay speed given as a factor, e.g. "1", "10x", or "max".
+
+    """
+    if value == "max":
+        return 0.0
+    speed = float(value.rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("The speed must be positive or 'max'.")
+    return speed
+
+
+def format_latencies(latencies):
+    """
+    Returns a readable line with the percentiles of a sorted list of latencies.
+
+    """
+    fields = [f"p{percent:g} {percentile(latencies, percent) * 1000:.3f} ms" for percent in PERCENTILES]
+    if latencies:
+        fields.append(f"max {latencies[-1] * 1000:.3f} ms")
+    return ", ".join(fields)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded MQTT traffic through the message handler.")
+    parser.add_argument("recording", help="The traffic recording written by the TrafficRecorder.")
+    parser.add_argument("--speed", type=parse_speed, default=1.0, help="Replay speed, e.g. 1x, 10x or max. Defaults to 1x.")
+    parser.add_argument("--workers", type=int, default=0, help="Number of ingest workers of the message handler.")
+    parser.add_argument("--coalesce-window", type=float, default=0, help="Coalesce window (in seconds) of the message handler.")
+    parser.add_argument("--subscribe-mode", choices=SUBSCRIBE_MODES, default="batched", help="Subscribe mode of the message handler.")
+    parser.add_argument("--animation-topic", default="dashboardAnimations", help="The animation topic of the recording.")
+    parser.add_argument("--override-topic", default="dashboardOverride", help="The override topic of the recording.")
+    args = parser.parse_args()
+
+    messages = list(read_traffic(args.recording))
+    stats = replay(messages, args.speed, args.workers, args.coalesce_window, args.subscribe_mode, args.animation_topic, args.override_topic)
+
+    elapsed = stats["elapsed"]
+    print(f"{stats['messages']} messages for {stats['proxies']} proxies replayed in {elapsed:.3f} s "
+          f"({stats['messages'] / elapsed if elapsed > 0 else 0:.0f} messages/s)")
+    print(f"{stats['animations']} animations written ({stats['bytes_written']} bytes), {stats['superseded']} superseded")
+    print(f"message latency: {format_latencies(stats['message_latencies'])}")
+    print(f"queue latency: {format_latencies(stats['queue_latencies'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import threading
+import time
+
+
+class UpdateCoalescer:
+    """
+    A class that coalesces the updates of each proxy within a time window, so only the latest state is compared
+    and intermediate positions or state flaps never queue an animation.
+
+    Args:
+        window (float): The time (in seconds) updates of a proxy are collected before they are flushed.
+        flush (callable): The function that is called with (proxy, change_type) for each flushed change.
+        flush_batch (callable, optional): If given, it is called once with the list of (proxy, change_type) tuples
+            that are due instead of calling flush for each of them. Defaults to None.
+
+    Attributes:
+        window (float): The time (in seconds) updates of a proxy are collected before they are flushed.
+        flush (callable): The function that is called with (proxy, change_type) for each flushed change.
+        flush_batch (callable): The function that is called with all due changes at once, or None.
+        pending (dict): Maps the proxy ID to a tuple of the flush deadline, the proxy and its pending change types.
+        coalesced (int): The number of updates that were merged into an already pending update.
+        worker_thread (threading.Thread): The thread flushing the due updates.
+    """
+
+    def __init__(self, window, flush, flush_batch=None):
+        self.window = window
+        self.flush = flush
+        self.flush_batch = flush_batch
+        self.pending = {}
+        self.coalesced = 0
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.running = False
+        self.worker_thread = None
+
+    def submit(self, proxy, change_type):
+        """
+        Adds an update of a proxy, merging it with an update of the same proxy that is still pending.
+
+        Args:
+            proxy (Proxy): The updated proxy object.
+            change_type (str): The type of change (either "proxy" or "hub").
+
+        """
+        with self.lock:
+            entry = self.pending.get(proxy.ID)
+
+            if entry is None:
+                self.pending[proxy.ID] = (time.monotonic() + self.window, proxy, {change_type: None})
+                self.condition.notify()
+                return
+
+            # Move the change type to the end, so the changes are flushed in the order they last occurred
+            change_types = entry[2]
+            change_types.pop(change_type, None)
+            change_types[change_type] = None
+            self.coalesced += 1
+
+    def pop_due(self, now=None):
+        """
+        Removes the updates whose window has passed.
+
+        Args:
+            now (float, optional): The current time.monotonic() value.
+
+        Returns:
+            list: The (proxy, change_type) tuples to flush, in order.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        due = []
+        with self.lock:
+            for proxy_ID, (deadline, proxy, change_types) in list(self.pending.items()):
+                if deadline <= now:
+                    del self.pending[proxy_ID]
+                    due.extend((proxy, change_type) for change_type in change_types)
+        return due
+
+    def next_deadline(self):
+        """
+        Returns the earliest flush deadline as time.monotonic() value, or None if no update is pending.
+
+        """
+        with self.lock:
+            if not self.pending:
+                return None
+            return min(deadline for deadline, _, _ in self.pending.values())
+
+    def flush_due(self, now=None):
+        """
+        Flushes the updates whose window has passed.
+
+        Args:
+            now (float, optional): The current time.monotonic() value.
+
+        """
+        due = self.pop_due(now)
+        if self.flush_batch is not None:
+            if due:
+                self.flush_batch(due)
+            return
+
+        for proxy, change_type in due:
+            self.flush(proxy, change_type)
+
+    def flush_all(self):
+        """
+        Flushes all pending updates immediately.
+
+        """
+        self.flush_due(float("inf"))
+
+    def start(self):
+        """
+        Starts the thread flushing the due updates.
+
+        """
+        self.running = True
+        self.worker_thread = threading.Thread(target=self._flush_pending)
+        self.worker_thread.daemon = True
+        self.worker_thread.start()
+
+    def stop(self):
+        """
+        Stops the flushing thread and flushes the remaining updates.
+
+        """
+        with self.lock:
+            self.running = False
+            self.condition.notify()
+
+        if self.worker_thread is not None:
+            self.worker_thread.join()
+            self.worker_thread = None
+
+        self.flush_all()
+
+    def _flush_pending(self):
+        """
+        A private method that waits for the earliest deadline and flushes the due updates.
+
+        """
+        while True:
+            with self.lock:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                timeout = min(deadline for deadline, _, _ in self.pending.values()) - time.monotonic()
+                if timeout > 0:
+                    self.condition.wait(timeout)
+                    continue
+
+            self.flush_due()
@@ -7,6 +7,14 @@ const int SHORT_DELAY = 10;
 const int LONG_DELAY = 100;
 const int REPETITIONS = 6;
 const bool DEBUG = false;
+const char *READY_MESSAGE = "READY";
+
+// Binary frames, see serialProtocol.py
+const uint8_t FRAME_SYNC = 0xA5;
+const uint8_t OPCODE_COORDINATES = 0x01;
+const uint8_t OPCODE_PATH = 0x02;
+const uint8_t OPCODE_BOOT = 0x03;
+const size_t FRAME_MAX_LENGTH = 7;
 
 #define LED_PIN 5
 #define NUM_LEDS 1151
@@ -210,12 +218,162 @@ void animateBoot()
     FastLED.show();
 }
 
+// Plays the path animation between two sets of coordinates
+void playPath(int r1, int c1, int r2, int c2)
+{
+    if (DEBUG)
+    {
+        std::cout << "First Coordinate: " << r1 << "," << c1 << std::endl;
+        std::cout << "Second Coordinate: " << r2 << "," << c2 << std::endl;
+    }
+    for (int i = 0; i < REPETITIONS; i++)
+    {
+        digitalWrite(relayPin, HIGH);
+        delay(10);
+        animateTrail(r1, c1, r2, c2);
+        delay(50);
+        digitalWrite(relayPin, LOW);
+    }
+}
+
+// Plays the plug-in animation at one set of coordinates
+void playCoordinates(int r1, int c1)
+{
+    if (DEBUG)
+    {
+        std::cout << "Single Coordinate: " << r1 << "," << c1 << std::endl;
+    }
+    for (int i = 0; i < REPETITIONS; i++)
+    {
+        digitalWrite(relayPin, HIGH);
+        delay(10);
+        animateStart(r1, c1);
+        delay(50);
+        digitalWrite(relayPin, LOW);
+    }
+}
+
+// Plays the boot animation
+void playBoot()
+{
+    if (DEBUG)
+    {
+        Serial.println("Performing boot animation.");
+    }
+
+    digitalWrite(relayPin, HIGH);
+    delay(10);
+    animateBoot();
+    delay(5);
+    animateBoot();
+    delay(5);
+    animateBoot();
+    delay(50);
+    digitalWrite(relayPin, LOW);
+}
+
+// CRC-8 with polynomial 0x07 and initial value 0, the same as in serialProtocol.py
+uint8_t crc8(const uint8_t *data, size_t length)
+{
+    uint8_t crc = 0;
+    for (size_t i = 0; i < length; i++)
+    {
+        crc ^= data[i];
+        for (int bit = 0; bit < 8; bit++)
+        {
+            crc = (crc & 0x80) ? (crc << 1) ^ 0x07 : crc << 1;
+        }
+    }
+    return crc;
+}
+
+// Reads and plays a binary frame: sync byte, opcode, coordinates, sequence number and CRC-8
+void handleFrame()
+{
+    uint8_t frame[FRAME_MAX_LENGTH];
+    Serial.read(); // Sync byte
+
+    if (Serial.readBytes(frame, 1) != 1)
+    {
+        return;
+    }
+
+    size_t coordinates;
+    switch (frame[0])
+    {
+    case OPCODE_COORDINATES:
+        coordinates = 2;
+        break;
+    case OPCODE_PATH:
+        coordinates = 4;
+        break;
+    case OPCODE_BOOT:
+        coordinates = 0;
+        break;
+    default:
+        if (DEBUG)
+        {
+            Serial.println("Invalid frame opcode.");
+        }
+        return;
+    }
+
+    // Coordinates, sequence number and CRC-8
+    size_t length = 1 + coordinates + 2;
+    if (Serial.readBytes(frame + 1, length - 1) != length - 1 || crc8(frame, length - 1) != frame[length - 1])
+    {
+        if (DEBUG)
+        {
+            Serial.println("Invalid frame.");
+        }
+        return;
+    }
+
+    FastLED.clear();
+
+    switch (frame[0])
+    {
+    case OPCODE_COORDINATES:
+        playCoordinates(frame[1], frame[2]);
+        break;
+    case OPCODE_PATH:
+        playPath(frame[1], frame[2], frame[3], frame[4]);
+        break;
+    case OPCODE_BOOT:
+        playBoot();
+        break;
+    }
+}
+
+// Confirms and switches to a new baud rate requested with "baud,<rate>"
+void handleBaudrate(long baudrate)
+{
+    if (baudrate != 115200 && baudrate != 921600)
+    {
+        Serial.println("BAUD,ERR");
+        return;
+    }
+
+    Serial.printf("BAUD,%ld\n", baudrate);
+    Serial.flush();
+    Serial.updateBaudRate(baudrate);
+}
+
 void loop()
 {
     if (Serial.available())
     {
+        if (Serial.peek() == FRAME_SYNC)
+        {
+            handleFrame();
+            // Tell the dashboard the animation is done, so it can send the next message right away
+            Serial.println(READY_MESSAGE);
+            return;
+        }
+
         String data = Serial.readStringUntil('\n');
         int r1, c1, r2, c2, stayOn;
+        long baudrate;
 
         // Try to parse two pairs of coordinates
         int coords = sscanf(data.c_str(), "%d,%d,%d,%d,%d", &r1, &c1, &r2, &c2, &stayOn);
@@ -225,35 +383,12 @@ void loop()
         // Check if the input contains two sets of coordinates
         if (coords == 4)
         {
-            if (DEBUG)
-            {
-                std::cout << "First Coordinate: " << r1 << "," << c1 << std::endl;
-                std::cout << "Second Coordinate: " << r2 << "," << c2 << std::endl;
-            }
-            for (int i = 0; i < REPETITIONS; i++)
-            {
-                digitalWrite(relayPin, HIGH);
-                delay(10);
-                animateTrail(r1, c1, r2, c2);
-                delay(50);
-                digitalWrite(relayPin, LOW);
-            }
+            playPath(r1, c1, r2, c2);
         }
         // Check if the input contains one set of coordinates
         else if (coords == 2)
         {
-            if (DEBUG)
-            {
-                std::cout << "Single Coordinate: " << r1 << "," << c1 << std::endl;
-            }
-            for (int i = 0; i < REPETITIONS; i++)
-            {
-                digitalWrite(relayPin, HIGH);
-                delay(10);
-                animateStart(r1, c1);
-                delay(50);
-                digitalWrite(relayPin, LOW);
-            }
+            playCoordinates(r1, c1);
         }
         else if (coords == 5)
         {
@@ -265,21 +400,11 @@ void loop()
         }
         else if (data == "boot")
         {
-            if (DEBUG)
-            {
-                Serial.println("Performing boot animation.");
-            }
-
-            digitalWrite(relayPin, HIGH);
-            delay(10);
-            animateBoot();
-            delay(5);
-            animateBoot();
-            delay(5);
-            animateBoot();
-            delay(50);
-            digitalWrite(relayPin, LOW);
-            
+            playBoot();
+        }
+        else if (sscanf(data.c_str(), "baud,%ld", &baudrate) == 1)
+        {
+            handleBaudrate(baudrate);
         }
         else
         {
@@ -292,5 +417,8 @@ void loop()
             FastLED.clear();
             digitalWrite(relayPin, LOW);
         }
+
+        // Tell the dashboard the animation is done, so it can send the next message right away
+        Serial.println(READY_MESSAGE);
     }
 }
\ No newline at end of file